@@ -0,0 +1,96 @@
+"""Compare file hashing strategies on files from 1 KB to 2 GB.
+
+uv run python benchmarks/bench_digest.py
+uv run python benchmarks/bench_digest.py --sizes 1K,1M,256M --repeat 5
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+from pathlib import Path
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from dotman.util import digest_of_file
+
+
+SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+DEFAULT_SIZES = "1K,64K,1M,16M,256M,2G"
+DEFAULT_ALGORITHMS = "md5,sha1,sha256,blake2b"
+
+
+def parse_size(size: str) -> int:
+    suffix = size[-1].upper()
+    if suffix in SIZE_SUFFIXES:
+        return int(size[:-1]) * SIZE_SUFFIXES[suffix]
+    return int(size)
+
+
+def write_file(path: Path, size: int) -> None:
+    block = os.urandom(min(size, 4 * 1024 * 1024))
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            written = f.write(block[:remaining])
+            remaining -= written
+
+
+def legacy_digest(path: Path, algorithm: str) -> str:
+    # The original md5_of_file loop, with a fixed 8 KiB chunk size.
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def strategies(algorithm: str) -> dict[str, Callable[[Path], str]]:
+    return {
+        "8KiB-loop": lambda path: legacy_digest(path, algorithm),
+        "1MiB-buffer": lambda path: digest_of_file(path, algorithm, 1024 * 1024),
+        "adaptive": lambda path: digest_of_file(path, algorithm),
+    }
+
+
+def time_call(func: Callable[[Path], str], path: Path, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--algorithms", default=DEFAULT_ALGORITHMS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    algorithms = args.algorithms.split(",")
+    print(
+        f"{'size':>10} {'algorithm':>10} {'strategy':>12} {'seconds':>10} {'MiB/s':>10}"
+    )
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        for size in sizes:
+            path = Path(tmp_dir, f"data-{size}")
+            write_file(path, size)
+            for algorithm in algorithms:
+                for name, func in strategies(algorithm).items():
+                    func(path)  # warm the page cache
+                    seconds = time_call(func, path, args.repeat)
+                    throughput = size / (1024 * 1024) / seconds if seconds else 0.0
+                    print(
+                        f"{size:>10} {algorithm:>10} {name:>12} {seconds:>10.5f} {throughput:>10.1f}"
+                    )
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Time the dotman operations on a generated project, and compare against a baseline.
+
+uv run python benchmarks/bench_operations.py --targets 100 --json results.json
+uv run python benchmarks/bench_operations.py --targets 100 --baseline results.json
+
+Each repeat generates a fresh project with dotman.examples, then times init,
+add, setup_project, status (with a cold and a warm cache), sync_project (copy
+mode only, after touching every other dotfile) and one edit per target. With
+--baseline, operations slower than the baseline by more than --threshold are
+reported, and the script exits with status 1. Operations faster than
+--min-seconds in both runs are not compared.
+"""
+
+from __future__ import annotations
+import argparse
+from dataclasses import asdict
+import json
+import os
+from pathlib import Path
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, cast
+
+from dotman.context import Context, DotfileMode, Platform, managed_context
+from dotman.edit import edit
+from dotman.examples import SyntheticPaths, SyntheticSpec, generate_synthetic_dotfiles
+from dotman.init import init
+from dotman.session import transaction
+from dotman.setup import setup_project
+from dotman.status import status
+from dotman.sync import sync_project
+
+SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+DEFAULT_MODES = "symlink,copy"
+
+
+def parse_size(size: str) -> int:
+    suffix = size[-1].upper()
+    if suffix in SIZE_SUFFIXES:
+        return int(size[:-1]) * SIZE_SUFFIXES[suffix]
+    return int(size)
+
+
+def timed(timings: dict[str, float], name: str, func: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    func()
+    timings[name] = time.perf_counter() - start
+
+
+def remove_dotfiles(paths: SyntheticPaths) -> None:
+    for dotfile in paths.dotfiles:
+        if dotfile.is_symlink() or dotfile.is_file():
+            dotfile.unlink()
+        else:
+            shutil.rmtree(dotfile)
+
+
+def touch_dotfiles(paths: SyntheticPaths) -> None:
+    for dotfile in paths.dotfiles[::2]:
+        for path in [dotfile] if dotfile.is_file() else dotfile.rglob("file-*"):
+            path.write_bytes(path.read_bytes() + b"\n")
+
+
+def run_once(
+    root: Path, spec: SyntheticSpec, mode: DotfileMode, jobs: int
+) -> dict[str, float]:
+    paths = generate_synthetic_dotfiles(root, spec)
+    timings: dict[str, float] = dict()
+    context = Context(cwd=paths.project, home=paths.home, platform=Platform.linux)
+    with managed_context(context):
+
+        def add_all() -> None:
+            with transaction(paths.project) as tx:
+                for dotfile in paths.dotfiles:
+                    tx.add(dotfile, dotfile_mode=mode)
+
+        timed(timings, "init", lambda: init(project=paths.project))
+        timed(timings, "add", add_all)
+        remove_dotfiles(paths)
+        timed(
+            timings,
+            "setup_project",
+            lambda: setup_project(paths.project, dotfile_mode=mode, jobs=jobs),
+        )
+        timed(timings, "status_cold", lambda: status(paths.project, jobs=jobs))
+        timed(timings, "status_warm", lambda: status(paths.project, jobs=jobs))
+        if mode != "symlink":
+            touch_dotfiles(paths)
+            timed(
+                timings, "sync_project", lambda: sync_project(paths.project, jobs=jobs)
+            )
+
+        def edit_all() -> None:
+            for dotfile in paths.dotfiles:
+                edit(
+                    project=paths.project,
+                    target=dotfile.name,
+                    dotfile=Path(dotfile.parent, dotfile.name + ".moved"),
+                )
+
+        timed(timings, "edit", edit_all)
+    return timings
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+    min_seconds: float,
+) -> list[str]:
+    regressions = list()
+    for mode, timings in results.items():
+        for name, seconds in timings.items():
+            previous = baseline.get(mode, dict()).get(name)
+            # Timings too short to measure reliably are not compared.
+            if previous is None or max(previous, seconds) < min_seconds:
+                continue
+            ratio = seconds / previous
+            marker = "  REGRESSION" if ratio > threshold else ""
+            print(
+                f"{mode:>8} {name:>14} {previous:>10.4f} -> {seconds:>10.4f} ({ratio:.2f}x){marker}"
+            )
+            if marker:
+                regressions.append(f"{mode} {name}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--width", type=int, default=3)
+    parser.add_argument("--files-per-dir", type=int, default=2)
+    parser.add_argument("--sizes", default="64,4K,256K")
+    parser.add_argument("--modes", default=DEFAULT_MODES)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", type=Path, default=None)
+    parser.add_argument("--json", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--min-seconds", type=float, default=0.01)
+    args = parser.parse_args()
+
+    spec = SyntheticSpec(
+        targets=args.targets,
+        depth=args.depth,
+        width=args.width,
+        files_per_dir=args.files_per_dir,
+        file_sizes=tuple(parse_size(size) for size in args.sizes.split(",")),
+    )
+    spec_dict = json.loads(json.dumps(asdict(spec)))
+    results: dict[str, dict[str, float]] = dict()
+    for mode in args.modes.split(","):
+        mode = cast(DotfileMode, mode)
+        runs = list()
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+                runs.append(run_once(Path(tmp_dir), spec, mode, args.jobs))
+        results[mode] = {
+            name: statistics.median(run[name] for run in runs) for name in runs[0]
+        }
+        for name, seconds in results[mode].items():
+            print(f"{mode:>8} {name:>14} {seconds:>10.4f} s")
+
+    if args.json is not None:
+        output = {
+            "spec": spec_dict,
+            "jobs": args.jobs,
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "results": results,
+        }
+        args.json.write_text(json.dumps(output, indent=2))
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("spec") != spec_dict:
+            print("Warning: the baseline was recorded with a different project shape.")
+        regressions = compare(
+            results, baseline["results"], args.threshold, args.min_seconds
+        )
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.threshold:.2f}x")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Track the startup cost of each dotman subcommand.
+
+    uv run python benchmarks/bench_startup.py
+    uv run python benchmarks/bench_startup.py --repeat 20 --json startup.json
+
+Wall time is measured without instrumentation. A separate run with
+`python -X importtime` attributes the import time to top-level modules.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SUBCOMMANDS = ["init", "add", "setup", "edit", "status", "sync", "example"]
+
+
+def command_lines(project: Path) -> dict[str, list[str]]:
+    commands = {"--help": ["--help"]}
+    for subcommand in SUBCOMMANDS:
+        commands[f"{subcommand} --help"] = [subcommand, "--help"]
+    commands["status"] = ["status", project.as_posix()]
+    commands["status --no-cache"] = ["status", "--no-cache", project.as_posix()]
+    return commands
+
+
+def run(args: list[str], env: dict[str, str], importtime: bool = False) -> str:
+    python_args = ["-X", "importtime"] if importtime else []
+    completed = subprocess.run(
+        [sys.executable, *python_args, "-m", "dotman", *args],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return completed.stderr
+
+
+def top_level_imports(importtime_output: str) -> dict[str, float]:
+    # Lines look like "import time:  self [us] | cumulative | package", nested
+    # imports are indented with two spaces per level.
+    result: dict[str, float] = dict()
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith("  "):
+            continue
+        result[name.strip()] = int(cumulative) / 1000
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--json", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, HOME=Path(tmp_dir, "home").as_posix())
+        run(["example", "complete-with-copy", tmp_dir], env)
+        project = Path(tmp_dir, "home/project")
+        for name, command in command_lines(project).items():
+            run(command, env)  # warm the filesystem cache
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run(command, env)
+                timings.append((time.perf_counter() - start) * 1000)
+            imports = top_level_imports(run(command, env, importtime=True))
+            heaviest = sorted(imports.items(), key=lambda item: -item[1])[: args.top]
+            results[name] = {
+                "wall_ms_median": statistics.median(timings),
+                "wall_ms_min": min(timings),
+                "import_ms": sum(imports.values()),
+                "heaviest_imports_ms": dict(heaviest),
+            }
+            heaviest_str = ", ".join(f"{m} {ms:.1f}" for m, ms in heaviest)
+            print(
+                f"{name:<22} {statistics.median(timings):>8.1f} ms  (imports: {heaviest_str})"
+            )
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
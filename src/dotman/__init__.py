@@ -1,7 +1,9 @@
-import logging
-from dotman.util import logger_setup
+# Public helpers are loaded on first access, so that importing dotman stays cheap.
 
-logger = logging.getLogger(__name__)
-logger_setup(logger)
 
-del logger_setup
+def __getattr__(name: str):
+    if name == "transaction":
+        from dotman.session import transaction
+
+        return transaction
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,3 @@
+from dotman.cli import main
+
+main()
@@ -1,29 +1,58 @@
+import os
 from pathlib import Path
 import shutil
 from dotman.config import CONFIG_FILE_NAME, Config
 from dotman.context import DotfileMode
+from dotman.exceptions import DotmanException
+from dotman.fileops import copy_path, symlink
+from dotman.manifest import Manifest, copy_recorded
 from dotman.util import format_dotfile_path, format_target_path, resolve_path
 
 
-def _add(
-    project: Path, dotfile: Path, target: Path, *, dotfile_mode: DotfileMode = "symlink"
+def _add_to_config(
+    config: Config,
+    project: Path,
+    dotfile: Path,
+    target: Path,
+    *,
+    dotfile_mode: DotfileMode = "symlink",
+    manifest: Manifest | None = None,
 ) -> None:
     full_target = resolve_path(Path(project, target))
     formatted_target = format_target_path(target, project)
     formatted_dotfile = format_dotfile_path(dotfile)
-    config = Config.from_project(project)
-    config.dotfiles[formatted_target] = formatted_dotfile
-    dotman_config_path = Path(project, CONFIG_FILE_NAME)
+    if formatted_target in config.dotfiles:
+        raise DotmanException(
+            f"Cannot add {dotfile.as_posix()} as target {formatted_target}, as the target is already configured in project {project.as_posix()}."
+        )
+    if os.path.lexists(full_target):
+        raise DotmanException(
+            f"Cannot add {dotfile.as_posix()} as target {formatted_target}, as {full_target.as_posix()} already exists in project {project.as_posix()}."
+        )
 
     if dotfile_mode == "symlink":
         shutil.move(dotfile, full_target)
-        dotfile.symlink_to(full_target)
-    elif dotfile_mode == "copy":
-        if dotfile.is_file():
-            shutil.copy2(dotfile, full_target)
-        else:
-            shutil.copytree(dotfile, full_target)
-    config.write(dotman_config_path)
+        symlink(dotfile, full_target)
+    elif dotfile_mode == "copy" and manifest is not None:
+        manifest.set(
+            formatted_target,
+            copy_recorded(dotfile, full_target, dotfile, manifest.algorithm),
+        )
+    else:
+        copy_path(dotfile, full_target, dotfile_mode)
+    config.dotfiles[formatted_target] = formatted_dotfile
+
+
+def _add(
+    project: Path, dotfile: Path, target: Path, *, dotfile_mode: DotfileMode = "symlink"
+) -> None:
+    config = Config.from_project(project)
+    manifest = Manifest.from_project(project, config.settings.hash_algorithm)
+    _add_to_config(
+        config, project, dotfile, target, dotfile_mode=dotfile_mode, manifest=manifest
+    )
+    config.write(Path(project, CONFIG_FILE_NAME))
+    manifest.save()
 
 
 def add(
@@ -0,0 +1,211 @@
+"""Async counterparts of the dotman API, for use from an asyncio event loop.
+
+Every call runs the blocking implementation in a worker thread, in a copy of
+the context of the calling task, so a Context set with managed_context in a
+task, or passed as context, applies to that call only. At most
+DEFAULT_CONCURRENCY calls run at once per event loop, see set_concurrency, and
+project-wide calls overlap the I/O of their targets over jobs threads.
+
+Cancelling a call stops the operation at its next target or file, and waits
+for it to clean up before CancelledError is raised. An interrupted setup or
+sync of a whole project can then be resumed, see dotman.journal.
+"""
+
+from __future__ import annotations
+import asyncio
+from collections.abc import Generator
+from contextlib import nullcontext
+import functools
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Callable, TypeVar
+import weakref
+
+from dotman import add as _add
+from dotman import edit as _edit
+from dotman import setup as _setup
+from dotman import status as _status
+from dotman import sync as _sync
+from dotman.context import Context, DotfileMode, Platform, PlatformLiteral
+from dotman.context import managed_context
+from dotman.status import DotfileLinkStatus, DotfileProjectStatus
+from dotman.sync import SyncResult
+from dotman.util import cancellable
+
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_JOBS = 4
+
+_concurrency = DEFAULT_CONCURRENCY
+_limiters: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def set_concurrency(limit: int) -> None:
+    """Set the number of calls run at once per event loop, for loops not yet using dotman."""
+    global _concurrency
+    _concurrency = limit
+
+
+def _limiter() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(_concurrency)
+        _limiters[loop] = limiter
+    return limiter
+
+
+async def _run(
+    func: Callable[..., R], *args: object, context: Context | None, **kwargs: object
+) -> R:
+    cancelled = threading.Event()
+
+    def call() -> R:
+        with managed_context(context) if context is not None else nullcontext():
+            with cancellable(cancelled):
+                return func(*args, **kwargs)
+
+    async with _limiter():
+        # asyncio.to_thread runs call in a copy of the context of this task.
+        future = asyncio.ensure_future(asyncio.to_thread(call))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            await asyncio.wait({future})
+            raise
+
+
+async def add(
+    dotfile: Path | str,
+    target: Path | str | None = None,
+    project: Path | str | None = None,
+    *,
+    dotfile_mode: DotfileMode = "symlink",
+    context: Context | None = None,
+) -> None:
+    await _run(
+        _add.add,
+        dotfile,
+        target,
+        project,
+        dotfile_mode=dotfile_mode,
+        context=context,
+    )
+
+
+async def edit(
+    target: Path | str,
+    dotfile: Path | str,
+    project: Path | str | None = None,
+    platform: Platform | PlatformLiteral | None = None,
+    *,
+    context: Context | None = None,
+) -> None:
+    await _run(_edit.edit, target, dotfile, project, platform, context=context)
+
+
+async def setup(
+    target: Path | str,
+    project: Path | str | None = None,
+    *,
+    dotfile_mode: DotfileMode | None = None,
+    context: Context | None = None,
+) -> None:
+    await _run(
+        _setup.setup, target, project, dotfile_mode=dotfile_mode, context=context
+    )
+
+
+async def setup_project(
+    project: Path | str | None = None,
+    *,
+    dotfile_mode: DotfileMode | None = None,
+    jobs: int = DEFAULT_JOBS,
+    resume: bool = False,
+    context: Context | None = None,
+) -> None:
+    await _run(
+        _setup.setup_project,
+        project,
+        dotfile_mode=dotfile_mode,
+        jobs=jobs,
+        resume=resume,
+        context=context,
+    )
+
+
+async def sync(
+    target: Path | str,
+    project: Path | str | None = None,
+    *,
+    context: Context | None = None,
+) -> SyncResult:
+    return await _run(_sync.sync, target, project, context=context)
+
+
+async def sync_project(
+    project: Path | str | None = None,
+    *,
+    jobs: int = DEFAULT_JOBS,
+    resume: bool = False,
+    context: Context | None = None,
+) -> list[SyncResult]:
+    return await _run(
+        _sync.sync_project, project, jobs=jobs, resume=resume, context=context
+    )
+
+
+async def status(
+    project: Path | str | None = None,
+    *,
+    use_cache: bool = True,
+    jobs: int = DEFAULT_JOBS,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+    context: Context | None = None,
+) -> DotfileProjectStatus:
+    return await _run(
+        _status.status,
+        project,
+        use_cache=use_cache,
+        jobs=jobs,
+        first_difference=first_difference,
+        trust_mtime=trust_mtime,
+        context=context,
+    )
+
+
+async def iter_status(
+    project: Path | str | None = None,
+    *,
+    use_cache: bool = True,
+    jobs: int = DEFAULT_JOBS,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+    context: Context | None = None,
+) -> AsyncIterator[DotfileLinkStatus]:
+    """Yield the status of each link of a project, in configuration order, as it is computed."""
+    links = await _run(
+        _status.iter_status,
+        project,
+        use_cache=use_cache,
+        jobs=jobs,
+        first_difference=first_difference,
+        trust_mtime=trust_mtime,
+        context=context,
+    )
+    next_link = functools.partial(next, links, None)
+    try:
+        while True:
+            link = await _run(next_link, context=context)
+            if link is None:
+                return
+            yield link
+    finally:
+        # Closing the generator saves the hash cache.
+        if isinstance(links, Generator):
+            await _run(links.close, context=context)
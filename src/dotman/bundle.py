@@ -0,0 +1,386 @@
+"""Bundles, a project and its files in one compressed tar archive.
+
+A bundle holds, in order, a header, the configuration and ignore files of the
+project, the files of its targets, and a trailer with the size and digest of
+every file. The project is stored under project/, so that `tar -xf` extracts
+it. Bundles are written and read as a single sequential stream, so they can be
+piped, and dotfiles are set up from one without the project on disk.
+"""
+
+from __future__ import annotations
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+import hashlib
+import io
+import json
+import os
+from pathlib import Path, PurePosixPath
+import shutil
+import stat
+import tarfile
+import tempfile
+from typing import IO, Literal
+
+from dotman.compiled import CompiledConfig, load_compiled_config
+from dotman.constants import CONFIG_FILE_NAME, IGNORE_FILE_NAME
+from dotman.exceptions import DotmanException
+from dotman.fileops import COPY_BUFFER_SIZE
+from dotman.ignore import IgnoreRules
+from dotman.plan import PlanEntry, plan_from_config
+from dotman.profiling import count, timed
+from dotman.setup import _check_setup_entry
+from dotman.util import check_cancelled, resolve_path
+from dotman.walk import classify, list_dir
+
+BUNDLE_VERSION = 1
+HEADER_NAME = "bundle.json"
+TRAILER_NAME = "digests.json"
+PROJECT_DIR = "project"
+
+Compression = Literal["gz", "bz2", "xz", "none"]
+
+
+class _HashingReader:
+    """Hash the bytes of a file as tarfile reads them into the archive."""
+
+    def __init__(self, f: IO[bytes], algorithm: str) -> None:
+        self.f = f
+        self.hash = hashlib.new(algorithm)
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.hash.update(data)
+        count("bytes_read", len(data))
+        return data
+
+
+def _add_json(tar: tarfile.TarFile, name: str, data: dict) -> None:
+    content = json.dumps(data).encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    tar.addfile(info, io.BytesIO(content))
+
+
+def _tar_info(name: str, stat_result: os.stat_result, is_dir: bool) -> tarfile.TarInfo:
+    # Owners are not stored, as files are set up for the user reading the bundle.
+    info = tarfile.TarInfo(name)
+    info.type = tarfile.DIRTYPE if is_dir else tarfile.REGTYPE
+    info.mode = stat.S_IMODE(stat_result.st_mode)
+    info.mtime = stat_result.st_mtime
+    if not is_dir:
+        info.size = stat_result.st_size
+    return info
+
+
+class _BundleWriter:
+    def __init__(self, tar: tarfile.TarFile, algorithm: str) -> None:
+        self.tar = tar
+        self.algorithm = algorithm
+        self.digests: dict[str, list] = dict()
+
+    def add_file(self, path: Path | str, name: str) -> None:
+        check_cancelled()
+        with open(path, "rb") as f:
+            info = _tar_info(name, os.fstat(f.fileno()), is_dir=False)
+            reader = _HashingReader(f, self.algorithm)
+            self.tar.addfile(info, reader)
+        self.digests[name] = [info.size, reader.hash.hexdigest()]
+
+    def add_tree(self, root: Path, name: str, ignore: IgnoreRules | None) -> None:
+        # Symlinks are followed and ignored paths left out, as by copy_tree.
+        pending = [(os.fspath(root), name, "")]
+        while pending:
+            directory, directory_name, prefix = pending.pop()
+            self.tar.addfile(_tar_info(directory_name, os.stat(directory), True))
+            files, dirs = list_dir(
+                directory, follow_dir_symlinks=True, ignore=ignore, prefix=prefix
+            )
+            for file_name in sorted(files):
+                self.add_file(files[file_name].path, f"{directory_name}/{file_name}")
+            for dir_name in sorted(dirs, reverse=True):
+                pending.append(
+                    (
+                        dirs[dir_name].path,
+                        f"{directory_name}/{dir_name}",
+                        f"{prefix}{dir_name}/",
+                    )
+                )
+
+
+def _export_bundle(project: Path, output: IO[bytes], compression: Compression) -> int:
+    config = load_compiled_config(project)
+    mode = "w|" if compression == "none" else f"w|{compression}"
+    # The stream modes of tarfile.open are typed as literals, one per overload.
+    tar_file = tarfile.open(fileobj=output, mode=mode)  # type: ignore[call-overload]
+    with timed("copy"), tar_file as tar:
+        writer = _BundleWriter(tar, config.hash_algorithm)
+        _add_json(
+            tar,
+            HEADER_NAME,
+            {
+                "version": BUNDLE_VERSION,
+                "project": project.as_posix(),
+                "hash_algorithm": config.hash_algorithm,
+                "targets": config.targets(),
+            },
+        )
+        for file_name in (CONFIG_FILE_NAME, IGNORE_FILE_NAME):
+            if Path(project, file_name).is_file():
+                writer.add_file(Path(project, file_name), f"{PROJECT_DIR}/{file_name}")
+        for target in config.targets():
+            target_path = classify(Path(project, target))
+            name = f"{PROJECT_DIR}/{target}"
+            if target_path.is_dir:
+                writer.add_tree(target_path.path, name, config.ignore_rules(target))
+            elif target_path.is_file:
+                writer.add_file(target_path.path, name)
+            else:
+                raise DotmanException(
+                    f"Cannot bundle target {target}, as it does not exist in project {project.as_posix()}."
+                )
+        _add_json(tar, TRAILER_NAME, {"files": writer.digests})
+    return len(writer.digests)
+
+
+def export_bundle(
+    output: Path | str | IO[bytes],
+    project: Path | str | None = None,
+    *,
+    compression: Compression = "gz",
+) -> int:
+    """Write a project and the files of its targets into a bundle, returning the number of files.
+
+    output is a path, or a binary stream, such as stdout, written sequentially.
+    """
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    if isinstance(output, (str, Path)):
+        with open(output, "wb") as f:
+            return _export_bundle(project, f, compression)
+    return _export_bundle(project, output, compression)
+
+
+@dataclass
+class _Staged:
+    """A dotfile being extracted into a temporary path next to it."""
+
+    entry: PlanEntry
+    path: Path
+    directories: list[tuple[Path, tarfile.TarInfo]] = field(
+        default_factory=lambda: list()
+    )
+
+    def discard(self) -> None:
+        if self.path.is_dir():
+            shutil.rmtree(self.path, ignore_errors=True)
+        else:
+            self.path.unlink(missing_ok=True)
+
+
+class _BundleReader:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.algorithm = ""
+        self.project = Path()
+        self.entries: dict[str, PlanEntry] = dict()
+        self.staged: dict[str, _Staged] = dict()
+        self.digests: dict[str, list] = dict()
+
+    def corrupt(self, reason: str) -> DotmanException:
+        return DotmanException(f"Bundle {self.name} is corrupt, {reason}.")
+
+    def read_json(self, tar: tarfile.TarFile, member: tarfile.TarInfo) -> dict:
+        f = tar.extractfile(member)
+        if f is None:
+            raise self.corrupt(f"{member.name} is not a file")
+        try:
+            data = json.loads(f.read())
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            raise self.corrupt(f"{member.name} is not a JSON object")
+        return data
+
+    def read_header(self, tar: tarfile.TarFile, member: tarfile.TarInfo | None) -> None:
+        if member is None or member.name != HEADER_NAME:
+            raise self.corrupt(f"it does not start with {HEADER_NAME}")
+        header = self.read_json(tar, member)
+        if header.get("version") != BUNDLE_VERSION:
+            raise DotmanException(
+                f"Bundle {self.name} has version {header.get('version')}, while version {BUNDLE_VERSION} is supported."
+            )
+        self.algorithm = str(header.get("hash_algorithm"))
+        if self.algorithm not in hashlib.algorithms_available:
+            raise self.corrupt(f"its hash algorithm {self.algorithm} is not supported")
+        self.project = Path(str(header.get("project")))
+
+    def read_config(self, tar: tarfile.TarFile, member: tarfile.TarInfo | None) -> None:
+        if member is None or member.name != f"{PROJECT_DIR}/{CONFIG_FILE_NAME}":
+            raise self.corrupt(f"its configuration file does not follow {HEADER_NAME}")
+        f = tar.extractfile(member)
+        if f is None:
+            raise self.corrupt(f"{member.name} is not a file")
+        content, digest = f.read(), hashlib.new(self.algorithm)
+        digest.update(content)
+        self.digests[member.name] = [len(content), digest.hexdigest()]
+        import toml
+        from dotman.config import Config
+
+        # The configuration is parsed before the trailer is read, so a corrupt
+        # one cannot be told apart from an invalid one.
+        try:
+            config: CompiledConfig = Config.from_dict(
+                toml.loads(content.decode("utf-8"))
+            ).compile()
+        except ValueError as e:
+            raise self.corrupt(f"its configuration cannot be parsed: {e}")
+        except DotmanException as e:
+            raise self.corrupt(f"its configuration is invalid: {e.message.rstrip('.')}")
+        plan = plan_from_config(self.project, config, "setup", "copy")
+        # Like setup, every target is checked before any dotfile is created.
+        for entry in plan.linked_entries():
+            _check_setup_entry(self.project, entry)
+            self.entries[entry.target] = entry
+
+    def _entry_of(self, relative: str) -> tuple[PlanEntry, str]:
+        parts = PurePosixPath(relative).parts
+        if relative.startswith("/") or ".." in parts:
+            raise self.corrupt(f"it has a member {relative} outside of its project")
+        for i in range(len(parts), 0, -1):
+            entry = self.entries.get("/".join(parts[:i]))
+            if entry is not None:
+                return entry, "/".join(parts[i:])
+        raise self.corrupt(f"{relative} is not in a configured target")
+
+    def _stage(self, entry: PlanEntry, is_dir: bool) -> _Staged:
+        staged = self.staged.get(entry.target)
+        if staged is not None:
+            return staged
+        dotfile = entry.dotfile_path
+        os.makedirs(dotfile.parent, exist_ok=True)
+        if is_dir:
+            path = tempfile.mkdtemp(
+                prefix=f".{dotfile.name}.", suffix=".tmp", dir=dotfile.parent
+            )
+        else:
+            fd, path = tempfile.mkstemp(
+                prefix=f".{dotfile.name}.", suffix=".tmp", dir=dotfile.parent
+            )
+            os.close(fd)
+        staged = _Staged(entry, Path(path))
+        self.staged[entry.target] = staged
+        return staged
+
+    def extract(self, tar: tarfile.TarFile, member: tarfile.TarInfo) -> None:
+        check_cancelled()
+        if member.name == f"{PROJECT_DIR}/{IGNORE_FILE_NAME}":
+            self.extract_file(tar, member, None)
+            return
+        if not member.name.startswith(f"{PROJECT_DIR}/"):
+            raise self.corrupt(f"it has an unexpected member {member.name}")
+        entry, relative = self._entry_of(member.name[len(PROJECT_DIR) + 1 :])
+        staged = self._stage(entry, member.isdir() and relative == "")
+        path = Path(staged.path, relative) if relative else staged.path
+        if member.isdir():
+            if relative:
+                path.mkdir()
+            staged.directories.append((path, member))
+        elif member.isfile():
+            self.extract_file(tar, member, path)
+        else:
+            raise self.corrupt(f"{member.name} is neither a file nor a directory")
+
+    def extract_file(
+        self, tar: tarfile.TarFile, member: tarfile.TarInfo, path: Path | None
+    ) -> None:
+        source = tar.extractfile(member)
+        if source is None:
+            raise self.corrupt(f"{member.name} is not a file")
+        digest = hashlib.new(self.algorithm)
+        with ExitStack() as stack:
+            destination = (
+                None if path is None else stack.enter_context(open(path, "wb"))
+            )
+            while chunk := source.read(COPY_BUFFER_SIZE):
+                digest.update(chunk)
+                if destination is not None:
+                    destination.write(chunk)
+        self.digests[member.name] = [member.size, digest.hexdigest()]
+        if path is not None:
+            os.chmod(path, member.mode)
+            os.utime(path, (member.mtime, member.mtime))
+            count("files_copied")
+            count("bytes_written", member.size)
+
+    def verify(self, trailer: dict) -> None:
+        expected = trailer.get("files")
+        if not isinstance(expected, dict):
+            raise self.corrupt(f"{TRAILER_NAME} has no digests")
+        for name, record in self.digests.items():
+            if expected.get(name) != record:
+                raise self.corrupt(f"{name} does not match its digest")
+        missing = [name for name in expected if name not in self.digests]
+        if missing:
+            raise self.corrupt(f"{missing[0]} is missing")
+        for target in self.entries:
+            if target not in self.staged:
+                raise self.corrupt(f"target {target} is missing")
+
+    def install(self) -> list[Path]:
+        installed = list()
+        for staged in self.staged.values():
+            for path, member in reversed(staged.directories):
+                os.chmod(path, member.mode)
+                os.utime(path, (member.mtime, member.mtime))
+        for target, entry in self.entries.items():
+            staged = self.staged.pop(target)
+            if os.path.lexists(entry.dotfile_path):
+                staged.discard()
+                raise DotmanException(
+                    f"Cannot setup target {target}, in project {self.project.as_posix()}, as the dotfile path {entry.dotfile_path.as_posix()} already is occupied."
+                )
+            os.rename(staged.path, entry.dotfile_path)
+            installed.append(entry.dotfile_path)
+        return installed
+
+
+def _setup_from_bundle(source: IO[bytes], name: str) -> list[Path]:
+    reader = _BundleReader(name)
+    try:
+        with timed("copy"), tarfile.open(fileobj=source, mode="r|*") as tar:
+            members = iter(tar)
+            reader.read_header(tar, next(members, None))
+            reader.read_config(tar, next(members, None))
+            for member in members:
+                if member.name == TRAILER_NAME:
+                    reader.verify(reader.read_json(tar, member))
+                    break
+                reader.extract(tar, member)
+            else:
+                raise reader.corrupt(f"it ends before {TRAILER_NAME}")
+        return reader.install()
+    except tarfile.TarError as e:
+        raise reader.corrupt(str(e))
+    except OSError as e:
+        raise DotmanException(f"Cannot setup from bundle {reader.name}, as {e}.")
+    finally:
+        # Dotfiles not yet renamed into place are removed on failure.
+        for staged in reader.staged.values():
+            staged.discard()
+
+
+def setup_from_bundle(source: Path | str | IO[bytes]) -> list[Path]:
+    """Set up the dotfiles of a project as copies of the files in a bundle.
+
+    The bundle, a path or a binary stream such as stdin, is read in a single
+    pass. Dotfiles are extracted next to their final path, and renamed into
+    place only once every file matched its digest, so a corrupt or truncated
+    bundle leaves nothing behind. Returns the dotfile paths set up.
+    """
+    if isinstance(source, (str, Path)):
+        path = resolve_path(source)
+        with open(path, "rb") as f:
+            return _setup_from_bundle(f, path.as_posix())
+    return _setup_from_bundle(source, str(getattr(source, "name", "<stream>")))
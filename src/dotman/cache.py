@@ -0,0 +1,109 @@
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+from dotman.constants import STATE_DIR_NAME
+from dotman.util import (
+    DEFAULT_HASH_ALGORITHM,
+    digest_of_file,
+    make_state_dir,
+    write_atomic,
+)
+from dotman.walk import FileRef, stat_of
+
+
+HASH_CACHE_FILE_NAME = "hash-cache.json"
+HASH_CACHE_VERSION = 1
+
+# Files modified this recently may still be changing within the timestamp
+# granularity of the filesystem, so their digests are not stored.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def _signature(stat_result: os.stat_result) -> list[int]:
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+
+class HashCache:
+    """Digest cache keyed on path, reusing digests while (size, mtime, inode) is unchanged."""
+
+    def __init__(
+        self, path: Path | None = None, algorithm: str = DEFAULT_HASH_ALGORITHM
+    ) -> None:
+        self.path = path
+        self.algorithm = algorithm
+        # path -> [size, mtime_ns, inode, digest]
+        self._entries: dict[str, list] = dict()
+        self._used: set[str] = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path is not None:
+            self._load(path)
+
+    @classmethod
+    def from_project(
+        cls, project: Path, algorithm: str = DEFAULT_HASH_ALGORITHM
+    ) -> HashCache:
+        return cls(Path(project, STATE_DIR_NAME, HASH_CACHE_FILE_NAME), algorithm)
+
+    def _load(self, path: Path) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != HASH_CACHE_VERSION:
+            return
+        if data.get("algorithm") != self.algorithm:
+            self._dirty = True
+            return
+        entries = data.get("entries")
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def digest(self, file_path: FileRef) -> str:
+        key = os.fspath(file_path)
+        stat_result = stat_of(file_path)
+        signature = _signature(stat_result)
+        self._used.add(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry[:3] == signature:
+            return str(entry[3])
+        digest = digest_of_file(file_path, self.algorithm)
+        with self._lock:
+            if time.time_ns() - stat_result.st_mtime_ns > RACY_WINDOW_NS:
+                self._entries[key] = [*signature, digest]
+                self._dirty = True
+            elif key in self._entries:
+                del self._entries[key]
+                self._dirty = True
+        return digest
+
+    def evict_stale(self) -> None:
+        for key in [k for k in self._entries if k not in self._used]:
+            try:
+                signature = _signature(os.stat(key))
+            except OSError:
+                signature = None
+            if signature != self._entries[key][:3]:
+                del self._entries[key]
+                self._dirty = True
+
+    def save(self) -> None:
+        self.evict_stale()
+        if self.path is None or not self._dirty:
+            return
+        data = {
+            "version": HASH_CACHE_VERSION,
+            "algorithm": self.algorithm,
+            "entries": self._entries,
+        }
+        try:
+            make_state_dir(self.path.parent)
+            write_atomic(self.path, json.dumps(data))
+        except OSError:
+            return
+        self._dirty = False
@@ -1,16 +1,14 @@
 from pathlib import Path
+import logging
+import os
 import sys
-from typing import get_args
+from typing import Literal, get_args
 import click
-from dotman.status import status
-from dotman.context import DotfileMode, Platform
-from dotman.edit import edit
+from dotman.context import DotfileMode, Platform, Stage
 from dotman.exceptions import DotmanException
-from dotman.setup import setup, setup_project
-from dotman.add import add
-from dotman.examples import Stage, setup_folder_structure
-from dotman.init import init
-from dotman.sync import sync, sync_project
+
+# Command implementations are imported inside each command, so that only the
+# modules of the invoked command (and pydantic/toml through them) are loaded.
 
 
 def cli_error_handler(f):
@@ -30,11 +28,13 @@ def cli_error_handler(f):
 def init_project(project: Path | None) -> None:
     if project is None:
         project = Path(".")
+    from dotman.init import init
+
     init(project=project)
 
 
 @click.command("add")
-@click.argument("dotfile", type=click.Path(path_type=Path), required=True)
+@click.argument("dotfiles", type=click.Path(path_type=Path), nargs=-1, required=True)
 @click.option(
     "-p",
     "--project",
@@ -57,11 +57,44 @@ def init_project(project: Path | None) -> None:
 )
 @cli_error_handler
 def add_dotfile(
-    dotfile: Path, project: Path, target: Path | None, dotfile_mode: DotfileMode
+    dotfiles: tuple[Path, ...],
+    project: Path,
+    target: Path | None,
+    dotfile_mode: DotfileMode,
 ) -> None:
-    if target is None:
-        target = Path(dotfile.name)
-    add(project=project, dotfile=dotfile, target=target, dotfile_mode=dotfile_mode)
+    if target is not None and len(dotfiles) > 1:
+        raise DotmanException("A target can only be given when adding one dotfile.")
+    names = [dotfile.name for dotfile in dotfiles]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise DotmanException(
+            f"Dotfiles sharing the name {duplicates[0]} cannot be added at once, add them one by one with --target."
+        )
+    from dotman.session import transaction
+
+    with transaction(project) as tx:
+        for dotfile in dotfiles:
+            tx.add(dotfile, target=target, dotfile_mode=dotfile_mode)
+
+
+def _check_checkpoint_options(
+    target: Path | None, workspace: Path | None, resume: bool, rollback: bool
+) -> None:
+    if not resume and not rollback:
+        return
+    if resume and rollback:
+        raise DotmanException("Only one of --resume and --rollback can be given.")
+    if target is not None or workspace is not None:
+        raise DotmanException(
+            "Only a whole project can be resumed or rolled back, without a target or workspace."
+        )
+
+
+def _rollback(project: Path) -> None:
+    from dotman.journal import rollback
+
+    for path in rollback(project):
+        click.echo(f"Removed {path.as_posix()}")
 
 
 @click.command("setup")
@@ -77,12 +110,92 @@ def add_dotfile(
     "--mode",
     "dotfile_mode",
     type=click.Choice(get_args(DotfileMode)),
-    default="symlink",
+    default=None,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "-w",
+    "--workspace",
+    "workspace",
+    type=click.Path(path_type=Path),
+    default=None,
+)
+@click.option(
+    "--dry-run",
+    "dry_run",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--resume",
+    "resume",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--rollback",
+    "rollback",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--from-bundle",
+    "bundle",
+    type=click.Path(path_type=Path, allow_dash=True),
+    default=None,
 )
 @cli_error_handler
-def setup_target(project: Path, target: Path | None, dotfile_mode: DotfileMode) -> None:
-    if target is None:
-        setup_project(project=project, dotfile_mode=dotfile_mode)
+def setup_target(
+    project: Path,
+    target: Path | None,
+    dotfile_mode: DotfileMode | None,
+    jobs: int,
+    workspace: Path | None,
+    dry_run: bool,
+    resume: bool,
+    rollback: bool,
+    bundle: Path | None,
+) -> None:
+    from dotman.setup import setup, setup_plan, setup_project
+
+    _check_checkpoint_options(target, workspace, resume, rollback)
+    if bundle is not None:
+        if target is not None or workspace is not None or dry_run or resume or rollback:
+            raise DotmanException(
+                "A bundle is set up as a whole, without a target, workspace, --dry-run, --resume or --rollback."
+            )
+        # Dotfiles are always extracted from a bundle as copies.
+        if dotfile_mode not in (None, "copy"):
+            raise DotmanException(
+                f"A bundle is set up as copies, so it cannot be set up with --mode {dotfile_mode}."
+            )
+        from dotman.bundle import setup_from_bundle
+
+        with click.open_file(os.fspath(bundle), "rb") as f:
+            setup_from_bundle(f)
+    elif rollback:
+        _rollback(project)
+    elif dry_run:
+        if workspace is not None:
+            raise DotmanException("A dry run cannot be done for a workspace.")
+        plan = setup_plan(target, project, dotfile_mode=dotfile_mode, jobs=jobs)
+        click.echo(plan.describe())
+    elif workspace is not None:
+        if target is not None:
+            raise DotmanException("A target cannot be given with a workspace.")
+        from dotman.workspace import workspace_setup
+
+        workspace_setup(workspace, dotfile_mode=dotfile_mode, jobs=jobs)
+    elif target is None:
+        setup_project(
+            project=project, dotfile_mode=dotfile_mode, jobs=jobs, resume=resume
+        )
     else:
         setup(project=project, target=target, dotfile_mode=dotfile_mode)
 
@@ -107,6 +220,8 @@ def setup_target(project: Path, target: Path | None, dotfile_mode: DotfileMode)
 def edit_target(
     project: Path, target: Path, dotfile: Path, platform: Platform | None
 ) -> None:
+    from dotman.edit import edit
+
     edit(project=project, target=target, dotfile=dotfile, platform=platform)
 
 
@@ -117,23 +232,127 @@ def edit_target(
 def example_setup(stage: Stage, folder: Path | None) -> None:
     if folder is None:
         folder = Path(".")
+    from dotman.examples import setup_folder_structure
+
     setup_folder_structure(root_folder=folder, stage=stage)
 
 
 @click.command("status")
 @click.argument("project", type=click.Path(path_type=Path), required=False)
+@click.option(
+    "-w",
+    "--workspace",
+    "workspace",
+    type=click.Path(path_type=Path),
+    default=None,
+)
+@click.option(
+    "--no-cache",
+    "no_cache",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "--first-difference",
+    "first_difference",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--trust-mtime",
+    "trust_mtime",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "jsonl"]),
+    default="text",
+)
 @cli_error_handler
-def project_status(project: Path | None) -> None:
+def project_status(
+    project: Path | None,
+    workspace: Path | None,
+    no_cache: bool,
+    jobs: int,
+    first_difference: bool,
+    trust_mtime: bool,
+    output_format: str,
+) -> None:
     if project is None:
         project = Path(".")
-    stat = status(project=project)
-    link_msgs = [f"{link.target.as_posix()}: {link.status}" for link in stat.links]
-    link_msg = "\n  ".join(link_msgs)
-    msg = f"""\
-Project {stat.project.name}
-  {link_msg}
-"""
-    click.echo(msg)
+    import json
+    from collections import Counter
+    from dotman.status import iter_status
+    from dotman.util import resolve_path
+
+    if workspace is None:
+        project = resolve_path(project)
+        links = iter_status(
+            project=project,
+            use_cache=not no_cache,
+            jobs=jobs,
+            first_difference=first_difference,
+            trust_mtime=trust_mtime,
+        )
+        project_links = iter([(project, links)])
+        summary_key = {"project": project.as_posix()}
+    else:
+        from dotman.workspace import Workspace, workspace_status
+
+        loaded_workspace = Workspace.from_file(workspace)
+        project_statuses = workspace_status(
+            loaded_workspace,
+            use_cache=not no_cache,
+            jobs=jobs,
+            first_difference=first_difference,
+            trust_mtime=trust_mtime,
+        )
+        project_links = ((stat.project, iter(stat.links)) for stat in project_statuses)
+        summary_key = {"workspace": loaded_workspace.path.as_posix()}
+    counts: Counter[str] = Counter()
+    for linked_project, project_link_statuses in project_links:
+        if output_format == "text":
+            click.echo(f"Project {linked_project.name}")
+        for link in project_link_statuses:
+            counts[link.category] += 1
+            if output_format == "jsonl":
+                line = {
+                    "project": linked_project.as_posix(),
+                    "target": link.target.as_posix(),
+                    "dotfile": link.dotfile.as_posix(),
+                    "category": link.category,
+                    "status": link.status,
+                }
+                click.echo(json.dumps(line))
+            else:
+                click.echo(f"  {link.target.as_posix()}: {link.status}")
+    if output_format == "jsonl":
+        click.echo(json.dumps({**summary_key, "summary": counts}))
+    else:
+        summary = ", ".join(f"{count} {category}" for category, count in counts.items())
+        click.echo(f"  Summary: {summary or 'no targets'}")
+
+
+@click.command("drift")
+@click.argument("project", type=click.Path(path_type=Path), required=False)
+@cli_error_handler
+def project_drift(project: Path | None) -> None:
+    from dotman.status import drift
+
+    for target, drifted in drift(project).items():
+        if len(drifted) == 0:
+            click.echo(f"{target}: unchanged")
+        else:
+            click.echo(f"{target}: {', '.join(path or target for path in drifted)}")
 
 
 @click.command("sync")
@@ -145,27 +364,270 @@ Project {stat.project.name}
     type=click.Path(path_type=Path),
     default=Path("."),
 )
+@click.option(
+    "-j",
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "-w",
+    "--workspace",
+    "workspace",
+    type=click.Path(path_type=Path),
+    default=None,
+)
+@click.option(
+    "--dry-run",
+    "dry_run",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--resume",
+    "resume",
+    is_flag=True,
+    default=False,
+)
+@cli_error_handler
+def sync_target(
+    project: Path,
+    target: Path | None,
+    jobs: int,
+    workspace: Path | None,
+    dry_run: bool,
+    resume: bool,
+) -> None:
+    from dotman.sync import sync, sync_plan, sync_project
+
+    # An interrupted sync only changed files in the project, and is resumed
+    # rather than rolled back, see dotman setup --rollback.
+    _check_checkpoint_options(target, workspace, resume, False)
+    if dry_run:
+        if workspace is not None:
+            raise DotmanException("A dry run cannot be done for a workspace.")
+        click.echo(sync_plan(target, project, jobs=jobs).describe())
+        return
+    if workspace is not None:
+        if target is not None:
+            raise DotmanException("A target cannot be given with a workspace.")
+        from dotman.workspace import workspace_sync
+
+        results = workspace_sync(workspace, jobs=jobs)
+    elif target is None:
+        results = sync_project(project=project, jobs=jobs, resume=resume)
+    else:
+        results = [sync(project=project, target=target)]
+    for result in results:
+        click.echo(
+            f"{result.target.as_posix()}: {result.files_copied} files copied ({result.bytes_copied} bytes), {result.paths_removed} paths removed"
+        )
+
+
+@click.command("fleet")
+@click.argument("operation", type=click.Choice(["setup", "status", "sync"]))
+@click.argument("homes", type=click.Path(path_type=Path), nargs=-1, required=True)
+@click.option(
+    "-p",
+    "--project",
+    "project",
+    type=click.Path(path_type=Path),
+    default=Path("."),
+)
+@click.option(
+    "--mode",
+    "dotfile_mode",
+    type=click.Choice(get_args(DotfileMode)),
+    default="symlink",
+)
+@click.option(
+    "--processes",
+    "processes",
+    type=click.IntRange(min=1),
+    default=None,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "jsonl"]),
+    default="text",
+)
 @cli_error_handler
-def sync_target(project: Path, target: Path | None) -> None:
-    if target is None:
-        sync_project(project=project)
+def fleet_homes(
+    operation: Literal["setup", "status", "sync"],
+    homes: tuple[Path, ...],
+    project: Path,
+    dotfile_mode: DotfileMode,
+    processes: int | None,
+    jobs: int,
+    output_format: str,
+) -> None:
+    import json
+    from collections import Counter
+    from dotman.fleet import fleet, summarize
+
+    results = fleet(
+        operation,
+        homes,
+        project,
+        dotfile_mode=dotfile_mode,
+        processes=processes,
+        jobs=jobs,
+    )
+    for result in results:
+        if output_format == "jsonl":
+            line = {
+                "home": result.home.as_posix(),
+                "ok": result.ok,
+                "error": result.error,
+                "links": result.links,
+                "files_copied": result.files_copied,
+            }
+            click.echo(json.dumps(line))
+        elif result.error is not None:
+            click.echo(f"{result.home.as_posix()}: failed: {result.error}")
+        elif operation == "status":
+            categories = Counter(result.links.values())
+            summary = ", ".join(f"{n} {category}" for category, n in categories.items())
+            click.echo(f"{result.home.as_posix()}: {summary or 'no targets'}")
+        elif operation == "sync":
+            click.echo(f"{result.home.as_posix()}: {result.files_copied} files copied")
+        else:
+            click.echo(f"{result.home.as_posix()}: ok")
+    counts = summarize(results)
+    if output_format == "jsonl":
+        click.echo(json.dumps({"project": project.as_posix(), "summary": counts}))
     else:
-        sync(project=project, target=target)
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        click.echo(f"Summary: {summary}")
+    # A home is not ok when it failed, or for status, when it is not complete.
+    if not all(result.ok for result in results):
+        sys.exit(1)
 
 
-@click.group()
-def cli():
+@click.group("bundle")
+def bundle_group() -> None:
     pass
 
 
+@bundle_group.command("export")
+@click.option(
+    "-p",
+    "--project",
+    "project",
+    type=click.Path(path_type=Path),
+    default=Path("."),
+)
+@click.option(
+    "-o",
+    "--output",
+    "output",
+    type=click.Path(path_type=Path, allow_dash=True),
+    default=Path("-"),
+)
+@click.option(
+    "--compression",
+    "compression",
+    type=click.Choice(["gz", "bz2", "xz", "none"]),
+    default="gz",
+)
+@cli_error_handler
+def bundle_export(
+    project: Path, output: Path, compression: Literal["gz", "bz2", "xz", "none"]
+) -> None:
+    from dotman.bundle import export_bundle
+
+    with click.open_file(os.fspath(output), "wb") as f:
+        files = export_bundle(f, project, compression=compression)
+    if output != Path("-"):
+        click.echo(f"Bundled {files} files into {output.as_posix()}")
+
+
+@click.command("watch")
+@click.option(
+    "-p",
+    "--project",
+    "project",
+    type=click.Path(path_type=Path),
+    default=Path("."),
+)
+@click.option(
+    "--debounce",
+    "debounce",
+    type=click.FloatRange(min=0),
+    default=0.5,
+)
+@cli_error_handler
+def watch_project(project: Path, debounce: float) -> None:
+    from dotman.sync import SyncResult
+    from dotman.watch import watch
+
+    def echo_result(result: SyncResult) -> None:
+        if result.files_copied == 0 and result.paths_removed == 0:
+            return
+        click.echo(
+            f"{result.target.as_posix()}: {result.files_copied} files copied ({result.bytes_copied} bytes), {result.paths_removed} paths removed"
+        )
+
+    try:
+        watch(project=project, debounce=debounce, on_sync=echo_result)
+    except KeyboardInterrupt:
+        pass
+
+
+@click.group()
+@click.option(
+    "--profile",
+    "profile",
+    is_flag=True,
+    default=False,
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool):
+    if profile:
+        from dotman.profiling import profiled
+
+        collected = ctx.with_resource(profiled())
+        ctx.call_on_close(lambda: click.echo(collected.report(), err=True))
+
+
 cli.add_command(init_project)
 cli.add_command(add_dotfile)
 cli.add_command(setup_target)
 cli.add_command(edit_target)
 cli.add_command(project_status)
+cli.add_command(project_drift)
 cli.add_command(sync_target)
+cli.add_command(watch_project)
+cli.add_command(fleet_homes)
+cli.add_command(bundle_group)
 cli.add_command(example_setup)
 
 
 def main() -> None:
-    cli()
+    from dotman.util import logger_setup
+
+    logger_setup(logging.getLogger("dotman"))
+    from dotman.profiling import CPROFILE_ENV_VAR
+
+    cprofile_path = os.environ.get(CPROFILE_ENV_VAR)
+    if not cprofile_path:
+        cli()
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        cli()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(cprofile_path)
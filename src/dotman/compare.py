@@ -0,0 +1,155 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import mmap
+import os
+from pathlib import Path
+from typing import Callable
+
+from dotman.ignore import IgnoreRules
+from dotman.profiling import count, timed
+from dotman.walk import FileRef, list_dir, same_inode, stat_of, walk_files
+
+
+COMPARE_BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+FileEqual = Callable[[FileRef, FileRef], bool]
+
+
+@dataclass
+class TreeDiff:
+    extra: list[str] = field(default_factory=lambda: list())
+    missing: list[str] = field(default_factory=lambda: list())
+    different: list[str] = field(default_factory=lambda: list())
+
+    def is_empty(self) -> bool:
+        return not (self.extra or self.missing or self.different)
+
+
+def _contents_equal(a: FileRef, b: FileRef, size: int) -> bool:
+    with timed("compare"), open(a, "rb") as fa, open(b, "rb") as fb:
+        count("bytes_read", 2 * size)
+        if size >= MMAP_THRESHOLD:
+            with (
+                mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma,
+                mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mb,
+            ):
+                for offset in range(0, size, COMPARE_BUFFER_SIZE):
+                    end = offset + COMPARE_BUFFER_SIZE
+                    if ma[offset:end] != mb[offset:end]:
+                        return False
+                return True
+        while True:
+            chunk_a = fa.read(COMPARE_BUFFER_SIZE)
+            chunk_b = fb.read(COMPARE_BUFFER_SIZE)
+            if chunk_a != chunk_b:
+                return False
+            if not chunk_a:
+                return True
+
+
+def files_equal(
+    a: FileRef,
+    b: FileRef,
+    *,
+    file_hash: Callable[[FileRef], str] | None = None,
+    trust_mtime: bool = False,
+) -> bool:
+    """Compare two files, reading as little as possible.
+
+    Sizes are compared first. With trust_mtime, equal sizes and modification
+    times count as equal content. With file_hash, digests are compared (which is
+    cheap when they are cached), otherwise both files are read in lockstep up to
+    the first differing block. The stat results of DirEntry arguments are reused.
+    """
+    a_stat = stat_of(a)
+    b_stat = stat_of(b)
+    if same_inode(a_stat, b_stat):
+        return True
+    if a_stat.st_size != b_stat.st_size:
+        return False
+    if trust_mtime and a_stat.st_mtime_ns == b_stat.st_mtime_ns:
+        return True
+    if file_hash is not None:
+        return file_hash(a) == file_hash(b)
+    return _contents_equal(a, b, a_stat.st_size)
+
+
+def _list_files(root: str, prefix: str, ignore: IgnoreRules | None) -> list[str]:
+    return [relative for relative, _ in walk_files(root, prefix, ignore)]
+
+
+def _compare_dirs(
+    a: str,
+    b: str,
+    prefix: str,
+    diff: TreeDiff,
+    file_equal: FileEqual,
+    first_difference: bool,
+    ignore: IgnoreRules | None,
+) -> bool:
+    a_files, a_dirs = list_dir(a, ignore=ignore, prefix=prefix)
+    b_files, b_dirs = list_dir(b, ignore=ignore, prefix=prefix)
+    a_file_names = sorted(a_files)
+    a_dir_names = sorted(a_dirs)
+    for name in a_file_names:
+        if name not in b_files:
+            diff.extra.append(prefix + name)
+            if first_difference:
+                return True
+    for name in sorted(b_files):
+        if name not in a_files:
+            diff.missing.append(prefix + name)
+            if first_difference:
+                return True
+    for name in a_dir_names:
+        if name not in b_dirs:
+            extra = _list_files(a_dirs[name].path, f"{prefix}{name}/", ignore)
+            diff.extra.extend(extra)
+            if first_difference and extra:
+                return True
+    for name in sorted(b_dirs):
+        if name not in a_dirs:
+            missing = _list_files(b_dirs[name].path, f"{prefix}{name}/", ignore)
+            diff.missing.extend(missing)
+            if first_difference and missing:
+                return True
+    for name in a_file_names:
+        if name in b_files and not file_equal(a_files[name], b_files[name]):
+            diff.different.append(prefix + name)
+            if first_difference:
+                return True
+    for name in a_dir_names:
+        if name in b_dirs:
+            if _compare_dirs(
+                a_dirs[name].path,
+                b_dirs[name].path,
+                f"{prefix}{name}/",
+                diff,
+                file_equal,
+                first_difference,
+                ignore,
+            ):
+                return True
+    return False
+
+
+def compare_trees(
+    a: Path,
+    b: Path,
+    *,
+    file_equal: FileEqual = files_equal,
+    first_difference: bool = False,
+    ignore: IgnoreRules | None = None,
+) -> TreeDiff:
+    """Compare the files under two directories.
+
+    Paths in the result are relative, '/'-separated strings. With
+    first_difference the walk stops at the first mismatch found. Paths matched
+    by ignore are skipped on both sides.
+    """
+    diff = TreeDiff()
+    _compare_dirs(
+        os.fspath(a), os.fspath(b), "", diff, file_equal, first_difference, ignore
+    )
+    return diff
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from dataclasses import dataclass, field, replace
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from dotman.constants import CONFIG_FILE_NAME, IGNORE_FILE_NAME, STATE_DIR_NAME
+from dotman.context import Platform
+from dotman.exceptions import DotmanException
+from dotman.ignore import IgnoreRules, ignore_rules
+from dotman.profiling import timed
+from dotman.util import make_state_dir, write_atomic
+
+
+CONFIG_CACHE_FILE_NAME = "config-cache.json"
+CONFIG_CACHE_VERSION = 2
+
+# The configurations loaded by this process, with their cache key, so that
+# repeated loads of an unchanged file return the same object.
+_loaded: dict[Path, tuple[list, CompiledConfig]] = dict()
+
+
+@dataclass(frozen=True)
+class CompiledConfig:
+    """A validated configuration, flattened to a target -> dotfile table per platform.
+
+    A dotfile is None for targets that have no link configured for the platform.
+    ignore holds the ignore patterns of the project, and target_ignore those
+    of each target, see dotman.ignore.
+    """
+
+    links: dict[Platform, dict[str, str | None]]
+    hash_algorithm: str
+    ignore: list[str] = field(default_factory=lambda: list())
+    target_ignore: dict[str, list[str]] = field(default_factory=lambda: dict())
+    # Plan entries resolved from the links, per project and context, see dotman.plan.
+    resolved: dict[tuple, tuple] = field(
+        default_factory=lambda: dict(), compare=False, repr=False
+    )
+
+    def dotfiles(self, platform: Platform) -> dict[str, str | None]:
+        return self.links[platform]
+
+    def targets(self) -> list[str]:
+        """Every configured target, linked on any platform or not."""
+        return list(self.links[next(iter(Platform))])
+
+    def ignore_rules(self, target: str) -> IgnoreRules | None:
+        return ignore_rules(target, self.ignore, self.target_ignore.get(target, ()))
+
+    def to_dict(self) -> dict:
+        return {
+            "links": {
+                platform.value: dotfiles for platform, dotfiles in self.links.items()
+            },
+            "hash_algorithm": self.hash_algorithm,
+            "ignore": self.ignore,
+            "target_ignore": self.target_ignore,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> CompiledConfig:
+        return cls(
+            links={
+                Platform(platform): dotfiles
+                for platform, dotfiles in data["links"].items()
+            },
+            hash_algorithm=data["hash_algorithm"],
+            ignore=data["ignore"],
+            target_ignore=data["target_ignore"],
+        )
+
+
+def _read_config_cache(cache_path: Path, key: list) -> CompiledConfig | None:
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CONFIG_CACHE_VERSION or data.get("key") != key:
+            return None
+        return CompiledConfig.from_dict(data["config"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _write_config_cache(cache_path: Path, key: list, config: CompiledConfig) -> None:
+    data = {"version": CONFIG_CACHE_VERSION, "key": key, "config": config.to_dict()}
+    try:
+        make_state_dir(cache_path.parent)
+        write_atomic(cache_path, json.dumps(data))
+    except OSError:
+        return
+
+
+def load_compiled_config(project: Path, *, use_cache: bool = True) -> CompiledConfig:
+    """Load the configuration of a project, reusing the compiled cache when valid.
+
+    The cache is keyed on the size, modification time and digest of the
+    configuration file and of the ignore file of the project, so edits by hand
+    invalidate it. On a cache hit neither
+    toml nor pydantic is imported, and within a process the configuration is
+    only parsed again once the file changed.
+    """
+    with timed("config"):
+        return _load_compiled_config(project, use_cache=use_cache)
+
+
+def _read_keyed(path: Path) -> tuple[bytes, list]:
+    with open(path, "rb") as f:
+        content = f.read()
+        file_stat = os.fstat(f.fileno())
+    key = [
+        file_stat.st_size,
+        file_stat.st_mtime_ns,
+        hashlib.blake2b(content, digest_size=16).hexdigest(),
+    ]
+    return content, key
+
+
+def _load_compiled_config(project: Path, *, use_cache: bool) -> CompiledConfig:
+    config_path = Path(project, CONFIG_FILE_NAME)
+    try:
+        content, key = _read_keyed(config_path)
+    except FileNotFoundError:
+        raise DotmanException(f"Path {project.as_posix()} is not a dotman project.")
+    ignore_content: bytes | None = None
+    try:
+        ignore_content, ignore_key = _read_keyed(Path(project, IGNORE_FILE_NAME))
+        key.extend(ignore_key)
+    except FileNotFoundError:
+        pass
+    cache_path = Path(project, STATE_DIR_NAME, CONFIG_CACHE_FILE_NAME)
+    if use_cache:
+        loaded = _loaded.get(config_path)
+        if loaded is not None and loaded[0] == key:
+            return loaded[1]
+        cached = _read_config_cache(cache_path, key)
+        if cached is not None:
+            _loaded[config_path] = (key, cached)
+            return cached
+    import toml
+    from dotman.config import Config
+
+    compiled = Config.from_dict(toml.loads(content.decode("utf-8"))).compile()
+    if ignore_content is not None:
+        # The ignore file comes after the settings, so its patterns win.
+        patterns = ignore_content.decode("utf-8").splitlines()
+        compiled = replace(compiled, ignore=[*compiled.ignore, *patterns])
+    if use_cache:
+        _write_config_cache(cache_path, key, compiled)
+        _loaded[config_path] = (key, compiled)
+    return compiled
+
+
+def share_compiled_config(project: Path) -> tuple[Path, list, CompiledConfig]:
+    """Load the configuration of a project, to be passed to install_compiled_config.
+
+    This lets worker processes use the configuration without parsing it, while
+    still checking the file has not changed since.
+    """
+    config = load_compiled_config(project)
+    config_path = Path(project, CONFIG_FILE_NAME)
+    return config_path, _loaded[config_path][0], config
+
+
+def install_compiled_config(
+    config_path: Path, key: list, config: CompiledConfig
+) -> None:
+    _loaded[config_path] = (key, config)
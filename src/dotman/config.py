@@ -1,25 +1,49 @@
 from __future__ import annotations
+import hashlib
 from pathlib import Path
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, ValidationError, field_validator
 import toml
 
+from dotman.compiled import CompiledConfig
+from dotman.constants import CONFIG_FILE_NAME, STATE_DIR_NAME
 from dotman.context import Platform
 from dotman.exceptions import DotmanException
+from dotman.util import write_atomic
 
-
-CONFIG_FILE_NAME = ".dotman.toml"
+__all__ = [
+    "CONFIG_FILE_NAME",
+    "STATE_DIR_NAME",
+    "DotfilePath",
+    "DotfileConfig",
+    "Settings",
+    "Config",
+]
 
 DotfilePath = str
 
 
 class DotfileConfig(BaseModel):
     links: dict[Platform, DotfilePath]
+    ignore: list[str] = Field(default_factory=lambda: list())
+
+
+class Settings(BaseModel):
+    hash_algorithm: str = "md5"
+    ignore: list[str] = Field(default_factory=lambda: list())
+
+    @field_validator("hash_algorithm")
+    @classmethod
+    def check_hash_algorithm(cls, value: str) -> str:
+        if value not in hashlib.algorithms_available or value.startswith("shake_"):
+            raise ValueError(f"Unsupported hash algorithm {value}.")
+        return value
 
 
 class Config(BaseModel):
     dotfiles: dict[DotfilePath, DotfilePath | DotfileConfig] = Field(
         default_factory=lambda: dict()
     )
+    settings: Settings = Field(default_factory=lambda: Settings())
 
     @classmethod
     def from_project(cls, project: Path | str) -> Config:
@@ -30,15 +54,40 @@ class Config(BaseModel):
                 config_dict = toml.load(f)
         except FileNotFoundError:
             raise DotmanException(f"Path {project.as_posix()} is not a dotman project.")
+        return cls.from_dict(config_dict)
+
+    @classmethod
+    def from_dict(cls, config_dict: dict) -> Config:
         try:
             config = Config.model_validate(config_dict)
         except ValidationError as e:
             raise DotmanException(str(e))
         return config
 
+    def compile(self) -> CompiledConfig:
+        links: dict[Platform, dict[DotfilePath, DotfilePath | None]] = {
+            platform: dict() for platform in Platform
+        }
+        target_ignore: dict[DotfilePath, list[str]] = dict()
+        for target, dotconfig in self.dotfiles.items():
+            if isinstance(dotconfig, DotfileConfig) and dotconfig.ignore:
+                target_ignore[target] = list(dotconfig.ignore)
+            for platform in Platform:
+                if isinstance(dotconfig, DotfileConfig):
+                    links[platform][target] = dotconfig.links.get(platform)
+                else:
+                    links[platform][target] = dotconfig
+        return CompiledConfig(
+            links=links,
+            hash_algorithm=self.settings.hash_algorithm,
+            ignore=list(self.settings.ignore),
+            target_ignore=target_ignore,
+        )
+
     def write(self, path: Path) -> None:
         config_dict = self.model_dump(mode="json", exclude_unset=True)
         if config_dict == dict():
-            config_dict = self.__class__(dotfiles=dict()).model_dump(mode="json")
-        with open(path, "w", encoding="utf-8") as f:
-            toml.dump(config_dict, f)
+            config_dict = self.__class__(dotfiles=dict()).model_dump(
+                mode="json", exclude_unset=True
+            )
+        write_atomic(path, toml.dumps(config_dict))
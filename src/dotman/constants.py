@@ -0,0 +1,3 @@
+CONFIG_FILE_NAME = ".dotman.toml"
+STATE_DIR_NAME = ".dotman"
+IGNORE_FILE_NAME = ".dotmanignore"
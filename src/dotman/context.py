@@ -10,7 +10,7 @@ from contextlib import contextmanager
 from dotman.exceptions import DotmanException
 
 
-DotfileMode: TypeAlias = Literal["symlink", "copy"]
+DotfileMode: TypeAlias = Literal["symlink", "copy", "reflink", "hardlink"]
 
 
 class Platform(Enum):
@@ -34,6 +34,8 @@ class Platform(Enum):
 
 PlatformLiteral = Literal["windows", "mac", "linux"]
 
+Stage = Literal["init", "add", "complete", "new-machine", "complete-with-copy"]
+
 
 @dataclass
 class Context:
@@ -7,12 +7,15 @@ from dotman.exceptions import DotmanException
 from dotman.util import resolve_path
 
 
-def _edit(
-    project: Path, dotfile: Path, target: Path, platform: Platform | None = None
+def _edit_config(
+    config: Config,
+    project: Path,
+    dotfile: Path,
+    target: Path,
+    platform: Platform | None = None,
 ) -> None:
     formatted_target = format_target_path(target, project)
     formatted_dotfile = format_dotfile_path(dotfile)
-    config = Config.from_project(project=project)
     previous_dotconfig = config.dotfiles.get(formatted_target)
     if previous_dotconfig is None:
         raise DotmanException(
@@ -35,6 +38,13 @@ def _edit(
             config.dotfiles[formatted_target] = dotfile_config
         else:
             previous_dotconfig.links[platform] = formatted_dotfile
+
+
+def _edit(
+    project: Path, dotfile: Path, target: Path, platform: Platform | None = None
+) -> None:
+    config = Config.from_project(project=project)
+    _edit_config(config, project, dotfile, target, platform=platform)
     dotman_config_path = Path(project, CONFIG_FILE_NAME)
     config.write(dotman_config_path)
 
@@ -2,17 +2,25 @@ from __future__ import annotations
 from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator, Literal
+import random
+from typing import Iterator
 
-from dotman.add import add
 from dotman.config import CONFIG_FILE_NAME
-from dotman.context import Context, Platform, managed_context
+from dotman.context import Context, Platform, Stage, managed_context
 from dotman.init import init
+from dotman.session import transaction
 from dotman.setup import setup
 from dotman.util import resolve_path
 
-
-Stage = Literal["init", "add", "complete", "new-machine", "complete-with-copy"]
+__all__ = [
+    "Stage",
+    "BasicPaths",
+    "setup_folder_structure",
+    "managed_setup",
+    "SyntheticSpec",
+    "SyntheticPaths",
+    "generate_synthetic_dotfiles",
+]
 
 
 @dataclass
@@ -67,8 +75,9 @@ def setup_folder_structure(
     init(project=paths.project)
     if stage == "add":
         return paths
-    add(project=paths.project, dotfile=paths.bashrc)
-    add(project=paths.project, dotfile=paths.tmux_dir)
+    with transaction(paths.project) as tx:
+        tx.add(paths.bashrc)
+        tx.add(paths.tmux_dir)
     if stage == "complete":
         return paths
     paths.bashrc.unlink()
@@ -93,3 +102,67 @@ def managed_setup(base_dir: Path | str, stage: Stage) -> Iterator[BasicPaths]:
         )
     ):
         yield setup_folder_structure(base_dir, stage=stage)
+
+
+@dataclass
+class SyntheticSpec:
+    """Shape of a generated set of dotfiles.
+
+    Every other target is a directory tree, `depth` levels deep with `width`
+    subdirectories and `files_per_dir` files per directory. File sizes are
+    drawn from `file_sizes` with a seeded generator.
+    """
+
+    targets: int = 10
+    depth: int = 2
+    width: int = 3
+    files_per_dir: int = 2
+    file_sizes: tuple[int, ...] = (64, 4 * 1024, 256 * 1024)
+    seed: int = 0
+
+
+@dataclass
+class SyntheticPaths:
+    root: Path
+    home: Path
+    project: Path
+    dotfiles: list[Path]
+
+
+def _generate_tree(
+    folder: Path, depth: int, spec: SyntheticSpec, rng: random.Random
+) -> None:
+    folder.mkdir()
+    for i in range(spec.files_per_dir):
+        Path(folder, f"file-{i}").write_bytes(
+            rng.randbytes(rng.choice(spec.file_sizes))
+        )
+    if depth == 0:
+        return
+    for i in range(spec.width):
+        _generate_tree(Path(folder, f"dir-{i}"), depth - 1, spec, rng)
+
+
+def generate_synthetic_dotfiles(
+    root_folder: Path | str, spec: SyntheticSpec
+) -> SyntheticPaths:
+    root = resolve_path(root_folder)
+    paths = SyntheticPaths(
+        root=root,
+        home=Path(root, "home"),
+        project=Path(root, "home/project"),
+        dotfiles=list(),
+    )
+    dot_config = Path(paths.home, "dot_config")
+    for path in [paths.home, paths.project, dot_config]:
+        path.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(spec.seed)
+    for i in range(spec.targets):
+        if i % 2 == 0:
+            dotfile = Path(dot_config, f"dotfile-{i:04d}")
+            dotfile.write_bytes(rng.randbytes(rng.choice(spec.file_sizes)))
+        else:
+            dotfile = Path(dot_config, f"dotdir-{i:04d}")
+            _generate_tree(dotfile, spec.depth, spec, rng)
+        paths.dotfiles.append(dotfile)
+    return paths
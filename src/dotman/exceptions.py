@@ -6,3 +6,8 @@ class DotmanException(Exception):
 class Unreachable(DotmanException):
     def __init__(self, message: str) -> None:
         self.message = message
+
+
+class Cancelled(DotmanException):
+    def __init__(self, message: str) -> None:
+        self.message = message
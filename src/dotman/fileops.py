@@ -0,0 +1,398 @@
+from __future__ import annotations
+import errno
+import os
+from pathlib import Path
+import shutil
+import stat
+import tempfile
+from typing import Callable
+
+from dotman.context import DotfileMode
+from dotman.exceptions import DotmanException
+from dotman.ignore import IgnoreRules
+from dotman.profiling import count, timed
+from dotman.util import digest_of_open_file, map_in_order
+from dotman.walk import list_dir, same_inode
+
+
+COPY_BUFFER_SIZE = 1024 * 1024
+# sendfile copies at most 0x7ffff000 bytes per call on Linux.
+MAX_SENDFILE_SIZE = 0x40000000
+# Files of a directory tree copied concurrently, as copies from and to
+# network filesystems are bound by latency rather than bandwidth.
+TREE_COPY_JOBS = 8
+_KERNEL_COPY_UNSUPPORTED = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSOCK,
+    errno.EOPNOTSUPP,
+    errno.EXDEV,
+    errno.EPERM,
+}
+_XATTR_UNSUPPORTED = {errno.ENOTSUP, errno.ENODATA, errno.EINVAL, errno.EPERM}
+_METADATA_BY_FD = hasattr(os, "fchmod") and os.utime in os.supports_fd
+_OPEN_SOURCE_FLAGS = (
+    os.O_RDONLY | getattr(os, "O_NONBLOCK", 0) | getattr(os, "O_BINARY", 0)
+)
+
+# From linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+_REFLINK_UNSUPPORTED = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EXDEV,
+    errno.EPERM,
+}
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    # copy_file_range and sendfile keep the data in the kernel; each falls back
+    # to the next method from the offset reached, if the filesystems do not
+    # support it or it copies nothing more, as on some special filesystems.
+    # Returns the number of bytes copied, which is short of length only once
+    # reading the source reaches its end.
+    start = offset
+    end = offset + length
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                n_copied = os.copy_file_range(
+                    src_fd, dst_fd, end - offset, offset, offset
+                )
+                count("syscalls")
+                if n_copied == 0:
+                    break
+                offset += n_copied
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+    if offset < end and hasattr(os, "sendfile"):
+        try:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            while offset < end:
+                n_copied = os.sendfile(
+                    dst_fd, src_fd, offset, min(end - offset, MAX_SENDFILE_SIZE)
+                )
+                count("syscalls")
+                if n_copied == 0:
+                    break
+                offset += n_copied
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+    if offset < end:
+        os.lseek(src_fd, offset, os.SEEK_SET)
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+    while offset < end:
+        chunk = os.read(src_fd, min(end - offset, COPY_BUFFER_SIZE))
+        count("syscalls")
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view) :]
+            count("syscalls")
+        offset += len(chunk)
+    return offset - start
+
+
+def _is_sparse(stat_result: os.stat_result) -> bool:
+    blocks = getattr(stat_result, "st_blocks", None)
+    return (
+        blocks is not None
+        and hasattr(os, "SEEK_DATA")
+        and blocks * 512 < stat_result.st_size
+    )
+
+
+def _copy_data(src_fd: int, dst_fd: int, size: int) -> bool:
+    # Copy only the data segments of sparse files, leaving the holes unallocated.
+    # Returns whether every data segment was copied whole.
+    offset = 0
+    while offset < size:
+        try:
+            data = os.lseek(src_fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                break
+            raise
+        hole = os.lseek(src_fd, data, os.SEEK_HOLE)
+        if _copy_range(src_fd, dst_fd, data, hole - data) != hole - data:
+            return False
+        offset = hole
+    os.ftruncate(dst_fd, size)
+    return True
+
+
+def _copy_xattrs(src_fd: int, dst_fd: int) -> None:
+    try:
+        names = os.listxattr(src_fd)
+    except OSError as e:
+        if e.errno in _XATTR_UNSUPPORTED:
+            return
+        raise
+    for name in names:
+        try:
+            os.setxattr(dst_fd, name, os.getxattr(src_fd, name))
+        except OSError as e:
+            if e.errno not in _XATTR_UNSUPPORTED:
+                raise
+
+
+def _copy_metadata(src_fd: int, dst_fd: int, stat_result: os.stat_result) -> None:
+    # Uses the open descriptors and the stat already taken, instead of the
+    # path lookups and extra stat of shutil.copystat.
+    if hasattr(os, "listxattr"):
+        _copy_xattrs(src_fd, dst_fd)
+    os.fchmod(dst_fd, stat.S_IMODE(stat_result.st_mode))
+    os.utime(dst_fd, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+
+
+def _check_not_same_file(stat_result: os.stat_result, destination: Path | str) -> None:
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return
+    if same_inode(destination_stat, stat_result):
+        raise shutil.SameFileError(f"{destination} is the same file as the source.")
+
+
+def _copy_contents(src_fd: int, dst_fd: int, stat_result: os.stat_result) -> bool:
+    # Returns whether the whole size was copied, and only then copies the
+    # metadata, so that a short copy never looks complete.
+    size = stat_result.st_size
+    if _is_sparse(stat_result):
+        complete = _copy_data(src_fd, dst_fd, size)
+    else:
+        complete = _copy_range(src_fd, dst_fd, 0, size) == size
+    if complete and _METADATA_BY_FD:
+        _copy_metadata(src_fd, dst_fd, stat_result)
+    return complete
+
+
+def _copy_file(
+    source: Path | str, destination: Path | str, algorithm: str | None
+) -> tuple[os.stat_result, str]:
+    # Returns the stat result of the source, and its digest with an algorithm.
+    digest = ""
+    with timed("copy"):
+        # Opened without blocking, as opening a named pipe for reading waits
+        # for a writer, and checked to be a regular file before reading.
+        src_fd = os.open(source, _OPEN_SOURCE_FLAGS)
+        try:
+            stat_result = os.fstat(src_fd)
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise shutil.SpecialFileError(f"{source} is not a regular file.")
+            _check_not_same_file(stat_result, destination)
+            with open(destination, "wb") as dst:
+                dst_fd = dst.fileno()
+                complete = _copy_contents(src_fd, dst_fd, stat_result)
+            if not complete:
+                os.unlink(destination)
+                raise DotmanException(
+                    f"Cannot copy {Path(source).as_posix()}, as it ended before its size of {stat_result.st_size} bytes, having shrunk while being copied or reported a misleading size."
+                )
+            if algorithm is not None:
+                # The data is copied in the kernel, and read back for the
+                # digest from the page cache the copy just filled.
+                with open(src_fd, "rb", buffering=0, closefd=False) as src:
+                    digest = digest_of_open_file(src, stat_result.st_size, algorithm)
+        finally:
+            os.close(src_fd)
+        if not _METADATA_BY_FD:
+            shutil.copystat(source, destination)
+    count("files_copied")
+    count("bytes_read", stat_result.st_size)
+    count("bytes_written", stat_result.st_size)
+    return stat_result, digest
+
+
+def copy_file(source: Path | str, destination: Path | str) -> int:
+    """Copy a file like shutil.copy2, with the data copied in the kernel where possible.
+
+    Holes in sparse files are preserved. Returns the size of the file.
+    """
+    return _copy_file(source, destination, None)[0].st_size
+
+
+def copy_file_with_digest(
+    source: Path | str, destination: Path | str, algorithm: str
+) -> tuple[os.stat_result, str]:
+    """Copy a file like copy_file, computing its digest from the source just copied.
+
+    Returns the stat result of the source, which the copy shares the size and
+    modification time of, and the hex digest.
+    """
+    stat_result, digest = _copy_file(source, destination, algorithm)
+    count("files_hashed")
+    return stat_result, digest
+
+
+def _is_copied(source: os.DirEntry[str], destination: str) -> bool:
+    # Copies get the modification time of their source once their data is
+    # complete, and links share its inode.
+    try:
+        destination_stat = os.lstat(destination)
+    except FileNotFoundError:
+        return False
+    source_stat = source.stat()
+    if same_inode(source_stat, destination_stat):
+        return True
+    return (source_stat.st_size, source_stat.st_mtime_ns) == (
+        destination_stat.st_size,
+        destination_stat.st_mtime_ns,
+    )
+
+
+def copy_tree(
+    source: Path,
+    destination: Path,
+    copy_function: Callable[[str, str], object] = copy_file,
+    jobs: int = TREE_COPY_JOBS,
+    partial: Path | None = None,
+    ignore: IgnoreRules | None = None,
+) -> None:
+    """Copy a directory tree like shutil.copytree, following symlinks.
+
+    The directories are created first, in a temporary directory next to
+    destination, and the files are then copied into them over jobs threads.
+    The metadata of the directories is applied once all files are copied, as
+    copying into a directory changes its modification time. The temporary
+    directory is renamed to destination once complete, and removed on failure.
+    The directories above destination are created when missing.
+
+    With partial, that directory is used instead, and kept on failure. Files
+    already copied into it by an earlier attempt are not copied again.
+    Ignored files and directories are left out, and not walked into.
+    """
+    destination = Path(destination)
+    if os.path.lexists(destination):
+        raise FileExistsError(
+            errno.EEXIST, os.strerror(errno.EEXIST), os.fspath(destination)
+        )
+    os.makedirs(destination.parent, exist_ok=True)
+    if partial is None:
+        temporary = tempfile.mkdtemp(
+            prefix=f".{destination.name}.", suffix=".tmp", dir=destination.parent
+        )
+    else:
+        temporary = os.fspath(partial)
+        os.makedirs(temporary, exist_ok=True)
+    try:
+        directories: list[tuple[str, str]] = list()
+        files: list[tuple[str, str]] = list()
+        pending = [(os.fspath(source), temporary, "")]
+        while pending:
+            source_dir, destination_dir, prefix = pending.pop()
+            if destination_dir != temporary:
+                os.makedirs(destination_dir, exist_ok=partial is not None)
+            directories.append((source_dir, destination_dir))
+            dir_files, dirs = list_dir(
+                source_dir, follow_dir_symlinks=True, ignore=ignore, prefix=prefix
+            )
+            for name, entry in dir_files.items():
+                file_destination = os.path.join(destination_dir, name)
+                if partial is not None and _is_copied(entry, file_destination):
+                    continue
+                files.append((entry.path, file_destination))
+            for name, entry in dirs.items():
+                pending.append(
+                    (
+                        entry.path,
+                        os.path.join(destination_dir, name),
+                        f"{prefix}{name}/",
+                    )
+                )
+        for _ in map_in_order(
+            lambda item: copy_function(*item), files, jobs=min(jobs, len(files))
+        ):
+            pass
+        for source_dir, destination_dir in reversed(directories):
+            shutil.copystat(source_dir, destination_dir)
+        os.rename(temporary, destination)
+    except BaseException:
+        if partial is None:
+            shutil.rmtree(temporary, ignore_errors=True)
+        raise
+
+
+def reflink_file(source: Path | str, destination: Path | str) -> None:
+    """Clone a file with the FICLONE copy-on-write ioctl, or copy it where unsupported."""
+    try:
+        import fcntl
+    except ImportError:
+        copy_file(source, destination)
+        return
+    cloned = False
+    with open(os.open(source, _OPEN_SOURCE_FLAGS), "rb") as src:
+        if not stat.S_ISREG(os.fstat(src.fileno()).st_mode):
+            raise shutil.SpecialFileError(f"{source} is not a regular file.")
+        with open(destination, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                cloned = True
+            except OSError as e:
+                if e.errno not in _REFLINK_UNSUPPORTED:
+                    raise
+    if cloned:
+        shutil.copystat(source, destination)
+    else:
+        copy_file(source, destination)
+
+
+def symlink(link: Path, target: Path) -> None:
+    with timed("symlink"):
+        link.symlink_to(target)
+    count("syscalls")
+
+
+def hardlink_file(source: Path | str, destination: Path | str) -> None:
+    os.link(source, destination)
+    count("syscalls")
+
+
+def _check_same_filesystem(source: Path, destination: Path) -> None:
+    if os.stat(source).st_dev != os.stat(destination.parent).st_dev:
+        raise DotmanException(
+            f"Cannot hardlink {source.as_posix()} to {destination.as_posix()}, as they are on different filesystems."
+        )
+
+
+def copy_path(
+    source: Path,
+    destination: Path,
+    dotfile_mode: DotfileMode,
+    partial: Path | None = None,
+    ignore: IgnoreRules | None = None,
+) -> None:
+    """Create destination as a copy, reflink or hardlink of the file or directory source.
+
+    Directories are recreated, and each file in them not ignored copied,
+    cloned or linked, through partial when given, see copy_tree. The
+    directories above destination are created when missing.
+    """
+    copy_function: Callable[[str, str], object]
+    if dotfile_mode == "copy":
+        copy_function = copy_file
+    elif dotfile_mode == "reflink":
+        copy_function = reflink_file
+    elif dotfile_mode == "hardlink":
+        copy_function = hardlink_file
+    else:
+        raise DotmanException(f"Dotfile mode {dotfile_mode} does not copy files.")
+    os.makedirs(destination.parent, exist_ok=True)
+    if dotfile_mode == "hardlink":
+        _check_same_filesystem(source, destination)
+    if source.is_dir():
+        copy_tree(
+            source,
+            destination,
+            copy_function=copy_function,
+            partial=partial,
+            ignore=ignore,
+        )
+    else:
+        copy_function(source, destination)
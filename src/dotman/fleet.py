@@ -0,0 +1,156 @@
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import glob
+import os
+from pathlib import Path
+from typing import Iterable, Literal
+
+from dotman.compiled import install_compiled_config, share_compiled_config
+from dotman.context import Context, DotfileMode, Platform, get_context
+from dotman.context import managed_context
+from dotman.exceptions import DotmanException
+from dotman.setup import _setup_project
+from dotman.status import _status
+from dotman.sync import _sync_project
+from dotman.util import resolve_path
+
+FleetOperation = Literal["setup", "status", "sync"]
+
+
+@dataclass
+class HomeResult:
+    """The outcome of an operation for one home directory.
+
+    error is the message of the DotmanException or OSError that stopped the
+    operation, if any. links holds the status category of each target for
+    status, and files_copied the files copied by sync.
+    """
+
+    home: Path
+    error: str | None = None
+    links: dict[str, str] = field(default_factory=lambda: dict())
+    files_copied: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and all(
+            category == "complete" for category in self.links.values()
+        )
+
+
+def expand_homes(homes: Iterable[Path | str]) -> list[Path]:
+    """Resolve home directories, expanding glob patterns to the directories matching them."""
+    expanded: list[Path] = list()
+    for home in homes:
+        pattern = os.fspath(home)
+        if glob.has_magic(pattern):
+            expanded.extend(
+                resolve_path(match)
+                for match in sorted(glob.glob(os.path.expanduser(pattern)))
+                if os.path.isdir(match)
+            )
+        else:
+            expanded.append(resolve_path(home))
+    return list(dict.fromkeys(expanded))
+
+
+def _run_home(
+    operation: FleetOperation,
+    project: Path,
+    home: Path,
+    platform: Platform,
+    dotfile_mode: DotfileMode,
+    jobs: int,
+) -> HomeResult:
+    result = HomeResult(home=home)
+    with managed_context(Context(cwd=project, home=home, platform=platform)):
+        try:
+            if operation == "setup":
+                _setup_project(project, dotfile_mode=dotfile_mode, jobs=jobs)
+            elif operation == "sync":
+                sync_results = _sync_project(project, jobs=jobs)
+                result.files_copied = sum(r.files_copied for r in sync_results)
+            else:
+                project_status = _status(project, jobs=jobs)
+                result.links = {
+                    link.target.as_posix(): link.category
+                    for link in project_status.links
+                }
+        except (DotmanException, OSError) as e:
+            result.error = e.message if isinstance(e, DotmanException) else str(e)
+    return result
+
+
+def _run_home_item(item: tuple) -> HomeResult:
+    return _run_home(*item)
+
+
+def _fleet(
+    project: Path,
+    homes: list[Path],
+    operation: FleetOperation,
+    dotfile_mode: DotfileMode,
+    processes: int | None,
+    jobs: int,
+) -> list[HomeResult]:
+    # The configuration is parsed here once, and handed to the workers.
+    shared = share_compiled_config(project)
+    platform = get_context().platform
+    items = [(operation, project, home, platform, dotfile_mode, jobs) for home in homes]
+    if processes == 1 or len(homes) <= 1:
+        return [_run_home_item(item) for item in items]
+    max_workers = min(processes or os.cpu_count() or 1, len(homes))
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=install_compiled_config,
+        initargs=shared,
+    ) as executor:
+        chunksize = max(1, len(items) // (4 * max_workers))
+        return list(executor.map(_run_home_item, items, chunksize=chunksize))
+
+
+def fleet(
+    operation: FleetOperation,
+    homes: Iterable[Path | str],
+    project: Path | str | None = None,
+    *,
+    dotfile_mode: DotfileMode = "symlink",
+    processes: int | None = None,
+    jobs: int = 1,
+) -> list[HomeResult]:
+    """Run setup, status or sync of one project for many home directories.
+
+    Homes may be glob patterns, and are processed over a pool of processes,
+    each handling the targets of a home over jobs threads. An error in one
+    home is reported in its result rather than raised. Results are returned
+    in the order of the homes.
+
+    Sync copies the dotfiles of a home into the project, so only one home can
+    be synced at once, as several would overwrite each other's changes.
+    """
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    expanded = expand_homes(homes)
+    if len(expanded) == 0:
+        raise DotmanException("No home directories were given or matched.")
+    if operation == "sync" and len(expanded) > 1:
+        raise DotmanException(
+            f"Cannot sync {len(expanded)} home directories into project {project.as_posix()}, as only one home can be synced into a project at once."
+        )
+    return _fleet(project, expanded, operation, dotfile_mode, processes, jobs)
+
+
+def summarize(results: Iterable[HomeResult]) -> Counter[str]:
+    """Count homes that are ok or failed, and the links of each status category."""
+    counts: Counter[str] = Counter()
+    for result in results:
+        if result.error is not None:
+            counts["failed"] += 1
+        else:
+            counts["ok" if result.ok else "incomplete"] += 1
+        counts.update(result.links.values())
+    return counts
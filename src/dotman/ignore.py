@@ -0,0 +1,165 @@
+from __future__ import annotations
+import re
+from typing import Iterable
+
+# A parsed pattern: its regular expression, whether it re-includes paths (!)
+# and whether it only matches directories (trailing /).
+Rule = tuple[str, bool, bool]
+
+
+def _translate_class(pattern: str, start: int) -> tuple[str, int] | None:
+    end = start + 1
+    if end < len(pattern) and pattern[end] in "!^":
+        end += 1
+    if end < len(pattern) and pattern[end] == "]":
+        end += 1
+    end = pattern.find("]", end)
+    if end == -1:
+        return None
+    body = pattern[start + 1 : end].replace("\\", "\\\\")
+    if body[:1] in ("!", "^"):
+        body = "^" + body[1:]
+    regex = f"(?!/)[{body}]"
+    try:
+        re.compile(regex)
+    except re.error:
+        return None
+    return regex, end + 1
+
+
+def _translate(pattern: str) -> str:
+    parts = list()
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                if i + 2 == n:
+                    parts.append(".*")
+                    i += 2
+                    continue
+                if pattern[i + 2] == "/":
+                    parts.append("(?:.*/)?")
+                    i += 3
+                    continue
+            while i < n and pattern[i] == "*":
+                i += 1
+            parts.append("[^/]*")
+            continue
+        if c == "?":
+            parts.append("[^/]")
+        elif c == "[" and (translated := _translate_class(pattern, i)) is not None:
+            parts.append(translated[0])
+            i = translated[1]
+            continue
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+
+def parse_pattern(line: str, base: str = "") -> Rule | None:
+    """Parse a gitignore-style pattern, or return None for blank lines and comments.
+
+    The pattern matches paths relative to the directory base, a '/'-terminated
+    path or the empty string.
+    """
+    if not line.endswith("\\ "):
+        line = line.rstrip()
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    # As in git, a pattern with a slash other than a trailing one is anchored
+    # to the base, and one without matches at any depth.
+    anchored = "/" in line
+    regex = _translate(line.lstrip("/"))
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.escape(base) + regex, negate, dir_only
+
+
+def _combine(rules: list[Rule]) -> re.Pattern[str] | None:
+    if len(rules) == 0:
+        return None
+    return re.compile("|".join(f"(?:{regex})" for regex, _, _ in rules))
+
+
+class IgnoreRules:
+    """Gitignore-style patterns pruning the files and directories below a target.
+
+    The patterns of the project match paths relative to the project, like a
+    .gitignore at its root, and those of the target paths relative to the
+    target. As in git, the last matching pattern wins, so a pattern starting
+    with ! re-includes what an earlier one ignored, and a directory that is
+    ignored is never descended into, so nothing below it can be re-included.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        project_patterns: Iterable[str] = (),
+        target_patterns: Iterable[str] = (),
+    ) -> None:
+        self.base = f"{target}/"
+        rules = [
+            rule
+            for rule in (parse_pattern(line) for line in project_patterns)
+            if rule is not None
+        ]
+        rules.extend(
+            rule
+            for rule in (parse_pattern(line, self.base) for line in target_patterns)
+            if rule is not None
+        )
+        self.rules = [
+            (re.compile(regex), negate, dir_only) for regex, negate, dir_only in rules
+        ]
+        # Without negations any matching pattern ignores a path, so the
+        # patterns are matched at once.
+        self.negated = any(negate for _, negate, _ in rules)
+        self.file_regex = _combine([rule for rule in rules if not rule[2]])
+        self.dir_regex = _combine(rules)
+
+    def __bool__(self) -> bool:
+        return len(self.rules) > 0
+
+    def ignores(self, relative: str, is_dir: bool) -> bool:
+        """Whether the file or directory at the '/'-separated path relative to the target is ignored.
+
+        The directories above it are assumed not to be ignored, as they are
+        when walking down from the target.
+        """
+        path = self.base + relative
+        if not self.negated:
+            regex = self.dir_regex if is_dir else self.file_regex
+            return regex is not None and regex.fullmatch(path) is not None
+        for regex, negate, dir_only in reversed(self.rules):
+            if (not dir_only or is_dir) and regex.fullmatch(path) is not None:
+                return not negate
+        return False
+
+    def excludes(self, relative: str) -> bool:
+        """Whether a file, or one of the directories above it, is ignored."""
+        parts = relative.split("/")
+        for i in range(1, len(parts)):
+            if self.ignores("/".join(parts[:i]), True):
+                return True
+        return self.ignores(relative, False)
+
+
+def ignore_rules(
+    target: str, project_patterns: Iterable[str], target_patterns: Iterable[str]
+) -> IgnoreRules | None:
+    """The ignore rules of a target, or None if it has no pattern."""
+    rules = IgnoreRules(target, project_patterns, target_patterns)
+    return rules if rules else None
@@ -0,0 +1,106 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import errno
+import os
+import select
+import struct
+from typing import Iterator
+
+from dotman.exceptions import DotmanException
+
+# From sys/inotify.h
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = os.O_CLOEXEC
+IN_NONBLOCK = os.O_NONBLOCK
+
+_EVENT_HEADER = struct.Struct("iIII")
+# Large enough for many events with maximum length names per read.
+READ_BUFFER_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class InotifyEvent:
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+class Inotify:
+    """A minimal inotify instance, bound through ctypes to the libc functions."""
+
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init1 = libc.inotify_init1
+        except (OSError, AttributeError):
+            raise DotmanException("Watching files requires Linux inotify.")
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._get_errno = ctypes.get_errno
+        fd = init1(IN_CLOEXEC | IN_NONBLOCK)
+        if fd < 0:
+            raise self._error("inotify_init1")
+        self.fd: int = fd
+
+    def _error(self, operation: str, path: str | None = None) -> OSError:
+        error = self._get_errno()
+        return OSError(error, f"{operation}: {os.strerror(error)}", path)
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise self._error("inotify_add_watch", path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        # The watch is already gone when its path was deleted.
+        if self._rm_watch(self.fd, wd) < 0 and self._get_errno() != errno.EINVAL:
+            raise self._error("inotify_rm_watch")
+
+    def wait(self, timeout: float | None) -> bool:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(readable)
+
+    def read_events(self) -> Iterator[InotifyEvent]:
+        try:
+            buffer = os.read(self.fd, READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+            yield InotifyEvent(wd, mask, cookie, os.fsdecode(name))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+    def __enter__(self) -> Inotify:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
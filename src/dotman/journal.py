@@ -0,0 +1,214 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import threading
+from typing import IO
+
+from dotman.constants import STATE_DIR_NAME
+from dotman.context import get_context
+from dotman.exceptions import DotmanException
+from dotman.util import make_state_dir, resolve_path, write_atomic
+
+JOURNAL_FILE_NAME = "journal.jsonl"
+JOURNAL_VERSION = 2
+
+PENDING = "pending"
+STARTED = "started"
+DONE = "done"
+
+
+def partial_path(dotfile: Path) -> Path:
+    """The directory a tree is copied into before it is renamed to dotfile.
+
+    A checkpointed copy that is interrupted leaves it in place to be resumed.
+    """
+    return Path(dotfile.parent, f".{dotfile.name}.dotman-partial")
+
+
+def remove_path(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        path.unlink()
+
+
+class Journal:
+    """Progress of a setup or sync of a whole project, kept until it completes.
+
+    Each target is recorded as started before anything is changed for it, and
+    as done once complete, so that an interrupted run can be resumed or rolled
+    back. The dotfile paths are recorded with the targets, so that a rollback
+    does not depend on the configuration.
+
+    The journal is a header line with the targets, written once, followed by
+    one appended line per change of state, so that recording a target costs
+    the same however many targets there are.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        operation: str,
+        mode: str,
+        targets: dict[str, dict[str, str]],
+    ) -> None:
+        self.path = path
+        self.operation = operation
+        self.mode = mode
+        # target -> {"dotfile": path, "state": state}
+        self.targets = targets
+        self._lock = threading.Lock()
+        self._file: IO[str] | None = None
+
+    @staticmethod
+    def path_of(project: Path) -> Path:
+        # A project can be set up for several homes at once, see dotman.fleet,
+        # each with its own journal.
+        home = get_context().home.as_posix()
+        home_digest = hashlib.blake2b(home.encode("utf-8"), digest_size=8).hexdigest()
+        return Path(project, STATE_DIR_NAME, f"{home_digest}-{JOURNAL_FILE_NAME}")
+
+    @classmethod
+    def load(cls, project: Path) -> Journal | None:
+        path = cls.path_of(project)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            header = json.loads(lines[0])
+            if not isinstance(header, dict) or header.get("version") != JOURNAL_VERSION:
+                raise DotmanException(
+                    f"Journal {path.as_posix()} of an interrupted run has an unsupported version."
+                )
+            journal = cls(path, header["operation"], header["mode"], header["targets"])
+            for line in lines[1:]:
+                try:
+                    target, state = json.loads(line)
+                except ValueError:
+                    # The last line may have been cut short by the interruption.
+                    break
+                journal.targets[target]["state"] = state
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, IndexError, KeyError, TypeError):
+            raise DotmanException(
+                f"Journal {path.as_posix()} of an interrupted run cannot be read."
+            )
+        return journal
+
+    @classmethod
+    def create(
+        cls, project: Path, operation: str, mode: str, dotfiles: dict[str, Path]
+    ) -> Journal:
+        journal = cls(cls.path_of(project), operation, mode, dict())
+        make_state_dir(journal.path.parent)
+        journal.track(dotfiles)
+        return journal
+
+    def track(self, dotfiles: dict[str, Path]) -> None:
+        """Add the targets to the journal, checking those already in it still have the same dotfile."""
+        for target, dotfile in dotfiles.items():
+            entry = self.targets.get(target)
+            if entry is not None and entry["state"] != PENDING:
+                if entry["dotfile"] != dotfile.as_posix():
+                    raise DotmanException(
+                        f"Target {target} was linked to {entry['dotfile']} by the interrupted {self.operation}, but is now linked to {dotfile.as_posix()}. Undo the interrupted {self.operation} with --rollback first."
+                    )
+                continue
+            self.targets[target] = {"dotfile": dotfile.as_posix(), "state": PENDING}
+        self._close()
+        header = {
+            "version": JOURNAL_VERSION,
+            "operation": self.operation,
+            "mode": self.mode,
+            "targets": self.targets,
+        }
+        write_atomic(self.path, json.dumps(header) + "\n")
+
+    def state(self, target: str) -> str:
+        entry = self.targets.get(target)
+        return PENDING if entry is None else entry["state"]
+
+    def _set_state(self, target: str, state: str) -> None:
+        with self._lock:
+            self.targets[target]["state"] = state
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps([target, state]) + "\n")
+            self._file.flush()
+
+    def start(self, target: str) -> None:
+        self._set_state(target, STARTED)
+
+    def finish(self, target: str) -> None:
+        self._set_state(target, DONE)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        self._close()
+        self.path.unlink(missing_ok=True)
+
+
+def check_journal(
+    project: Path, operation: str, mode: str, resume: bool
+) -> Journal | None:
+    """Load the journal of an interrupted run, which must be resumed or rolled back.
+
+    Returns the journal to resume from, or None when there is none, in which
+    case a resumed run starts from scratch.
+    """
+    journal = Journal.load(project)
+    if journal is None:
+        return None
+    if not resume or journal.operation != operation or journal.mode != mode:
+        if journal.operation == "setup":
+            undo = ", or undone with dotman setup --rollback"
+        else:
+            undo = ""
+        raise DotmanException(
+            f"Project {project.as_posix()} has an interrupted {journal.operation} with mode {journal.mode}, which must first be resumed with --resume{undo}."
+        )
+    return journal
+
+
+def _rollback(project: Path) -> list[Path]:
+    """Undo the dotfiles created by an interrupted setup, returning the paths removed.
+
+    An interrupted sync has only updated files within the project, and cannot
+    be rolled back.
+    """
+    journal = Journal.load(project)
+    if journal is None:
+        raise DotmanException(
+            f"Project {project.as_posix()} has no interrupted setup or sync to roll back."
+        )
+    if journal.operation != "setup":
+        raise DotmanException(
+            f"The interrupted {journal.operation} of project {project.as_posix()} cannot be rolled back, resume it with --resume instead."
+        )
+    removed = list()
+    for entry in journal.targets.values():
+        if entry["state"] == PENDING:
+            continue
+        # Setup only creates dotfiles at paths that were not occupied.
+        dotfile = Path(entry["dotfile"])
+        for path in [dotfile, partial_path(dotfile)]:
+            if os.path.lexists(path):
+                remove_path(path)
+                removed.append(path)
+    journal.remove()
+    return removed
+
+
+def rollback(project: Path | str | None = None) -> list[Path]:
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    return _rollback(project)
@@ -0,0 +1,213 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+from dotman import cache
+from dotman.constants import STATE_DIR_NAME
+from dotman.fileops import copy_file_with_digest, copy_tree
+from dotman.ignore import IgnoreRules
+from dotman.util import make_state_dir, write_atomic
+from dotman.walk import FileRef, stat_of, walk_files
+
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def relative_key(root: str, path: str) -> str:
+    """The '/'-separated path of a file below root, as manifests are keyed."""
+    if path == root:
+        return ""
+    return path[len(root) + 1 :].replace(os.sep, "/")
+
+
+@dataclass
+class TargetManifest:
+    """Size, modification time and digest of the files copied for a target.
+
+    Files are keyed on their '/'-separated path relative to the target, which
+    is the empty string for a file target. The copies on both sides share the
+    size and modification time recorded.
+    """
+
+    dotfile: str
+    # relative path -> [size, mtime_ns, digest]
+    files: dict[str, list] = field(default_factory=lambda: dict())
+
+    def record(self, relative: str, stat_result: os.stat_result, digest: str) -> None:
+        if time.time_ns() - stat_result.st_mtime_ns < cache.RACY_WINDOW_NS:
+            # Like the hash cache, do not trust a file that may still change
+            # without its modification time changing.
+            self.files.pop(relative, None)
+            return
+        self.files[relative] = [stat_result.st_size, stat_result.st_mtime_ns, digest]
+
+    def discard(self, relative: str) -> None:
+        # A removed directory discards the files below it as well.
+        self.files.pop(relative, None)
+        prefix = relative + "/" if relative else ""
+        for key in [k for k in self.files if k.startswith(prefix)]:
+            del self.files[key]
+
+    def matches(self, relative: str, file: FileRef) -> bool:
+        """Whether the stat of a file is the one recorded, so its digest is known."""
+        record = self.files.get(relative)
+        if record is None:
+            return False
+        stat_result = stat_of(file)
+        return [stat_result.st_size, stat_result.st_mtime_ns] == record[:2]
+
+    def digest(self, relative: str) -> str | None:
+        record = self.files.get(relative)
+        return None if record is None else str(record[2])
+
+    def drift(self, root: Path, ignore: IgnoreRules | None = None) -> list[str]:
+        """The recorded files below root whose stat changed, or that were added or removed.
+
+        Only stats are compared, no file is read. Ignored files are left out,
+        even if they were recorded before being ignored.
+        """
+        if root.is_file():
+            return [] if self.matches("", root) else [""]
+        drifted = list()
+        seen = set()
+        if root.is_dir():
+            for relative, entry in walk_files(root, ignore=ignore):
+                seen.add(relative)
+                if not self.matches(relative, entry):
+                    drifted.append(relative)
+        drifted.extend(
+            relative
+            for relative in self.files
+            if relative not in seen
+            and (ignore is None or not ignore.excludes(relative))
+        )
+        return sorted(drifted)
+
+
+class Manifest:
+    """The target manifests of a project, stored in its state folder."""
+
+    def __init__(self, path: Path, algorithm: str) -> None:
+        self.path = path
+        self.algorithm = algorithm
+        self.targets: dict[str, TargetManifest] = dict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_project(cls, project: Path, algorithm: str) -> Manifest:
+        return cls(Path(project, STATE_DIR_NAME, MANIFEST_FILE_NAME), algorithm)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return
+        if data.get("algorithm") != self.algorithm:
+            # Digests of another algorithm cannot be compared against.
+            self._dirty = True
+            return
+        try:
+            self.targets = {
+                target: TargetManifest(dotfile=entry["dotfile"], files=entry["files"])
+                for target, entry in data["targets"].items()
+            }
+        except (KeyError, TypeError, AttributeError):
+            self.targets = dict()
+
+    def get(self, target: str, dotfile: Path) -> TargetManifest | None:
+        """The manifest of a target, if it was recorded for the same dotfile path."""
+        target_manifest = self.targets.get(target)
+        if target_manifest is None or target_manifest.dotfile != dotfile.as_posix():
+            return None
+        return target_manifest
+
+    def set(self, target: str, target_manifest: TargetManifest) -> None:
+        with self._lock:
+            self.targets[target] = target_manifest
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        data = {
+            "version": MANIFEST_VERSION,
+            "algorithm": self.algorithm,
+            "targets": {
+                target: {"dotfile": entry.dotfile, "files": entry.files}
+                for target, entry in self.targets.items()
+            },
+        }
+        try:
+            make_state_dir(self.path.parent)
+            write_atomic(self.path, json.dumps(data))
+        except OSError:
+            return
+        self._dirty = False
+
+
+class ManifestRecorder:
+    """Copy files between the two sides of a target, recording them in a manifest.
+
+    Paths are recorded relative to source_root for copies, and relative to
+    destination_root for removals.
+    """
+
+    def __init__(
+        self,
+        source_root: Path,
+        destination_root: Path,
+        algorithm: str,
+        target_manifest: TargetManifest,
+    ) -> None:
+        self.source_root = os.fspath(source_root)
+        self.destination_root = os.fspath(destination_root)
+        self.algorithm = algorithm
+        self.manifest = target_manifest
+
+    def copy(self, source: Path | str, destination: Path | str) -> int:
+        stat_result, digest = copy_file_with_digest(source, destination, self.algorithm)
+        relative = relative_key(self.source_root, os.fspath(source))
+        self.manifest.record(relative, stat_result, digest)
+        return stat_result.st_size
+
+    def removed(self, destination: Path | str) -> None:
+        self.manifest.discard(
+            relative_key(self.destination_root, os.fspath(destination))
+        )
+
+
+def copy_recorded(
+    source: Path,
+    destination: Path,
+    dotfile: Path,
+    algorithm: str,
+    partial: Path | None = None,
+    ignore: IgnoreRules | None = None,
+) -> TargetManifest:
+    """Copy a file or directory, returning the manifest of the copied files.
+
+    Files of a tree found already copied into partial are not recorded, and
+    ignored ones are not copied.
+    """
+    target_manifest = TargetManifest(dotfile=dotfile.as_posix())
+    recorder = ManifestRecorder(source, destination, algorithm, target_manifest)
+    if source.is_dir():
+        copy_tree(
+            source,
+            destination,
+            copy_function=recorder.copy,
+            partial=partial,
+            ignore=ignore,
+        )
+    else:
+        recorder.copy(source, destination)
+    return target_manifest
@@ -0,0 +1,141 @@
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Literal
+
+from dotman.compiled import CompiledConfig, load_compiled_config
+from dotman.context import Context, DotfileMode, Platform, get_context
+from dotman.exceptions import DotmanException
+from dotman.ignore import IgnoreRules
+from dotman.util import format_target_path, resolve_path
+
+Operation = Literal["setup", "sync", "status"]
+
+
+@dataclass(frozen=True)
+class PlanEntry:
+    """A linked target of a project, with its paths resolved for the platform."""
+
+    target: str
+    target_path: Path
+    dotfile_path: Path
+    mode: DotfileMode | None = None
+    operation: Operation = "status"
+    ignore: IgnoreRules | None = None
+
+    def describe(self) -> str:
+        mode = f" ({self.mode})" if self.mode is not None else ""
+        return f"{self.operation} {self.target}: {self.dotfile_path.as_posix()}{mode}"
+
+
+@dataclass(frozen=True)
+class Plan:
+    """The targets of a project, resolved once and shared by setup, sync and status.
+
+    Targets without a link on the platform, or with an empty link, are kept
+    apart in unlinked, with their link.
+    """
+
+    project: Path
+    platform: Platform
+    hash_algorithm: str
+    entries: tuple[PlanEntry, ...]
+    unlinked: tuple[tuple[str, str | None], ...] = ()
+
+    def _unlinked_error(self, target: str, dotfile_link: str | None) -> DotmanException:
+        if dotfile_link is None:
+            return DotmanException(
+                f"Target {target}, in project {self.project.as_posix()} does not have a links configured for platform {self.platform}."
+            )
+        return DotmanException(
+            f"Target {target} in project {self.project.as_posix()} is configured to empty."
+        )
+
+    def entry(self, target: Path) -> PlanEntry:
+        """The entry of a target given relative to the project or the working directory.
+
+        Raises if the target is not configured, or has no link on the platform.
+        """
+        formatted_target = format_target_path(target, self.project)
+        for entry in self.entries:
+            if entry.target == formatted_target:
+                return entry
+        for unlinked_target, dotfile_link in self.unlinked:
+            if unlinked_target == formatted_target:
+                raise self._unlinked_error(unlinked_target, dotfile_link)
+        raise DotmanException(
+            f"Provided target {target.as_posix()} is not configured in project {self.project.as_posix()}."
+        )
+
+    def linked_entries(self) -> tuple[PlanEntry, ...]:
+        """The entries of all targets, raising if any target has no link on the platform."""
+        if len(self.unlinked) > 0:
+            raise self._unlinked_error(*self.unlinked[0])
+        return self.entries
+
+    def describe(self) -> str:
+        return "\n".join(entry.describe() for entry in self.entries)
+
+
+def _resolve_entries(
+    project: Path, config: CompiledConfig, context: Context
+) -> tuple[tuple[PlanEntry, ...], tuple[tuple[str, str | None], ...]]:
+    # Resolved paths only depend on the context, so they are kept with the
+    # loaded configuration, which is reused while the file is unchanged.
+    key = (project, context.platform, context.home, context.cwd)
+    resolved = config.resolved.get(key)
+    if resolved is None:
+        entries = list()
+        unlinked = list()
+        for target, dotfile_link in config.dotfiles(context.platform).items():
+            if not dotfile_link:
+                unlinked.append((target, dotfile_link))
+                continue
+            entries.append(
+                PlanEntry(
+                    target=target,
+                    target_path=resolve_path(Path(project, target), context=context),
+                    dotfile_path=resolve_path(dotfile_link, context=context),
+                    ignore=config.ignore_rules(target),
+                )
+            )
+        resolved = (tuple(entries), tuple(unlinked))
+        config.resolved[key] = resolved
+    return resolved
+
+
+def compile_plan(
+    project: Path,
+    operation: Operation,
+    dotfile_mode: DotfileMode | None = None,
+    *,
+    use_cache: bool = True,
+) -> Plan:
+    """Compile the configuration of a project into the plan of an operation.
+
+    Sync always copies, so its entries have the copy mode.
+    """
+    config = load_compiled_config(project, use_cache=use_cache)
+    return plan_from_config(project, config, operation, dotfile_mode)
+
+
+def plan_from_config(
+    project: Path,
+    config: CompiledConfig,
+    operation: Operation,
+    dotfile_mode: DotfileMode | None = None,
+) -> Plan:
+    """The plan of an operation for a configuration already loaded, see compile_plan."""
+    context = get_context()
+    entries, unlinked = _resolve_entries(project, config, context)
+    if operation == "sync":
+        dotfile_mode = "copy"
+    return Plan(
+        project=project,
+        platform=context.platform,
+        hash_algorithm=config.hash_algorithm,
+        entries=tuple(
+            replace(entry, mode=dotfile_mode, operation=operation) for entry in entries
+        ),
+        unlinked=unlinked,
+    )
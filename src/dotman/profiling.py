@@ -0,0 +1,154 @@
+from __future__ import annotations
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable, ContextManager, Iterator
+
+CPROFILE_ENV_VAR = "DOTMAN_CPROFILE"
+
+PHASES = ("config", "resolve_path", "stat", "hash", "compare", "copy", "symlink")
+COUNTERS = (
+    "bytes_read",
+    "bytes_written",
+    "files_hashed",
+    "files_copied",
+    "paths_ignored",
+    "stats",
+    "syscalls",
+)
+
+
+@dataclass
+class Profile:
+    """Time spent per phase and I/O counters, collected while a profile is active.
+
+    Phases do not nest, so their times add up to at most the wall time of the
+    run (more with jobs > 1, as threads run phases concurrently). syscalls
+    counts the stat, copy and link calls made by dotman itself.
+    """
+
+    seconds: dict[str, float] = field(
+        default_factory=lambda: dict.fromkeys(PHASES, 0.0)
+    )
+    calls: dict[str, int] = field(default_factory=lambda: dict.fromkeys(PHASES, 0))
+    counters: dict[str, int] = field(default_factory=lambda: dict.fromkeys(COUNTERS, 0))
+    started: float = field(default_factory=time.perf_counter)
+    wall_seconds: float | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def elapsed(self) -> float:
+        if self.wall_seconds is not None:
+            return self.wall_seconds
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_seconds": self.elapsed(),
+            "phases": {
+                phase: {"seconds": self.seconds[phase], "calls": self.calls[phase]}
+                for phase in self.seconds
+            },
+            "counters": dict(self.counters),
+        }
+
+    def report(self) -> str:
+        lines = [f"{'phase':<14} {'calls':>9} {'seconds':>10}"]
+        for phase, seconds in self.seconds.items():
+            lines.append(f"{phase:<14} {self.calls[phase]:>9} {seconds:>10.4f}")
+        lines.append(f"{'wall time':<14} {'':>9} {self.elapsed():>10.4f}")
+        lines.extend(f"{name:<14} {value:>9}" for name, value in self.counters.items())
+        return "\n".join(lines)
+
+
+_current_profile: ContextVar[Profile | None] = ContextVar(
+    "current_profile", default=None
+)
+_hooks: list[Callable[[Profile], None]] = list()
+
+
+def get_profile() -> Profile | None:
+    return _current_profile.get()
+
+
+class _Timer:
+    __slots__ = ("profile", "phase", "start")
+
+    def __init__(self, profile: Profile, phase: str) -> None:
+        self.profile = profile
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args: object) -> None:
+        self.profile.add_time(self.phase, time.perf_counter() - self.start)
+
+
+_NOT_PROFILED: ContextManager[None] = nullcontext()
+
+
+def timed(phase: str) -> ContextManager[None]:
+    """Time a block as a phase of the active profile; a no-op without one."""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NOT_PROFILED
+    return _Timer(profile, phase)
+
+
+def count(counter: str, n: int = 1) -> None:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.count(counter, n)
+
+
+def stat(path: Path | str, *, follow_symlinks: bool = True) -> os.stat_result:
+    profile = _current_profile.get()
+    if profile is None:
+        return os.stat(path, follow_symlinks=follow_symlinks)
+    start = time.perf_counter()
+    try:
+        return os.stat(path, follow_symlinks=follow_symlinks)
+    finally:
+        profile.add_time("stat", time.perf_counter() - start)
+        profile.count("stats")
+        profile.count("syscalls")
+
+
+def add_hook(hook: Callable[[Profile], None]) -> None:
+    """Call hook with the collected profile whenever a profiled block exits."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[Profile], None]) -> None:
+    _hooks.remove(hook)
+
+
+@contextmanager
+def profiled() -> Iterator[Profile]:
+    """Collect a profile of the dotman operations run within the block.
+
+    Operations in worker threads started by dotman are included, as they run
+    in a copy of the caller's context.
+    """
+    profile = Profile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.wall_seconds = time.perf_counter() - profile.started
+        _current_profile.reset(token)
+        for hook in list(_hooks):
+            hook(profile)
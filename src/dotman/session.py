@@ -0,0 +1,85 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from dotman.add import _add_to_config
+from dotman.config import CONFIG_FILE_NAME, Config
+from dotman.context import DotfileMode, Platform, PlatformLiteral
+from dotman.edit import _edit_config
+from dotman.manifest import Manifest
+from dotman.util import resolve_path
+
+
+class Transaction:
+    """Apply many add/edit mutations to a project and write the configuration once.
+
+    Files are moved or copied as each mutation is applied, the configuration
+    file is only written on commit.
+    """
+
+    def __init__(self, project: Path, config: Config) -> None:
+        self.project = project
+        self.config = config
+        self.manifest = Manifest.from_project(project, config.settings.hash_algorithm)
+        self._dirty = False
+
+    def add(
+        self,
+        dotfile: Path | str,
+        target: Path | str | None = None,
+        *,
+        dotfile_mode: DotfileMode = "symlink",
+    ) -> None:
+        dotfile = resolve_path(dotfile)
+        if target is None:
+            target = Path(dotfile.name)
+        else:
+            target = Path(target)
+        _add_to_config(
+            self.config,
+            self.project,
+            dotfile,
+            target,
+            dotfile_mode=dotfile_mode,
+            manifest=self.manifest,
+        )
+        self._dirty = True
+
+    def edit(
+        self,
+        target: Path | str,
+        dotfile: Path | str,
+        platform: Platform | PlatformLiteral | None = None,
+    ) -> None:
+        dotfile = resolve_path(dotfile)
+        target = Path(target)
+        if isinstance(platform, str):
+            platform = Platform(platform)
+        _edit_config(self.config, self.project, dotfile, target, platform=platform)
+        self._dirty = True
+
+    def commit(self) -> None:
+        if not self._dirty:
+            return
+        self.config.write(Path(self.project, CONFIG_FILE_NAME))
+        self.manifest.save()
+        self._dirty = False
+
+
+@contextmanager
+def transaction(project: Path | str | None = None) -> Iterator[Transaction]:
+    """Load the configuration of a project once, and commit it when the block exits.
+
+    The configuration is also committed when the block raises, so that it
+    matches the dotfiles already moved into the project.
+    """
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    tx = Transaction(project, Config.from_project(project))
+    try:
+        yield tx
+    finally:
+        tx.commit()
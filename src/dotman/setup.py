@@ -1,43 +1,40 @@
+from dataclasses import replace
 from pathlib import Path
-import shutil
-from typing import cast, get_args
+from typing import Sequence, cast, get_args
 
-from dotman.config import Config, DotfileConfig
-from dotman.context import DotfileMode, get_context
+from dotman.context import DotfileMode
 from dotman.exceptions import DotmanException
-from dotman.util import format_target_path, resolve_path
+from dotman.fileops import copy_path, symlink
+from dotman.ignore import IgnoreRules
+from dotman.journal import (
+    DONE,
+    PENDING,
+    STARTED,
+    Journal,
+    check_journal,
+    partial_path,
+    remove_path,
+)
+from dotman.manifest import Manifest, TargetManifest, copy_recorded
+from dotman.plan import Plan, PlanEntry, compile_plan
+from dotman.util import map_in_order, resolve_path
+from dotman.walk import classify
 
 
 def _setup(target: Path, project: Path, dotfile_mode: DotfileMode):
-    full_target = resolve_path(Path(project, target))
-    formatted_target = format_target_path(target, project)
-    config = Config.from_project(project)
-    previous_dotconfig = config.dotfiles.get(formatted_target)
-    if previous_dotconfig is None:
-        raise DotmanException(
-            f"Provided target {target.as_posix()} is not configured in project {project.as_posix()}."
-        )
-    elif isinstance(previous_dotconfig, DotfileConfig):
-        context = get_context()
-        formatted_dotfile = previous_dotconfig.links[context.platform]
-    else:
-        formatted_dotfile = previous_dotconfig
-    if len(formatted_dotfile) == 0:
-        raise DotmanException(
-            f"Target {target.as_posix()} in project {project.as_posix()} is configured to empty."
-        )
-    dotfile_path = resolve_path(formatted_dotfile)
-    if dotfile_path.exists():
-        raise DotmanException(
-            f"Cannot setup target {target.as_posix()}, in project {project.as_posix()}, as the dotfile path {dotfile_path.as_posix()} already is occupied."
-        )
-    if dotfile_mode == "symlink":
-        dotfile_path.symlink_to(full_target)
-    elif dotfile_mode == "copy":
-        if full_target.is_dir():
-            shutil.copytree(full_target, dotfile_path)
-        else:
-            shutil.copy2(full_target, dotfile_path)
+    plan = _setup_plan(project, dotfile_mode, target=target)
+    entry = plan.entries[0]
+    manifest = Manifest.from_project(project, plan.hash_algorithm)
+    target_manifest = _setup_target_to_dotfile(
+        entry.target_path,
+        entry.dotfile_path,
+        dotfile_mode,
+        manifest.algorithm,
+        ignore=entry.ignore,
+    )
+    if target_manifest is not None:
+        manifest.set(entry.target, target_manifest)
+        manifest.save()
 
 
 def setup(
@@ -56,43 +53,162 @@ def setup(
     _setup(target, project, dotfile_mode)
 
 
-def _setup_project(project: Path, dotfile_mode: DotfileMode):
-    context = get_context()
-    config = Config.from_project(project)
-    targets_and_dotfiles = []
-    for formatted_target, formatted_dotconfig in config.dotfiles.items():
-        full_target = resolve_path(Path(project, formatted_target))
-        if isinstance(formatted_dotconfig, DotfileConfig):
-            formatted_dotfile_link = formatted_dotconfig.links.get(context.platform)
-            if formatted_dotfile_link is None:
-                raise DotmanException(
-                    f"Target {formatted_target}, in project {project.as_posix()} does not have a links configured for platform {context.platform}."
-                )
-        else:
-            formatted_dotfile_link = formatted_dotconfig
-        dotfile_path = resolve_path(formatted_dotfile_link)
-        if dotfile_path.exists():
-            raise DotmanException(
-                f"Cannot setup target {formatted_target}, in project {project.as_posix()}, as the dotfile path {formatted_dotfile_link} already is occupied."
-            )
-        targets_and_dotfiles.append((full_target, dotfile_path))
-    for full_target, dotfile in targets_and_dotfiles:
-        if dotfile_mode == "symlink":
-            dotfile.symlink_to(full_target)
-        elif dotfile_mode == "copy":
-            if full_target.is_dir():
-                shutil.copytree(full_target, dotfile)
-            else:
-                shutil.copy2(full_target, dotfile)
+def _check_setup_entry(
+    project: Path, entry: PlanEntry, journal: Journal | None = None
+) -> None:
+    if journal is not None and journal.state(entry.target) != PENDING:
+        # Created by the interrupted setup being resumed.
+        return
+    if classify(entry.dotfile_path).exists:
+        raise DotmanException(
+            f"Cannot setup target {entry.target}, in project {project.as_posix()}, as the dotfile path {entry.dotfile_path.as_posix()} already is occupied."
+        )
+
+
+def _setup_target_to_dotfile(
+    full_target: Path,
+    dotfile: Path,
+    dotfile_mode: DotfileMode,
+    algorithm: str | None = None,
+    partial: Path | None = None,
+    ignore: IgnoreRules | None = None,
+) -> TargetManifest | None:
+    """Set up the dotfile, returning the manifest of the copy when given an algorithm.
+
+    Directories are copied through partial when given, see copy_tree, leaving
+    out ignored paths. A symlinked directory shows all of its files.
+    """
+    if dotfile_mode == "symlink":
+        symlink(dotfile, full_target)
+    elif dotfile_mode == "copy" and algorithm is not None:
+        return copy_recorded(full_target, dotfile, dotfile, algorithm, partial, ignore)
+    else:
+        copy_path(full_target, dotfile, dotfile_mode, partial, ignore)
+    return None
+
+
+def _resume_setup_entry(
+    entry: PlanEntry, journal: Journal, dotfile_mode: DotfileMode
+) -> bool:
+    """Whether a target is still to be set up, cleaning up after an interrupted attempt."""
+    state = journal.state(entry.target)
+    if state == DONE:
+        return False
+    if state == STARTED:
+        if dotfile_mode != "symlink" and classify(entry.target_path).is_dir:
+            # Trees are renamed into place once complete, and otherwise
+            # continued from their partial directory.
+            return classify(entry.dotfile_path).lstat is None
+        # A link or file copy may be incomplete, and is redone.
+        remove_path(entry.dotfile_path)
+    return True
+
+
+def _setup_plan(
+    project: Path,
+    dotfile_mode: DotfileMode,
+    jobs: int = 1,
+    target: Path | None = None,
+    journal: Journal | None = None,
+) -> Plan:
+    plan = compile_plan(project, "setup", dotfile_mode)
+    if target is not None:
+        plan = replace(plan, entries=(plan.entry(target),), unlinked=())
+    for _ in map_in_order(
+        lambda entry: _check_setup_entry(project, entry, journal),
+        plan.linked_entries(),
+        jobs=jobs,
+    ):
+        pass
+    return plan
+
+
+def _setup_project(
+    project: Path, dotfile_mode: DotfileMode, jobs: int = 1, resume: bool = False
+):
+    journal = check_journal(project, "setup", dotfile_mode, resume)
+    plan = _setup_plan(project, dotfile_mode, jobs, journal=journal)
+    dotfiles = {entry.target: entry.dotfile_path for entry in plan.entries}
+    entries: Sequence[PlanEntry] = plan.entries
+    if journal is None:
+        # Links are created whole or not at all, so a symlink setup needs no
+        # journal to be resumed from.
+        if dotfile_mode != "symlink":
+            journal = Journal.create(project, "setup", dotfile_mode, dotfiles)
+    else:
+        journal.track(dotfiles)
+        entries = [
+            entry
+            for entry in entries
+            if _resume_setup_entry(entry, journal, dotfile_mode)
+        ]
+    manifest = Manifest.from_project(project, plan.hash_algorithm)
+
+    def setup_entry(entry: PlanEntry) -> TargetManifest | None:
+        if journal is not None:
+            journal.start(entry.target)
+        target_manifest = _setup_target_to_dotfile(
+            entry.target_path,
+            entry.dotfile_path,
+            dotfile_mode,
+            manifest.algorithm,
+            partial_path(entry.dotfile_path),
+            entry.ignore,
+        )
+        if journal is not None:
+            journal.finish(entry.target)
+        return target_manifest
+
+    try:
+        for entry, target_manifest in zip(
+            entries, map_in_order(setup_entry, entries, jobs=jobs)
+        ):
+            if target_manifest is not None:
+                manifest.set(entry.target, target_manifest)
+    finally:
+        manifest.save()
+    if journal is not None:
+        journal.remove()
 
 
 def setup_project(
-    project: Path | str | None = None, *, dotfile_mode: DotfileMode | None = None
+    project: Path | str | None = None,
+    *,
+    dotfile_mode: DotfileMode | None = None,
+    jobs: int = 1,
+    resume: bool = False,
 ):
+    """Set up every target of a project, checkpointing progress in a journal.
+
+    An interrupted setup must be continued with resume, or undone with
+    dotman.journal.rollback, before the project is set up again.
+    """
+    if dotfile_mode is None:
+        dotfile_mode = cast(DotfileMode, get_args(DotfileMode)[0])
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    _setup_project(project, dotfile_mode=dotfile_mode, jobs=jobs, resume=resume)
+
+
+def setup_plan(
+    target: Path | str | None = None,
+    project: Path | str | None = None,
+    *,
+    dotfile_mode: DotfileMode | None = None,
+    jobs: int = 1,
+) -> Plan:
+    """The plan setup would carry out for a target or the whole project, once checked."""
     if dotfile_mode is None:
         dotfile_mode = cast(DotfileMode, get_args(DotfileMode)[0])
     if project is None:
         project = resolve_path(".")
     else:
         project = resolve_path(project)
-    _setup_project(project, dotfile_mode=dotfile_mode)
+    return _setup_plan(
+        project,
+        dotfile_mode,
+        jobs,
+        target=None if target is None else Path(target),
+    )
@@ -1,10 +1,15 @@
 from dataclasses import dataclass
+from functools import partial
 import os
 from pathlib import Path
+from typing import Callable, Iterator
 
-from dotman.config import Config, DotfileConfig
-from dotman.context import get_context
-from dotman.util import folder_md5, md5_of_file, resolve_path
+from dotman.cache import HashCache
+from dotman.compare import FileEqual, compare_trees, files_equal
+from dotman.manifest import Manifest, TargetManifest, relative_key
+from dotman.plan import PlanEntry, compile_plan
+from dotman.util import digest_of_file, map_in_order, resolve_path
+from dotman.walk import FileRef, classify, same_inode, stat_of
 
 
 @dataclass
@@ -13,6 +18,14 @@ class DotfileLinkStatus:
     dotfile: Path
     status: str
 
+    @property
+    def category(self) -> str:
+        if self.status.startswith("Complete"):
+            return "complete"
+        if self.status.startswith("Missing"):
+            return "missing"
+        return "out-of-sync"
+
 
 @dataclass
 class DotfileProjectStatus:
@@ -20,73 +33,249 @@ class DotfileProjectStatus:
     links: list[DotfileLinkStatus]
 
 
-def _status(project: Path) -> DotfileProjectStatus:
-    context = get_context()
-    config = Config.from_project(project)
-    link_status: list[DotfileLinkStatus] = list()
-    for target, formatted_dotfile in config.dotfiles.items():
-        full_target = resolve_path(Path(project, target))
-        if isinstance(formatted_dotfile, DotfileConfig):
-            formatted_dotfile_link = formatted_dotfile.links[context.platform]
-        else:
-            formatted_dotfile_link = formatted_dotfile
-        dotfile_path = resolve_path(formatted_dotfile_link)
-        if not full_target.exists():
-            stat = "Missing target"
-        elif not dotfile_path.exists():
-            stat = "Missing Dotfile"
-        elif not dotfile_path.is_symlink():
-            if full_target.is_file():
-                if not dotfile_path.is_file():
-                    stat = "Dotfile is not a symlink, nor a file which the target is"
-                else:
-                    dotfile_md5 = md5_of_file(dotfile_path)
-                    target_md5 = md5_of_file(full_target)
-                    if dotfile_md5 == target_md5:
-                        stat = "Complete - Copy"
-                    else:
-                        stat = "Dotfile is not a symlink nor eqaul in content"
+def _same_file(a: FileRef, b: FileRef) -> bool:
+    return same_inode(stat_of(a), stat_of(b))
+
+
+def _manifest_file_equal(
+    target_manifest: TargetManifest,
+    dotfile_root: Path,
+    file_equal: FileEqual,
+    file_hash: Callable[[FileRef], str],
+) -> FileEqual:
+    """Compare files against the manifest recorded when they were copied.
+
+    A file whose stat is the recorded one has the recorded digest, so only
+    files whose stat changed since are read.
+    """
+    root = os.fspath(dotfile_root)
+
+    def equal(a: FileRef, b: FileRef) -> bool:
+        relative = relative_key(root, os.fspath(a))
+        a_recorded = target_manifest.matches(relative, a)
+        b_recorded = target_manifest.matches(relative, b)
+        if a_recorded and b_recorded:
+            return True
+        if not a_recorded and not b_recorded:
+            return file_equal(a, b)
+        recorded, other = (a, b) if a_recorded else (b, a)
+        if stat_of(recorded).st_size != stat_of(other).st_size:
+            return False
+        return file_hash(other) == target_manifest.digest(relative)
+
+    return equal
+
+
+def _link_status(
+    entry: PlanEntry,
+    file_equal: FileEqual,
+    first_difference: bool = False,
+    manifest: Manifest | None = None,
+    file_hash: Callable[[FileRef], str] | None = None,
+) -> DotfileLinkStatus:
+    full_target = entry.target_path
+    dotfile_path = entry.dotfile_path
+    # Each side is classified once, and the stat results are reused by the
+    # comparisons below.
+    target = classify(full_target)
+    dotfile = classify(dotfile_path)
+    if manifest is not None:
+        target_manifest = manifest.get(entry.target, dotfile_path)
+        if target_manifest is not None:
+            file_equal = _manifest_file_equal(
+                target_manifest,
+                dotfile_path,
+                file_equal,
+                file_hash or partial(digest_of_file, algorithm=manifest.algorithm),
+            )
+    if not target.exists:
+        stat = "Missing target"
+    elif not dotfile.exists:
+        stat = "Missing Dotfile"
+    elif not dotfile.is_symlink:
+        if target.is_file:
+            if not dotfile.is_file:
+                stat = "Dotfile is not a symlink, nor a file which the target is"
             else:
-                if not dotfile_path.is_dir():
-                    stat = (
-                        "Dotfile is not a symlink, nor a directory which the target is"
-                    )
+                if dotfile.same_file(target):
+                    stat = "Complete - Hardlink"
+                elif file_equal(dotfile, target):
+                    stat = "Complete - Copy"
                 else:
-                    dotfile_md5s = folder_md5(dotfile_path)
-                    target_md5s = folder_md5(full_target)
-                    extra_in_dotfile = set(dotfile_md5s.keys()) - set(
-                        target_md5s.keys()
-                    )
-                    extra_in_target = set(target_md5s.keys()) - set(dotfile_md5s.keys())
-                    if len(extra_in_dotfile) > 0:
-                        extra_path_str = ", ".join(
-                            [p.as_posix() for p in extra_in_dotfile]
-                        )
-                        stat = f"Dotfile is not a symlink, and contains extra files compared to target: {extra_path_str}"
-                    elif len(extra_in_target) > 0:
-                        extra_path_str = ", ".join(
-                            [p.as_posix() for p in extra_in_target]
-                        )
-                        stat = f"Dotfile is not a symlink, and is missing files compared to target: {extra_path_str}"
-                    else:
-                        stat = "Complete - Copy"
-                        for path in dotfile_md5s.keys():
-                            if dotfile_md5s[path] != target_md5s[path]:
-                                stat = f"Dotfile is not a symlink, and file {path.as_posix()} is not identical to target."
-                                break
-        elif Path(os.readlink(dotfile_path)) != full_target:
-            stat = "Dotfile link does not point to target"
+                    stat = "Dotfile is not a symlink nor eqaul in content"
         else:
-            stat = "Complete"
-        link_status.append(
-            DotfileLinkStatus(target=Path(target), dotfile=dotfile_path, status=stat)
+            if not dotfile.is_dir:
+                stat = "Dotfile is not a symlink, nor a directory which the target is"
+            else:
+                files_compared = 0
+                files_linked = 0
+
+                def tracking_equal(a: FileRef, b: FileRef) -> bool:
+                    # Only check for hardlinks until the first file that is not one.
+                    nonlocal files_compared, files_linked
+                    files_compared += 1
+                    if files_linked == files_compared - 1 and _same_file(a, b):
+                        files_linked += 1
+                    return file_equal(a, b)
+
+                diff = compare_trees(
+                    dotfile_path,
+                    full_target,
+                    file_equal=tracking_equal,
+                    first_difference=first_difference,
+                    ignore=entry.ignore,
+                )
+                if len(diff.extra) > 0:
+                    extra_path_str = ", ".join(diff.extra)
+                    stat = f"Dotfile is not a symlink, and contains extra files compared to target: {extra_path_str}"
+                elif len(diff.missing) > 0:
+                    extra_path_str = ", ".join(diff.missing)
+                    stat = f"Dotfile is not a symlink, and is missing files compared to target: {extra_path_str}"
+                elif len(diff.different) > 0:
+                    stat = f"Dotfile is not a symlink, and file {diff.different[0]} is not identical to target."
+                elif files_compared > 0 and files_compared == files_linked:
+                    stat = "Complete - Hardlink"
+                else:
+                    stat = "Complete - Copy"
+    elif dotfile.link is None or Path(dotfile.link) != full_target:
+        stat = "Dotfile link does not point to target"
+    else:
+        stat = "Complete"
+    return DotfileLinkStatus(
+        target=Path(entry.target), dotfile=dotfile_path, status=stat
+    )
+
+
+def _iter_status(
+    project: Path,
+    *,
+    use_cache: bool = True,
+    jobs: int = 1,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+    hash_cache: HashCache | None = None,
+) -> Iterator[DotfileLinkStatus]:
+    # The configuration is loaded before the first link is requested, so that
+    # configuration errors are raised by the call itself. A hash_cache passed
+    # in is shared with the caller, which saves it.
+    plan = compile_plan(project, "status", use_cache=use_cache)
+    entries = plan.linked_entries()
+    cache = None
+    if hash_cache is not None and hash_cache.algorithm == plan.hash_algorithm:
+        cache = hash_cache
+    elif use_cache:
+        cache = HashCache.from_project(project, plan.hash_algorithm)
+    file_hash = cache.digest if cache is not None else None
+    file_equal = partial(files_equal, file_hash=file_hash, trust_mtime=trust_mtime)
+    manifest = None
+    if use_cache:
+        manifest = Manifest.from_project(project, plan.hash_algorithm)
+    link_status = map_in_order(
+        lambda entry: _link_status(
+            entry, file_equal, first_difference, manifest, file_hash
+        ),
+        entries,
+        jobs=jobs,
+    )
+
+    def generate() -> Iterator[DotfileLinkStatus]:
+        try:
+            yield from link_status
+        finally:
+            if cache is not None and cache is not hash_cache:
+                cache.save()
+
+    return generate()
+
+
+def iter_status(
+    project: Path | str | None = None,
+    *,
+    use_cache: bool = True,
+    jobs: int = 1,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+) -> Iterator[DotfileLinkStatus]:
+    """Yield the status of each link of a project, in configuration order, as it is computed."""
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    return _iter_status(
+        project,
+        use_cache=use_cache,
+        jobs=jobs,
+        first_difference=first_difference,
+        trust_mtime=trust_mtime,
+    )
+
+
+def _status(
+    project: Path,
+    *,
+    use_cache: bool = True,
+    jobs: int = 1,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+    hash_cache: HashCache | None = None,
+) -> DotfileProjectStatus:
+    links = list(
+        _iter_status(
+            project,
+            use_cache=use_cache,
+            jobs=jobs,
+            first_difference=first_difference,
+            trust_mtime=trust_mtime,
+            hash_cache=hash_cache,
         )
-    return DotfileProjectStatus(project=project, links=link_status)
+    )
+    return DotfileProjectStatus(project=project, links=links)
+
+
+def status(
+    project: Path | str | None = None,
+    *,
+    use_cache: bool = True,
+    jobs: int = 1,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+) -> DotfileProjectStatus:
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    return _status(
+        project,
+        use_cache=use_cache,
+        jobs=jobs,
+        first_difference=first_difference,
+        trust_mtime=trust_mtime,
+    )
+
+
+def _drift(project: Path) -> dict[str, list[str]]:
+    plan = compile_plan(project, "status")
+    manifest = Manifest.from_project(project, plan.hash_algorithm)
+    drifted = dict()
+    for entry in plan.entries:
+        target_manifest = manifest.get(entry.target, entry.dotfile_path)
+        if target_manifest is not None:
+            drifted[entry.target] = target_manifest.drift(
+                entry.dotfile_path, entry.ignore
+            )
+    return drifted
+
 
+def drift(project: Path | str | None = None) -> dict[str, list[str]]:
+    """List the dotfiles changed since they were last copied by setup, sync or add.
 
-def status(project: Path | str | None = None) -> DotfileProjectStatus:
+    Targets are mapped to the relative paths of their changed files, with the
+    empty string for a file target. Only the stats of the dotfiles are compared
+    against the manifest, so this reads no file contents. Targets without a
+    manifest, such as symlinked ones, are left out.
+    """
     if project is None:
         project = resolve_path(".")
     else:
         project = resolve_path(project)
-    return _status(project)
+    return _drift(project)
@@ -1,107 +1,258 @@
+from dataclasses import dataclass, replace
+import os
 from pathlib import Path
 import shutil
 
-from dotman.config import Config, DotfileConfig
-from dotman.context import get_context
 from dotman.exceptions import DotmanException
-from dotman.util import format_target_path, resolve_path
+from dotman.fileops import copy_file
+from dotman.ignore import IgnoreRules
+from dotman.journal import DONE, Journal, check_journal
+from dotman.manifest import Manifest, ManifestRecorder, TargetManifest
+from dotman.profiling import stat
+from dotman.plan import Plan, PlanEntry, compile_plan
+from dotman.util import map_in_order, resolve_path
+from dotman.walk import PathInfo, classify, list_dir
 
 
 def _check_target_dotfile_sync_compatibility(
-    dotfile: Path, target: Path, project: Path
-):
-    if not dotfile.exists():
+    dotfile: Path | PathInfo, target: Path | PathInfo, project: Path
+) -> tuple[PathInfo, PathInfo]:
+    """Check the dotfile can be synced into the target, returning both classified."""
+    dotfile_info = classify(dotfile)
+    target_info = classify(target)
+    dotfile_path = dotfile_info.path.as_posix()
+    target_path = target_info.path.as_posix()
+    if not dotfile_info.exists:
         raise DotmanException(
-            f"Cannot refresh target {target.as_posix()}, in project {project.as_posix()}, as the dotfile path {dotfile.as_posix()} doesn't exist."
+            f"Cannot refresh target {target_path}, in project {project.as_posix()}, as the dotfile path {dotfile_path} doesn't exist."
         )
-    if dotfile.is_symlink():
+    if dotfile_info.is_symlink:
         raise DotmanException(
-            f"Cannot refresh target {target.as_posix()}, in project {project.as_posix()}, as the dotfile path {dotfile.as_posix()} is a symlink."
+            f"Cannot refresh target {target_path}, in project {project.as_posix()}, as the dotfile path {dotfile_path} is a symlink."
         )
-    if target.is_dir():
-        if not dotfile.is_dir():
+    if target_info.is_dir:
+        if not dotfile_info.is_dir:
             raise DotmanException(
-                f"Cannot refresh target {target.as_posix()}, in project {project.as_posix()}, as the dotfile path {dotfile.as_posix()} is not a directory."
+                f"Cannot refresh target {target_path}, in project {project.as_posix()}, as the dotfile path {dotfile_path} is not a directory."
             )
     else:
-        if not dotfile.is_file():
+        if not dotfile_info.is_file:
             raise DotmanException(
-                f"Cannot refresh target {target.as_posix()}, in project {project.as_posix()}, as the dotfile path {dotfile.as_posix()} is not a file."
+                f"Cannot refresh target {target_path}, in project {project.as_posix()}, as the dotfile path {dotfile_path} is not a file."
             )
+    return dotfile_info, target_info
 
 
-def _sync_target_to_dotfile(target: Path, dotfile: Path):
-    if target.is_dir():
-        shutil.rmtree(target)
-        shutil.copytree(dotfile, target)
+@dataclass
+class SyncResult:
+    target: Path
+    files_copied: int = 0
+    bytes_copied: int = 0
+    paths_removed: int = 0
+
+
+def _is_unchanged(source: os.stat_result, destination: os.stat_result) -> bool:
+    return (
+        source.st_size == destination.st_size
+        and source.st_mtime_ns == destination.st_mtime_ns
+    )
+
+
+def _remove_path(path: Path, is_dir: bool) -> None:
+    if is_dir:
+        shutil.rmtree(path)
     else:
-        target.unlink()
-        shutil.copy2(dotfile, target)
+        path.unlink()
 
 
-def _sync(target: Path, project: Path):
-    full_target = resolve_path(Path(project, target))
-    formatted_target = format_target_path(target, project)
-    config = Config.from_project(project)
-    previous_dotconfig = config.dotfiles.get(formatted_target)
-    if previous_dotconfig is None:
-        raise DotmanException(
-            f"Provided target {target.as_posix()} is not configured in project {project.as_posix()}."
+def _sync_tree(
+    source: Path,
+    destination: Path,
+    result: SyncResult,
+    recorder: ManifestRecorder | None = None,
+    ignore: IgnoreRules | None = None,
+    prefix: str = "",
+) -> None:
+    """Make destination a copy of source, only touching entries that differ.
+
+    Files are considered unchanged when size and modification time agree, which
+    holds for everything copied by copy_file, copy2 or copytree. The stat
+    results of the listed directory entries are reused. Ignored entries are
+    neither copied nor removed, on either side.
+    """
+    changed = False
+    source_files, source_dirs = list_dir(
+        source, follow_dir_symlinks=True, ignore=ignore, prefix=prefix
+    )
+    destination_entries = dict()
+    with os.scandir(destination) as entries:
+        for entry in entries:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if ignore is not None and ignore.ignores(prefix + entry.name, is_dir):
+                continue
+            if (source_dirs if is_dir else source_files).get(entry.name) is None:
+                _remove_path(Path(entry.path), is_dir)
+                if recorder is not None:
+                    recorder.removed(entry.path)
+                result.paths_removed += 1
+                changed = True
+            else:
+                destination_entries[entry.name] = entry
+    for name, source_entry in source_dirs.items():
+        destination_path = Path(destination, name)
+        if name not in destination_entries:
+            destination_path.mkdir()
+            changed = True
+        _sync_tree(
+            Path(source_entry.path),
+            destination_path,
+            result,
+            recorder,
+            ignore,
+            f"{prefix}{name}/",
         )
-    elif isinstance(previous_dotconfig, DotfileConfig):
-        context = get_context()
-        formatted_dotfile = previous_dotconfig.links[context.platform]
-    else:
-        formatted_dotfile = previous_dotconfig
-    if len(formatted_dotfile) == 0:
-        raise DotmanException(
-            f"Target {target.as_posix()} in project {project.as_posix()} is configured to empty."
+    for name, source_entry in source_files.items():
+        destination_entry = destination_entries.get(name)
+        if destination_entry is not None:
+            if _is_unchanged(
+                source_entry.stat(), destination_entry.stat(follow_symlinks=False)
+            ):
+                continue
+            os.unlink(destination_entry.path)
+        copy_function = copy_file if recorder is None else recorder.copy
+        result.bytes_copied += copy_function(
+            source_entry.path, os.path.join(destination, name)
         )
-    dotfile_path = resolve_path(formatted_dotfile)
-    _check_target_dotfile_sync_compatibility(
-        dotfile=dotfile_path, target=full_target, project=project
-    )
-    _sync_target_to_dotfile(target=full_target, dotfile=dotfile_path)
+        result.files_copied += 1
+        changed = True
+    if changed:
+        shutil.copystat(source, destination)
+
+
+def _sync_target_to_dotfile(
+    target: Path,
+    dotfile: Path,
+    recorder: ManifestRecorder | None = None,
+    ignore: IgnoreRules | None = None,
+) -> SyncResult:
+    result = SyncResult(target=target)
+    target_info = classify(target)
+    if target_info.is_dir:
+        _sync_tree(dotfile, target, result, recorder, ignore)
+    else:
+        if target_info.stat is not None and _is_unchanged(
+            stat(dotfile), target_info.stat
+        ):
+            return result
+        target.unlink()
+        copy_function = copy_file if recorder is None else recorder.copy
+        result.bytes_copied += copy_function(dotfile, target)
+        result.files_copied += 1
+    return result
+
+
+def _sync_recorded(manifest: Manifest, entry: PlanEntry) -> SyncResult:
+    # Files left unchanged keep their manifest records, as they still match.
+    target, dotfile = entry.target_path, entry.dotfile_path
+    target_manifest = manifest.get(entry.target, dotfile)
+    if target_manifest is None:
+        target_manifest = TargetManifest(dotfile=dotfile.as_posix())
+    recorder = ManifestRecorder(dotfile, target, manifest.algorithm, target_manifest)
+    result = _sync_target_to_dotfile(target, dotfile, recorder, entry.ignore)
+    manifest.set(entry.target, target_manifest)
+    return result
+
+
+def _sync_plan(project: Path, jobs: int = 1, target: Path | None = None) -> Plan:
+    plan = compile_plan(project, "sync")
+    if target is not None:
+        plan = replace(plan, entries=(plan.entry(target),), unlinked=())
+    for _ in map_in_order(
+        lambda entry: _check_target_dotfile_sync_compatibility(
+            entry.dotfile_path, entry.target_path, project
+        ),
+        plan.linked_entries(),
+        jobs=jobs,
+    ):
+        pass
+    return plan
+
+
+def _sync(target: Path, project: Path) -> SyncResult:
+    plan = _sync_plan(project, target=target)
+    entry = plan.entries[0]
+    manifest = Manifest.from_project(project, plan.hash_algorithm)
+    result = _sync_recorded(manifest, entry)
+    manifest.save()
+    return result
 
 
 def sync(
     target: Path | str,
     project: Path | str | None = None,
-):
+) -> SyncResult:
     if project is None:
         project = resolve_path(".")
     else:
         project = resolve_path(project)
     target = Path(target)
-    _sync(target, project)
-
-
-def _sync_project(project: Path) -> None:
-    context = get_context()
-    config = Config.from_project(project)
-    targets_and_dotfiles = []
-    for formatted_target, formatted_dotconfig in config.dotfiles.items():
-        full_target = resolve_path(Path(project, formatted_target))
-        if isinstance(formatted_dotconfig, DotfileConfig):
-            formatted_dotfile_link = formatted_dotconfig.links.get(context.platform)
-            if formatted_dotfile_link is None:
-                raise DotmanException(
-                    f"Target {formatted_target}, in project {project.as_posix()} does not have a links configured for platform {context.platform}."
-                )
-        else:
-            formatted_dotfile_link = formatted_dotconfig
-        dotfile_path = resolve_path(formatted_dotfile_link)
-        _check_target_dotfile_sync_compatibility(dotfile_path, full_target, project)
-        targets_and_dotfiles.append((full_target, dotfile_path))
-    for full_target, dotfile in targets_and_dotfiles:
-        _sync_target_to_dotfile(full_target, dotfile)
+    return _sync(target, project)
+
+
+def _sync_project(
+    project: Path, jobs: int = 1, resume: bool = False
+) -> list[SyncResult]:
+    journal = check_journal(project, "sync", "copy", resume)
+    plan = _sync_plan(project, jobs)
+    dotfiles = {entry.target: entry.dotfile_path for entry in plan.entries}
+    if journal is None:
+        journal = Journal.create(project, "sync", "copy", dotfiles)
+    else:
+        journal.track(dotfiles)
+    manifest = Manifest.from_project(project, plan.hash_algorithm)
+
+    def sync_entry(entry: PlanEntry) -> SyncResult:
+        # Syncing is incremental, so a target interrupted halfway is synced
+        # again, and only targets done are skipped.
+        if journal.state(entry.target) == DONE:
+            return SyncResult(target=entry.target_path)
+        journal.start(entry.target)
+        result = _sync_recorded(manifest, entry)
+        journal.finish(entry.target)
+        return result
+
+    try:
+        results = list(map_in_order(sync_entry, plan.entries, jobs=jobs))
+    finally:
+        manifest.save()
+    journal.remove()
+    return results
 
 
 def sync_project(
+    project: Path | str | None = None, *, jobs: int = 1, resume: bool = False
+) -> list[SyncResult]:
+    """Sync every target of a project, checkpointing progress in a journal.
+
+    An interrupted sync must be continued with resume before the project is
+    synced again.
+    """
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    return _sync_project(project, jobs=jobs, resume=resume)
+
+
+def sync_plan(
+    target: Path | str | None = None,
     project: Path | str | None = None,
-):
+    *,
+    jobs: int = 1,
+) -> Plan:
+    """The plan sync would carry out for a target or the whole project, once checked."""
     if project is None:
         project = resolve_path(".")
     else:
         project = resolve_path(project)
-    _sync_project(project)
+    return _sync_plan(project, jobs, target=None if target is None else Path(target))
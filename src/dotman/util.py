@@ -1,12 +1,30 @@
+from contextlib import contextmanager
+import contextvars
 from pathlib import Path
 import os
+from typing import Callable, Iterable, Iterator, TypeVar
 import sys
 import logging
+import threading
 
 import hashlib
+import io
+import mmap
 
 from dotman.context import Context, get_context
-from dotman.exceptions import DotmanException
+from dotman.exceptions import Cancelled, DotmanException
+from dotman.ignore import IgnoreRules
+from dotman.profiling import count, get_profile, timed
+from dotman.walk import walk_files
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_HASH_ALGORITHM = "md5"
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+MMAP_HASH_THRESHOLD = 64 * 1024 * 1024
 
 
 def format_path(path: Path) -> str:
@@ -20,9 +38,29 @@ def logger_setup(logger: logging.Logger) -> None:
     logger.addHandler(console_handler)
 
 
-def resolve_path(path: Path | str, context: Context | None = None) -> Path:
-    if context is None:
-        context = get_context()
+def write_atomic(path: Path, content: str) -> None:
+    """Write a text file through a temporary file, so readers never see a partial write.
+
+    The temporary file is unique to the process and thread, so that concurrent
+    writers each replace the file whole.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def make_state_dir(path: Path) -> None:
+    """Create the state directory of a project, with a .gitignore keeping its machine-local files out of git."""
+    path.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(Path(path, ".gitignore"), "x", encoding="utf-8") as f:
+            f.write("*\n")
+    except FileExistsError:
+        pass
+
+
+def _resolve_path(path: Path | str, context: Context) -> Path:
     norm_path = Path(os.path.normpath(path))
     if norm_path.is_absolute():
         return norm_path
@@ -34,6 +72,15 @@ def resolve_path(path: Path | str, context: Context | None = None) -> Path:
     return Path(os.path.normpath(Path(context.cwd, norm_path)))
 
 
+def resolve_path(path: Path | str, context: Context | None = None) -> Path:
+    if context is None:
+        context = get_context()
+    if get_profile() is None:
+        return _resolve_path(path, context)
+    with timed("resolve_path"):
+        return _resolve_path(path, context)
+
+
 def format_dotfile_path(path: Path, context: Context | None = None) -> str:
     if context is None:
         context = get_context()
@@ -58,21 +105,118 @@ def format_target_path(
     return formatted_target.as_posix()
 
 
-def md5_of_file(file_path, chunk_size=8192):
+def digest_of_file(
+    file_path: str | os.PathLike[str],
+    algorithm: str = DEFAULT_HASH_ALGORITHM,
+    chunk_size: int | None = None,
+) -> str:
+    """Compute the hex digest of a file with any hashlib algorithm.
+
+    Without an explicit chunk_size, large files are hashed through a memory map
+    and smaller ones with a buffer sized to the file.
+    """
+    with timed("hash"), open(file_path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        count("files_hashed")
+        count("bytes_read", size)
+        return digest_of_open_file(f, size, algorithm, chunk_size)
+
+
+def digest_of_open_file(
+    f: io.RawIOBase, size: int, algorithm: str, chunk_size: int | None = None
+) -> str:
+    """Compute the hex digest of an open unbuffered file, see digest_of_file."""
+    f.seek(0)
+    if chunk_size is None:
+        if size >= MMAP_HASH_THRESHOLD:
+            digest = hashlib.new(algorithm)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+            return digest.hexdigest()
+        if sys.version_info >= (3, 11):
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, size))
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        n_read = f.readinto(buffer)
+        if not n_read:
+            break
+        digest.update(view[:n_read])
+    return digest.hexdigest()
+
+
+def md5_of_file(file_path: Path | str, chunk_size: int | None = None) -> str:
     """Compute the MD5 checksum of a file in chunks (to handle large files)."""
-    md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(chunk_size), b""):
-            md5.update(chunk)
-    return md5.hexdigest()
+    return digest_of_file(file_path, "md5", chunk_size=chunk_size)
 
 
-def folder_md5(root_folder: Path) -> dict[Path, str]:
+def folder_md5(
+    root_folder: Path,
+    file_hash: Callable[[Path], str] = md5_of_file,
+    ignore: IgnoreRules | None = None,
+) -> dict[Path, str]:
     result = {}
     root_folder = resolve_path(root_folder)
-    for dirpath, _, filenames in os.walk(root_folder):
-        for filename in filenames:
-            file_path = Path(dirpath, filename)
-            rel_path = file_path.relative_to(root_folder)
-            result[rel_path] = md5_of_file(file_path)
+    for relative, entry in walk_files(root_folder, ignore=ignore):
+        result[Path(relative)] = file_hash(Path(entry.path))
     return result
+
+
+_cancel_event: contextvars.ContextVar[threading.Event | None] = contextvars.ContextVar(
+    "cancel_event", default=None
+)
+
+
+@contextmanager
+def cancellable(event: threading.Event) -> Iterator[None]:
+    """Stop the operations run within the block at their next item once event is set.
+
+    Operations stop by raising Cancelled before they start on the next target
+    or file, and clean up as they do for any other error.
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def check_cancelled() -> None:
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise Cancelled("The operation was cancelled.")
+
+
+def map_in_order(
+    func: Callable[[T], R], items: Iterable[T], jobs: int = 1
+) -> Iterator[R]:
+    """Apply func to items over a pool of jobs threads, yielding results in input order.
+
+    Every call runs in a copy of the caller's context, so get_context() sees the
+    same Context in the worker threads. At most 2 * jobs items are in flight,
+    so results are yielded as they complete and memory does not grow with the
+    number of items. Cancellation, see cancellable, is checked before each item.
+    """
+    if jobs <= 1:
+        for item in items:
+            check_cancelled()
+            yield func(item)
+        return
+    from collections import deque
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    context = contextvars.copy_context()
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    in_flight: deque[Future[R]] = deque()
+    try:
+        for item in items:
+            check_cancelled()
+            in_flight.append(executor.submit(context.copy().run, func, item))
+            if len(in_flight) >= 2 * jobs:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import errno
+import os
+from pathlib import Path
+import stat as stat_module
+from typing import Iterator, Union
+
+from dotman.ignore import IgnoreRules
+from dotman.profiling import count, stat
+
+# A file given either as a path, or as the DirEntry or PathInfo it was listed
+# or classified with, whose stat result is cached and reused by every consumer.
+FileRef = Union[Path, "os.DirEntry[str]", "PathInfo"]
+
+# Errors for which a path does not exist, as with Path.exists.
+_MISSING_ERRNOS = (errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP)
+
+
+@dataclass(frozen=True)
+class PathInfo:
+    """A path classified with one lstat, and a stat and readlink for symlinks only.
+
+    lstat is None when nothing is at path, and stat, the stat result following
+    symlinks, is None when path is missing or a dangling symlink. link is the
+    target of a symlink. A PathInfo can be used as a path, and as a FileRef
+    its stat is reused.
+    """
+
+    path: Path
+    lstat: os.stat_result | None = None
+    stat: os.stat_result | None = None
+    link: str | None = None
+
+    def __fspath__(self) -> str:
+        return os.fspath(self.path)
+
+    @property
+    def exists(self) -> bool:
+        return self.stat is not None
+
+    @property
+    def is_symlink(self) -> bool:
+        return self.lstat is not None and stat_module.S_ISLNK(self.lstat.st_mode)
+
+    @property
+    def is_file(self) -> bool:
+        return self.stat is not None and stat_module.S_ISREG(self.stat.st_mode)
+
+    @property
+    def is_dir(self) -> bool:
+        return self.stat is not None and stat_module.S_ISDIR(self.stat.st_mode)
+
+    def same_file(self, other: PathInfo) -> bool:
+        if self.stat is None or other.stat is None:
+            return False
+        return same_inode(self.stat, other.stat)
+
+
+def same_inode(a: os.stat_result, b: os.stat_result) -> bool:
+    """Whether two stat results are of the same file.
+
+    The stat results of DirEntry on Windows have st_ino and st_dev 0, which
+    identify no file, so they are never the same.
+    """
+    return a.st_ino != 0 and (a.st_ino, a.st_dev) == (b.st_ino, b.st_dev)
+
+
+def _stat_or_none(path: Path, follow_symlinks: bool) -> os.stat_result | None:
+    try:
+        return stat(path, follow_symlinks=follow_symlinks)
+    except OSError as e:
+        if e.errno in _MISSING_ERRNOS:
+            return None
+        raise
+
+
+def classify(path: Path | PathInfo) -> PathInfo:
+    """Classify a path, or return it if it already is a PathInfo."""
+    if isinstance(path, PathInfo):
+        return path
+    lstat_result = _stat_or_none(path, follow_symlinks=False)
+    if lstat_result is None or not stat_module.S_ISLNK(lstat_result.st_mode):
+        return PathInfo(path, lstat_result, lstat_result)
+    link = os.readlink(path)
+    count("syscalls")
+    return PathInfo(path, lstat_result, _stat_or_none(path, True), link)
+
+
+def stat_of(file: FileRef) -> os.stat_result:
+    if isinstance(file, os.DirEntry):
+        return file.stat()
+    if isinstance(file, PathInfo):
+        # A missing file raises as a path would.
+        return file.stat if file.stat is not None else stat(file.path)
+    return stat(file)
+
+
+def list_dir(
+    path: Path | str,
+    *,
+    follow_dir_symlinks: bool = False,
+    ignore: IgnoreRules | None = None,
+    prefix: str = "",
+) -> tuple[dict[str, os.DirEntry[str]], dict[str, os.DirEntry[str]]]:
+    """List a directory into its files and its subdirectories, keyed on name.
+
+    By default this mirrors os.walk: symlinks to directories are neither files
+    nor subdirectories. With follow_dir_symlinks they are subdirectories.
+    Entries matched by ignore are left out, prefix being the '/'-terminated
+    path of the directory relative to the root of the rules.
+    """
+    files: dict[str, os.DirEntry[str]] = dict()
+    dirs: dict[str, os.DirEntry[str]] = dict()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not follow_dir_symlinks and entry.is_symlink():
+                    continue
+                if ignore is not None and ignore.ignores(prefix + entry.name, True):
+                    count("paths_ignored")
+                    continue
+                dirs[entry.name] = entry
+            elif ignore is not None and ignore.ignores(prefix + entry.name, False):
+                count("paths_ignored")
+            else:
+                files[entry.name] = entry
+    return files, dirs
+
+
+def walk_files(
+    root: Path | str, prefix: str = "", ignore: IgnoreRules | None = None
+) -> Iterator[tuple[str, os.DirEntry[str]]]:
+    """Yield the relative '/'-separated path and DirEntry of every file below root.
+
+    The files of a directory come in sorted order before those of its
+    subdirectories, which are walked in sorted order, like os.walk. Ignored
+    directories are not descended into.
+    """
+    pending = [(os.fspath(root), prefix)]
+    while pending:
+        directory, directory_prefix = pending.pop()
+        files, dirs = list_dir(directory, ignore=ignore, prefix=directory_prefix)
+        for name in sorted(files):
+            yield directory_prefix + name, files[name]
+        for name in sorted(dirs, reverse=True):
+            pending.append((dirs[name].path, f"{directory_prefix}{name}/"))
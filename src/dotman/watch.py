@@ -0,0 +1,345 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import errno
+import logging
+import os
+from pathlib import Path
+import stat
+import threading
+import time
+from typing import Callable
+
+from dotman.exceptions import DotmanException
+from dotman.fileops import copy_file
+from dotman.ignore import IgnoreRules
+from dotman.inotify import (
+    IN_ATTRIB,
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_DELETE_SELF,
+    IN_DONT_FOLLOW,
+    IN_EXCL_UNLINK,
+    IN_IGNORED,
+    IN_ISDIR,
+    IN_MOVE_SELF,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    Inotify,
+)
+from dotman.plan import compile_plan
+from dotman.sync import (
+    SyncResult,
+    _check_target_dotfile_sync_compatibility,
+    _is_unchanged,
+    _remove_path,
+    _sync_target_to_dotfile,
+    _sync_tree,
+)
+from dotman.util import resolve_path
+from dotman.walk import classify
+
+logger = logging.getLogger(__name__)
+
+WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DONT_FOLLOW
+    | IN_EXCL_UNLINK
+)
+# Beyond this many changed paths, a target is synced as a whole instead, which
+# bounds the memory used by a burst of events.
+MAX_PENDING_PATHS = 1024
+# How often the stop event is checked while no events arrive.
+POLL_INTERVAL = 0.5
+
+
+@dataclass
+class _WatchedTarget:
+    target: Path
+    dotfile: Path
+    ignore: IgnoreRules | None = None
+    pending: set[str] = field(default_factory=set)
+    full_sync: bool = False
+
+    def mark(self, relative: str) -> None:
+        if self.full_sync:
+            return
+        self.pending.add(relative)
+        if len(self.pending) > MAX_PENDING_PATHS:
+            self.mark_full()
+
+    def mark_full(self) -> None:
+        self.full_sync = True
+        self.pending.clear()
+
+    def is_pending(self) -> bool:
+        return self.full_sync or len(self.pending) > 0
+
+
+@dataclass(frozen=True)
+class _Watch:
+    watched: _WatchedTarget
+    directory: Path
+    # For file targets the parent directory is watched, and events filtered on
+    # the file name, so that editors replacing the file are noticed.
+    name: str | None = None
+
+
+def _sync_changed_path(
+    source: Path,
+    destination: Path,
+    result: SyncResult,
+    ignore: IgnoreRules | None = None,
+    relative: str = "",
+) -> None:
+    try:
+        source_stat: os.stat_result | None = os.stat(source)
+    except FileNotFoundError:
+        source_stat = None
+    try:
+        destination_stat: os.stat_result | None = os.lstat(destination)
+    except FileNotFoundError:
+        destination_stat = None
+    if destination_stat is not None and (
+        source_stat is None
+        or stat.S_ISDIR(source_stat.st_mode) != stat.S_ISDIR(destination_stat.st_mode)
+    ):
+        _remove_path(destination, stat.S_ISDIR(destination_stat.st_mode))
+        result.paths_removed += 1
+        destination_stat = None
+    if source_stat is None:
+        return
+    if stat.S_ISDIR(source_stat.st_mode):
+        destination.mkdir(parents=True, exist_ok=True)
+        _sync_tree(source, destination, result, ignore=ignore, prefix=f"{relative}/")
+        return
+    if destination_stat is not None:
+        if _is_unchanged(source_stat, destination_stat):
+            return
+        destination.unlink()
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    result.bytes_copied += copy_file(source, destination)
+    result.files_copied += 1
+
+
+def _without_nested(relatives: set[str]) -> list[str]:
+    # A changed directory is synced as a whole, covering the paths inside it.
+    result: list[str] = list()
+    for relative in sorted(relatives):
+        if result and relative.startswith(result[-1] + "/"):
+            continue
+        result.append(relative)
+    return result
+
+
+class _Watcher:
+    def __init__(
+        self, inotify: Inotify, project: Path, targets: list[_WatchedTarget]
+    ) -> None:
+        self.inotify = inotify
+        self.project = project
+        self.targets = targets
+        self.watches: dict[int, list[_Watch]] = dict()
+        self.directories: dict[Path, int] = dict()
+
+    def _add(self, directory: Path, watch: _Watch) -> None:
+        try:
+            wd = self.inotify.add_watch(directory.as_posix(), WATCH_MASK)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise DotmanException(
+                    f"Cannot watch {directory.as_posix()}, the inotify watch limit is reached. Raise fs.inotify.max_user_watches."
+                )
+            if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise
+        self.watches.setdefault(wd, list()).append(watch)
+        self.directories[directory] = wd
+
+    def add_tree(self, watched: _WatchedTarget, directory: Path) -> None:
+        # Ignored directories are not watched, nor walked into.
+        ignore = watched.ignore
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            self._add(current, _Watch(watched, current))
+            prefix = ""
+            if ignore is not None and current != watched.dotfile:
+                prefix = f"{current.relative_to(watched.dotfile).as_posix()}/"
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False) and (
+                            ignore is None
+                            or not ignore.ignores(prefix + entry.name, True)
+                        ):
+                            pending.append(Path(entry.path))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def add_target(self, watched: _WatchedTarget) -> None:
+        if watched.dotfile.is_dir():
+            self.add_tree(watched, watched.dotfile)
+        else:
+            parent = watched.dotfile.parent
+            self._add(parent, _Watch(watched, parent, name=watched.dotfile.name))
+
+    def remove_tree(self, directory: Path) -> None:
+        for path in [p for p in self.directories if p.is_relative_to(directory)]:
+            wd = self.directories.pop(path)
+            self.watches.pop(wd, None)
+            self.inotify.rm_watch(wd)
+
+    def handle_events(self) -> None:
+        for event in self.inotify.read_events():
+            if event.mask & IN_Q_OVERFLOW:
+                for watched in self.targets:
+                    watched.mark_full()
+                continue
+            if event.mask & IN_IGNORED:
+                for watch in self.watches.pop(event.wd, list()):
+                    if self.directories.get(watch.directory) == event.wd:
+                        del self.directories[watch.directory]
+                continue
+            for watch in self.watches.get(event.wd, list()):
+                self._handle(watch, event.mask, event.name)
+
+    def _handle(self, watch: _Watch, mask: int, name: str) -> None:
+        watched = watch.watched
+        if watch.name is not None:
+            if name == watch.name:
+                watched.mark_full()
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            if watch.directory == watched.dotfile:
+                watched.mark_full()
+            return
+        path = Path(watch.directory, name)
+        relative = path.relative_to(watched.dotfile).as_posix()
+        if watched.ignore is not None and watched.ignore.ignores(
+            relative, bool(mask & IN_ISDIR)
+        ):
+            return
+        if mask & IN_ISDIR:
+            if mask & IN_MOVED_FROM:
+                self.remove_tree(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                # Files created before the watch was added are covered by
+                # syncing the directory as a whole.
+                self.add_tree(watched, path)
+        watched.mark(relative)
+
+    def flush(self) -> list[SyncResult]:
+        results = list()
+        for watched in self.targets:
+            if not watched.is_pending():
+                continue
+            try:
+                results.append(self._flush_target(watched))
+            except (DotmanException, OSError) as e:
+                message = e.message if isinstance(e, DotmanException) else str(e)
+                logger.warning(message)
+            if watched.full_sync and watched.dotfile.is_dir():
+                # The dotfile directory may have been replaced.
+                self.remove_tree(watched.dotfile)
+                self.add_target(watched)
+            watched.pending.clear()
+            watched.full_sync = False
+        return results
+
+    def _flush_target(self, watched: _WatchedTarget) -> SyncResult:
+        _check_target_dotfile_sync_compatibility(
+            watched.dotfile, watched.target, self.project
+        )
+        if watched.full_sync:
+            return _sync_target_to_dotfile(
+                watched.target, watched.dotfile, ignore=watched.ignore
+            )
+        result = SyncResult(target=watched.target)
+        for relative in _without_nested(watched.pending):
+            _sync_changed_path(
+                Path(watched.dotfile, relative),
+                Path(watched.target, relative),
+                result,
+                watched.ignore,
+                relative,
+            )
+        return result
+
+
+def _copy_targets(project: Path) -> list[_WatchedTarget]:
+    targets = list()
+    for entry in compile_plan(project, "sync").entries:
+        dotfile = classify(entry.dotfile_path)
+        if dotfile.is_symlink:
+            continue
+        _check_target_dotfile_sync_compatibility(dotfile, entry.target_path, project)
+        targets.append(
+            _WatchedTarget(
+                target=entry.target_path,
+                dotfile=entry.dotfile_path,
+                ignore=entry.ignore,
+            )
+        )
+    return targets
+
+
+def _watch(
+    project: Path,
+    debounce: float,
+    on_sync: Callable[[SyncResult], None] | None,
+    stop_event: threading.Event | None,
+) -> None:
+    targets = _copy_targets(project)
+    if len(targets) == 0:
+        raise DotmanException(
+            f"Project {project.as_posix()} has no copied dotfiles to watch."
+        )
+    with Inotify() as inotify:
+        watcher = _Watcher(inotify, project, targets)
+        # Watch before the initial sync, so that no change in between is missed.
+        for watched in targets:
+            watcher.add_target(watched)
+            watched.mark_full()
+        last_event = time.monotonic() - debounce
+        while stop_event is None or not stop_event.is_set():
+            if any(watched.is_pending() for watched in targets):
+                timeout = max(0.0, last_event + debounce - time.monotonic())
+            else:
+                timeout = POLL_INTERVAL
+            if inotify.wait(timeout):
+                watcher.handle_events()
+                last_event = time.monotonic()
+                continue
+            if time.monotonic() - last_event < debounce:
+                continue
+            for result in watcher.flush():
+                if on_sync is not None:
+                    on_sync(result)
+
+
+def watch(
+    project: Path | str | None = None,
+    *,
+    debounce: float = 0.5,
+    on_sync: Callable[[SyncResult], None] | None = None,
+    stop_event: threading.Event | None = None,
+) -> None:
+    """Sync the copied dotfiles of a project into it whenever they change, until stopped.
+
+    Changes are collected until no event arrives for `debounce` seconds, then
+    only the changed paths are synced.
+    """
+    if project is None:
+        project = resolve_path(".")
+    else:
+        project = resolve_path(project)
+    _watch(project, debounce, on_sync, stop_event)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, cast, get_args
+
+from dotman.cache import HASH_CACHE_FILE_NAME, HashCache
+from dotman.compiled import load_compiled_config
+from dotman.constants import STATE_DIR_NAME
+from dotman.context import DotfileMode
+from dotman.exceptions import DotmanException
+from dotman.plan import compile_plan
+from dotman.setup import _setup_project
+from dotman.status import DotfileProjectStatus, _status
+from dotman.sync import SyncResult, _sync_project
+from dotman.util import map_in_order, resolve_path
+
+
+@dataclass
+class Workspace:
+    """A list of dotman projects, operated on together."""
+
+    path: Path
+    projects: list[Path]
+
+    @classmethod
+    def from_file(cls, path: Path | str) -> Workspace:
+        import toml
+
+        path = resolve_path(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = toml.load(f)
+        except FileNotFoundError:
+            raise DotmanException(f"Workspace file {path.as_posix()} does not exist.")
+        except toml.TomlDecodeError as e:
+            raise DotmanException(
+                f"Workspace file {path.as_posix()} is not valid TOML: {e}"
+            )
+        projects = data.get("projects")
+        if not isinstance(projects, list) or not all(
+            isinstance(project, str) for project in projects
+        ):
+            raise DotmanException(
+                f"Workspace file {path.as_posix()} must contain a list of project paths named projects."
+            )
+        # Relative project paths are relative to the workspace file.
+        return cls(
+            path=path,
+            projects=[
+                resolve_path(
+                    project
+                    if Path(project).is_absolute() or project.startswith("~")
+                    else Path(path.parent, project)
+                )
+                for project in projects
+            ],
+        )
+
+    def hash_cache(self, algorithm: str) -> HashCache:
+        return HashCache(
+            Path(
+                self.path.parent,
+                STATE_DIR_NAME,
+                f"{algorithm}-{HASH_CACHE_FILE_NAME}",
+            ),
+            algorithm,
+        )
+
+
+@dataclass
+class DotfileClaim:
+    project: Path
+    target: str
+    dotfile: Path
+
+
+def find_conflicts(workspace: Workspace) -> list[tuple[DotfileClaim, DotfileClaim]]:
+    """Find dotfile paths claimed by more than one project, including nested paths."""
+    claims: list[DotfileClaim] = list()
+    for project in workspace.projects:
+        for entry in compile_plan(project, "status").entries:
+            claims.append(DotfileClaim(project, entry.target, entry.dotfile_path))
+    # After sorting on the path parts, a claim nested in another directly
+    # follows it or one of the claims nested in the same directory.
+    claims.sort(key=lambda claim: claim.dotfile.parts)
+    conflicts = list()
+    open_claims: list[DotfileClaim] = list()
+    for claim in claims:
+        open_claims = [
+            previous
+            for previous in open_claims
+            if claim.dotfile.is_relative_to(previous.dotfile)
+        ]
+        for previous in open_claims:
+            if previous.project != claim.project:
+                conflicts.append((previous, claim))
+        open_claims.append(claim)
+    return conflicts
+
+
+def _check_conflicts(workspace: Workspace) -> None:
+    conflicts = find_conflicts(workspace)
+    if len(conflicts) == 0:
+        return
+    conflict_msgs = [
+        f"{a.dotfile.as_posix()} (target {a.target} in {a.project.as_posix()}) and {b.dotfile.as_posix()} (target {b.target} in {b.project.as_posix()})"
+        for a, b in conflicts
+    ]
+    conflict_msg = "\n  ".join(conflict_msgs)
+    raise DotmanException(
+        f"Projects in workspace {workspace.path.as_posix()} claim the same dotfile paths:\n  {conflict_msg}"
+    )
+
+
+def _workspace_status(
+    workspace: Workspace,
+    *,
+    use_cache: bool = True,
+    jobs: int = 1,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+) -> Iterator[DotfileProjectStatus]:
+    _check_conflicts(workspace)
+    caches: dict[str, HashCache] = dict()
+    project_caches: dict[Path, HashCache] = dict()
+    if use_cache:
+        for project in workspace.projects:
+            algorithm = load_compiled_config(project).hash_algorithm
+            if algorithm not in caches:
+                caches[algorithm] = workspace.hash_cache(algorithm)
+            project_caches[project] = caches[algorithm]
+    project_status = map_in_order(
+        lambda project: _status(
+            project,
+            use_cache=use_cache,
+            first_difference=first_difference,
+            trust_mtime=trust_mtime,
+            hash_cache=project_caches.get(project),
+        ),
+        workspace.projects,
+        jobs=jobs,
+    )
+
+    def generate() -> Iterator[DotfileProjectStatus]:
+        try:
+            yield from project_status
+        finally:
+            for cache in caches.values():
+                cache.save()
+
+    return generate()
+
+
+def workspace_status(
+    workspace: Workspace | Path | str,
+    *,
+    use_cache: bool = True,
+    jobs: int = 1,
+    first_difference: bool = False,
+    trust_mtime: bool = False,
+) -> Iterator[DotfileProjectStatus]:
+    """Yield the status of each project of a workspace, in workspace order.
+
+    Projects are checked concurrently over jobs threads, and share one hash
+    cache per algorithm, stored next to the workspace file.
+    """
+    if not isinstance(workspace, Workspace):
+        workspace = Workspace.from_file(workspace)
+    return _workspace_status(
+        workspace,
+        use_cache=use_cache,
+        jobs=jobs,
+        first_difference=first_difference,
+        trust_mtime=trust_mtime,
+    )
+
+
+def workspace_setup(
+    workspace: Workspace | Path | str,
+    *,
+    dotfile_mode: DotfileMode | None = None,
+    jobs: int = 1,
+) -> None:
+    if not isinstance(workspace, Workspace):
+        workspace = Workspace.from_file(workspace)
+    if dotfile_mode is None:
+        dotfile_mode = cast(DotfileMode, get_args(DotfileMode)[0])
+    _check_conflicts(workspace)
+    for _ in map_in_order(
+        lambda project: _setup_project(project, dotfile_mode=dotfile_mode),
+        workspace.projects,
+        jobs=jobs,
+    ):
+        pass
+
+
+def workspace_sync(
+    workspace: Workspace | Path | str, *, jobs: int = 1
+) -> list[SyncResult]:
+    if not isinstance(workspace, Workspace):
+        workspace = Workspace.from_file(workspace)
+    _check_conflicts(workspace)
+    results: list[SyncResult] = list()
+    for project_results in map_in_order(_sync_project, workspace.projects, jobs=jobs):
+        results.extend(project_results)
+    return results
@@ -62,3 +62,13 @@ def test_as_copy(tmp_path: Path) -> None:
         config = Config.from_project(paths.project)
         assert paths.tmux_dir.name in config.dotfiles
         assert config.dotfiles[paths.tmux_dir.name] == "~/dot_config/tmux"
+
+
+def test_as_hardlink(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="add")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        add(dotfile="~/bashrc", dotfile_mode="hardlink")
+        add(dotfile="~/dot_config/tmux", dotfile_mode="hardlink")
+        assert not paths.bashrc.is_symlink()
+        assert paths.bashrc.samefile(paths.project_bashrc)
+        assert paths.tmux_config.samefile(paths.project_tmux_config)
@@ -0,0 +1,76 @@
+import asyncio
+from pathlib import Path
+import threading
+
+import pytest
+
+import dotman.manifest
+
+from dotman import aio
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.journal import Journal
+
+
+def test_contexts_per_task(tmp_path: Path) -> None:
+    first = setup_folder_structure(Path(tmp_path, "first"), stage="new-machine")
+    second = setup_folder_structure(Path(tmp_path, "second"), stage="new-machine")
+
+    async def with_managed_context() -> list[str]:
+        with managed_context(Context(home=second.home, cwd=second.project)):
+            await aio.setup_project(dotfile_mode="copy")
+            return [link.category async for link in aio.iter_status()]
+
+    async def main() -> tuple[list[str], list[str]]:
+        context = Context(home=first.home, cwd=first.project)
+        _, second_categories = await asyncio.gather(
+            aio.setup_project(context=context),
+            with_managed_context(),
+        )
+        status = await aio.status(context=context)
+        return [link.category for link in status.links], second_categories
+
+    first_categories, second_categories = asyncio.run(main())
+    assert first_categories == ["complete", "complete"]
+    assert second_categories == ["complete", "complete"]
+    assert first.bashrc.is_symlink()
+    assert not second.bashrc.is_symlink()
+    assert second.bashrc.read_text() == "ORIGIN: bashrc"
+
+
+def test_cancel_setup_project(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    for i in range(8):
+        Path(paths.project_tmux_dir, f"plugin-{i}.conf").write_text(f"Plugin {i}")
+    copying = threading.Event()
+    release = threading.Event()
+    copy_file_with_digest = dotman.manifest.copy_file_with_digest
+
+    def blocking_copy(source: str, destination: str, algorithm: str):
+        copying.set()
+        release.wait(timeout=10)
+        return copy_file_with_digest(source, destination, algorithm)
+
+    monkeypatch.setattr(dotman.manifest, "copy_file_with_digest", blocking_copy)
+    context = Context(home=paths.home, cwd=paths.project)
+
+    async def main() -> None:
+        task = asyncio.create_task(
+            aio.setup_project(dotfile_mode="copy", jobs=1, context=context)
+        )
+        await asyncio.to_thread(copying.wait, 10)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    # The setup stopped at the next target, and can be resumed.
+    with managed_context(context):
+        assert Journal.load(paths.project) is not None
+    monkeypatch.undo()
+    asyncio.run(aio.setup_project(dotfile_mode="copy", resume=True, context=context))
+    with managed_context(context):
+        assert Journal.load(paths.project) is None
+    assert len(list(paths.tmux_dir.iterdir())) == 9
@@ -0,0 +1,151 @@
+import errno
+import io
+import os
+from pathlib import Path
+import tarfile
+import tempfile
+
+import pytest
+
+from click.testing import CliRunner
+
+from dotman.bundle import export_bundle, setup_from_bundle
+from dotman.cli import cli
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+
+
+def _project(tmp_path: Path):
+    root = Path(tmp_path, "root")
+    with managed_context(Context(home=Path(root, "home"), cwd=tmp_path)):
+        paths = setup_folder_structure(root, stage="new-machine")
+    Path(paths.project_tmux_dir, "plugins").mkdir()
+    Path(paths.project_tmux_dir, "plugins", "a.conf").write_text("Plugin A")
+    Path(paths.project, ".dotmanignore").write_text("*.swp\n")
+    Path(paths.project_tmux_dir, ".tmux.conf.swp").write_text("Swap")
+    return paths
+
+
+def _new_home(tmp_path: Path, name: str) -> Path:
+    home = Path(tmp_path, name)
+    Path(home, "dot_config").mkdir(parents=True)
+    return home
+
+
+def test_bundle_roundtrip(tmp_path: Path) -> None:
+    paths = _project(tmp_path)
+    bundle = io.BytesIO()
+    assert export_bundle(bundle, paths.project) == 5
+    with tarfile.open(fileobj=io.BytesIO(bundle.getvalue()), mode="r:gz") as tar:
+        names = tar.getnames()
+    assert names[:2] == ["bundle.json", "project/.dotman.toml"]
+    assert names[-1] == "digests.json"
+    assert "project/tmux/plugins/a.conf" in names
+    assert "project/tmux/.tmux.conf.swp" not in names
+
+    home = _new_home(tmp_path, "new-home")
+    with managed_context(Context(home=home, cwd=home)):
+        installed = setup_from_bundle(io.BytesIO(bundle.getvalue()))
+    tmux_dir = Path(home, "dot_config", "tmux")
+    assert installed == [Path(home, "bashrc"), tmux_dir]
+    assert Path(home, "bashrc").read_text() == "ORIGIN: bashrc"
+    assert Path(tmux_dir, "plugins", "a.conf").read_text() == "Plugin A"
+    assert sorted(os.listdir(tmux_dir)) == ["plugins", "tmux.conf"]
+    assert Path(tmux_dir, "tmux.conf").stat().st_mtime == pytest.approx(
+        paths.project_tmux_config.stat().st_mtime
+    )
+
+    with managed_context(Context(home=home, cwd=home)):
+        with pytest.raises(DotmanException, match="already is occupied"):
+            setup_from_bundle(io.BytesIO(bundle.getvalue()))
+
+
+def test_corrupt_bundle(tmp_path: Path) -> None:
+    paths = _project(tmp_path)
+    bundle = io.BytesIO()
+    export_bundle(bundle, paths.project, compression="none")
+    content = bundle.getvalue()
+    home = _new_home(tmp_path, "new-home")
+    with managed_context(Context(home=home, cwd=home)):
+        corrupt = content.replace(b"Plugin A", b"Plugin B")
+        with pytest.raises(DotmanException, match="a.conf does not match its digest"):
+            setup_from_bundle(io.BytesIO(corrupt))
+        with pytest.raises(DotmanException, match="is corrupt"):
+            setup_from_bundle(io.BytesIO(content[: len(content) // 2]))
+        config_start = content.index(b"[dotfiles]")
+        for corrupt, reason in [
+            (content[:config_start] + b"{" + content[config_start + 1 :], "parsed"),
+            (content.replace(b"[dotfiles]", b"dotfiles=1"), "invalid"),
+        ]:
+            with pytest.raises(DotmanException, match=f"configuration .* {reason}"):
+                setup_from_bundle(io.BytesIO(corrupt))
+    # Nothing is left behind, not even the temporary copies.
+    assert sorted(os.listdir(home)) == ["dot_config"]
+    assert os.listdir(Path(home, "dot_config")) == []
+
+
+def test_bundle_cli(tmp_path: Path) -> None:
+    paths = _project(tmp_path)
+    bundle = Path(tmp_path, "dotfiles.tar.xz")
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        [
+            "bundle",
+            "export",
+            "-p",
+            str(paths.project),
+            "-o",
+            str(bundle),
+            "--compression",
+            "xz",
+        ],
+    )
+    assert result.exit_code == 0
+    assert result.output == f"Bundled 5 files into {bundle.as_posix()}\n"
+
+    home = _new_home(tmp_path, "new-home")
+    with managed_context(Context(home=home, cwd=home)):
+        result = runner.invoke(
+            cli,
+            ["setup", "--from-bundle", str(bundle), "--mode", "symlink"],
+        )
+        assert result.exit_code == 1
+        assert "cannot be set up with --mode symlink" in result.output
+        result = runner.invoke(
+            cli,
+            ["setup", "--from-bundle", "-", "--mode", "copy"],
+            input=bundle.read_bytes(),
+        )
+    assert result.exit_code == 0
+    assert Path(home, "dot_config", "tmux", "tmux.conf").read_text() == (
+        "ORIGIN: tmux.conf"
+    )
+
+
+def test_bundle_creates_missing_parents(tmp_path: Path) -> None:
+    paths = _project(tmp_path)
+    bundle = io.BytesIO()
+    export_bundle(bundle, paths.project)
+    home = Path(tmp_path, "empty-home")
+    home.mkdir()
+    with managed_context(Context(home=home, cwd=home)):
+        setup_from_bundle(io.BytesIO(bundle.getvalue()))
+    assert Path(home, "dot_config", "tmux", "plugins", "a.conf").exists()
+
+
+def test_bundle_staging_error(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = _project(tmp_path)
+    bundle = io.BytesIO()
+    export_bundle(bundle, paths.project)
+
+    def failing_mkdtemp(*args: object, **kwargs: object) -> str:
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(tempfile, "mkdtemp", failing_mkdtemp)
+    home = _new_home(tmp_path, "new-home")
+    with managed_context(Context(home=home, cwd=home)):
+        with pytest.raises(DotmanException, match="Cannot setup from bundle"):
+            setup_from_bundle(io.BytesIO(bundle.getvalue()))
+    assert sorted(os.listdir(home)) == ["dot_config"]
@@ -0,0 +1,129 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import dotman.cache
+from dotman.cache import HASH_CACHE_FILE_NAME, HashCache
+from dotman.config import STATE_DIR_NAME
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.status import status
+from dotman.util import digest_of_file, md5_of_file
+
+
+def _age(path: Path) -> None:
+    stat_result = path.stat()
+    old = stat_result.st_mtime_ns - 10_000_000_000
+    os.utime(path, ns=(old, old))
+
+
+@pytest.fixture
+def hash_calls(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    calls: list[Path] = []
+
+    def counting_digest(file_path: Path, algorithm: str) -> str:
+        calls.append(Path(file_path))
+        return digest_of_file(file_path, algorithm)
+
+    monkeypatch.setattr(dotman.cache, "digest_of_file", counting_digest)
+    return calls
+
+
+def test_digest_is_reused(tmp_path: Path, hash_calls: list[Path]) -> None:
+    file_a = Path(tmp_path, "a")
+    file_a.write_text("File A")
+    _age(file_a)
+    cache_path = Path(tmp_path, "cache.json")
+
+    cache = HashCache(cache_path)
+    assert cache.digest(file_a) == md5_of_file(file_a)
+    cache.save()
+    assert len(hash_calls) == 1
+
+    cache = HashCache(cache_path)
+    assert cache.digest(file_a) == md5_of_file(file_a)
+    assert len(hash_calls) == 1
+
+    file_a.write_text("File A, changed")
+    _age(file_a)
+    assert cache.digest(file_a) == md5_of_file(file_a)
+    assert len(hash_calls) == 2
+
+
+def test_recently_modified_file_is_not_cached(
+    tmp_path: Path, hash_calls: list[Path]
+) -> None:
+    file_a = Path(tmp_path, "a")
+    file_a.write_text("File A")
+    cache_path = Path(tmp_path, "cache.json")
+    cache = HashCache(cache_path)
+    cache.digest(file_a)
+    cache.save()
+    HashCache(cache_path).digest(file_a)
+    assert len(hash_calls) == 2
+
+
+def test_stale_entries_are_evicted(tmp_path: Path, hash_calls: list[Path]) -> None:
+    file_a = Path(tmp_path, "a")
+    file_b = Path(tmp_path, "b")
+    for path in [file_a, file_b]:
+        path.write_text(path.name)
+        _age(path)
+    cache_path = Path(tmp_path, "cache.json")
+    cache = HashCache(cache_path)
+    cache.digest(file_a)
+    cache.digest(file_b)
+    cache.save()
+
+    file_b.unlink()
+    cache = HashCache(cache_path)
+    cache.save()
+    assert os.fspath(file_a) in cache._entries
+    assert os.fspath(file_b) not in cache._entries
+
+
+def test_status_uses_cache(tmp_path: Path, hash_calls: list[Path]) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        for path in [
+            paths.bashrc,
+            paths.tmux_config,
+            paths.project_bashrc,
+            paths.project_tmux_config,
+        ]:
+            _age(path)
+        cache_path = Path(paths.project, STATE_DIR_NAME, HASH_CACHE_FILE_NAME)
+
+        stat = status(use_cache=False)
+        assert [link.status for link in stat.links] == ["Complete - Copy"] * 2
+        assert not cache_path.exists()
+        assert len(hash_calls) == 0
+
+        status()
+        assert cache_path.is_file()
+        assert len(hash_calls) == 4
+        stat = status()
+        assert [link.status for link in stat.links] == ["Complete - Copy"] * 2
+        assert len(hash_calls) == 4
+
+
+def test_status_uses_configured_algorithm(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with open(paths.project_config, "a", encoding="utf-8") as f:
+            f.write('\n[settings]\nhash_algorithm = "blake2b"\n')
+        for path in [paths.bashrc, paths.project_bashrc]:
+            _age(path)
+        stat = status()
+        assert stat.links[0].status == "Complete - Copy"
+        cache = HashCache.from_project(paths.project, "blake2b")
+        assert cache._entries[os.fspath(paths.bashrc)][3] == digest_of_file(
+            paths.bashrc, "blake2b"
+        )
+
+        config_text = paths.project_config.read_text()
+        paths.project_config.write_text(config_text.replace("blake2b", "not-a-hash"))
+        with pytest.raises(DotmanException):
+            status()
@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from dotman.cli import cli
+
+
+def test_import_is_lazy() -> None:
+    code = (
+        "import sys, dotman.cli; "
+        "print(sorted(m for m in ('pydantic', 'toml', 'dotman.config') if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert completed.stdout.strip() == "[]"
+
+
+def test_status(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(cli, ["--help"])
+    assert result.exit_code == 0
+    assert "status" in result.output
+
+    result = runner.invoke(cli, ["example", "complete", tmp_path.as_posix()])
+    assert result.exit_code == 0
+    result = runner.invoke(cli, ["status", Path(tmp_path, "home/project").as_posix()])
+    assert result.exit_code == 0
+    assert result.output.startswith("Project project\n")
+
+
+def test_add_many(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(cli, ["example", "add", tmp_path.as_posix()])
+    assert result.exit_code == 0
+    home = Path(tmp_path, "home")
+    project = Path(home, "project")
+    result = runner.invoke(
+        cli,
+        [
+            "add",
+            Path(home, "bashrc").as_posix(),
+            Path(home, "dot_config/tmux").as_posix(),
+            "-p",
+            project.as_posix(),
+        ],
+    )
+    assert result.exit_code == 0
+    assert Path(home, "bashrc").is_symlink()
+    assert Path(home, "dot_config/tmux").is_symlink()
+    assert Path(project, "tmux/tmux.conf").is_file()
+
+
+def test_add_many_same_name(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(cli, ["example", "add", tmp_path.as_posix()])
+    assert result.exit_code == 0
+    project = Path(tmp_path, "home/project")
+    configs = [Path(tmp_path, name, "config") for name in ("a", "b")]
+    for config in configs:
+        config.parent.mkdir()
+        config.write_text(config.parent.name)
+    result = runner.invoke(
+        cli,
+        ["add", *(config.as_posix() for config in configs), "-p", project.as_posix()],
+    )
+    assert result.exit_code == 1
+    assert "sharing the name config" in result.output
+    assert [config.read_text() for config in configs] == ["a", "b"]
+    assert not Path(project, "config").exists()
+
+
+def test_status_jsonl(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(cli, ["example", "complete", tmp_path.as_posix()])
+    assert result.exit_code == 0
+    project = Path(tmp_path, "home/project")
+    result = runner.invoke(cli, ["status", "--format", "jsonl", project.as_posix()])
+    assert result.exit_code == 0
+    lines = [json.loads(line) for line in result.output.splitlines()]
+    assert [line.get("target") for line in lines] == ["bashrc", "tmux", None]
+    assert lines[0]["category"] == "complete"
+    assert lines[-1]["summary"] == {"complete": 2}
@@ -0,0 +1,81 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import dotman.compare
+from dotman.compare import compare_trees, files_equal
+
+
+@pytest.mark.parametrize("mmap_threshold", [1, 1 << 40])
+def test_files_equal(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, mmap_threshold: int
+) -> None:
+    monkeypatch.setattr(dotman.compare, "MMAP_THRESHOLD", mmap_threshold)
+    file_a = Path(tmp_path, "a")
+    file_b = Path(tmp_path, "b")
+    file_a.write_bytes(b"x" * 3_000_000 + b"a")
+    file_b.write_bytes(b"x" * 3_000_000 + b"a")
+    assert files_equal(file_a, file_b)
+    file_b.write_bytes(b"x" * 3_000_000 + b"b")
+    assert not files_equal(file_a, file_b)
+    assert files_equal(file_a, file_a)
+
+
+def test_files_equal_checks_size_first(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def fail(*args: object) -> bool:
+        raise AssertionError("Contents should not be read")
+
+    monkeypatch.setattr(dotman.compare, "_contents_equal", fail)
+    file_a = Path(tmp_path, "a")
+    file_b = Path(tmp_path, "b")
+    file_a.write_text("Short")
+    file_b.write_text("Longer")
+    assert not files_equal(file_a, file_b)
+
+    file_b.write_text("Other")
+    stat_result = file_a.stat()
+    os.utime(file_b, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    assert files_equal(file_a, file_b, trust_mtime=True)
+
+
+def test_compare_trees(tmp_path: Path) -> None:
+    for root in ["a", "b"]:
+        Path(tmp_path, root, "sub").mkdir(parents=True)
+        Path(tmp_path, root, "same").write_text("Same")
+        Path(tmp_path, root, "sub", "changed").write_text(f"Changed in {root}")
+    Path(tmp_path, "a", "only_a").write_text("Only in a")
+    Path(tmp_path, "b", "sub", "only_b").write_text("Only in b")
+
+    diff = compare_trees(Path(tmp_path, "a"), Path(tmp_path, "b"))
+    assert diff.extra == ["only_a"]
+    assert diff.missing == ["sub/only_b"]
+    assert diff.different == ["sub/changed"]
+
+    diff = compare_trees(
+        Path(tmp_path, "a"), Path(tmp_path, "b"), first_difference=True
+    )
+    assert diff.extra == ["only_a"]
+    assert diff.missing == []
+    assert diff.different == []
+    assert not diff.is_empty()
+
+
+def test_files_equal_without_inodes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # As the stat results of DirEntry on Windows, which carry no inode.
+    def stat_without_inode(file: os.PathLike[str]) -> os.stat_result:
+        fields = list(os.stat(file))
+        fields[1:3] = [0, 0]
+        return os.stat_result(fields)
+
+    monkeypatch.setattr(dotman.compare, "stat_of", stat_without_inode)
+    file_a = Path(tmp_path, "a")
+    file_b = Path(tmp_path, "b")
+    file_a.write_text("a")
+    file_b.write_text("b")
+    assert not files_equal(file_a, file_b)
+    assert files_equal(file_a, file_a)
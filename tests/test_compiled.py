@@ -0,0 +1,70 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+import dotman.config
+from dotman.compiled import CONFIG_CACHE_FILE_NAME, load_compiled_config
+from dotman.config import STATE_DIR_NAME
+from dotman.context import Platform
+from dotman.edit import edit
+from dotman.examples import managed_setup, setup_folder_structure
+
+
+def test_compiled_links(tmp_path: Path) -> None:
+    with managed_setup(Path(tmp_path, "root"), stage="new-machine") as paths:
+        edit(target="tmux", dotfile="~/tmux", platform=Platform.windows)
+        config = load_compiled_config(paths.project)
+        assert config.hash_algorithm == "md5"
+        assert config.dotfiles(Platform.linux) == {
+            "bashrc": "~/bashrc",
+            "tmux": "~/dot_config/tmux",
+        }
+        assert config.dotfiles(Platform.windows) == {
+            "bashrc": "~/bashrc",
+            "tmux": "~/tmux",
+        }
+
+
+def test_cache_is_reused_and_invalidated(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    with managed_setup(Path(tmp_path, "root"), stage="new-machine") as paths:
+        cache_path = Path(paths.project, STATE_DIR_NAME, CONFIG_CACHE_FILE_NAME)
+        first = load_compiled_config(paths.project)
+        assert cache_path.is_file()
+
+        def fail(*args: object) -> None:
+            raise AssertionError("Config should be read from the cache")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(dotman.config.Config, "from_dict", fail)
+            assert load_compiled_config(paths.project) == first
+
+        # Same size and modification time, but different content.
+        config_stat = paths.project_config.stat()
+        content = paths.project_config.read_text()
+        paths.project_config.write_text(content.replace("~/bashrc", "~/bashrX"))
+        os.utime(
+            paths.project_config, ns=(config_stat.st_atime_ns, config_stat.st_mtime_ns)
+        )
+        config = load_compiled_config(paths.project)
+        assert config.dotfiles(Platform.linux)["bashrc"] == "~/bashrX"
+
+
+def test_status_without_pydantic(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete")
+    code = (
+        "import sys; from dotman.status import status; "
+        f"status({paths.project.as_posix()!r}); "
+        "print('pydantic' in sys.modules)"
+    )
+    outputs = [
+        subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        for _ in range(2)
+    ]
+    assert outputs == ["True", "False"]
@@ -0,0 +1,176 @@
+import errno
+import os
+from pathlib import Path
+import shutil
+import stat
+
+import pytest
+
+from dotman.context import DotfileMode
+from dotman.exceptions import DotmanException
+from dotman.fileops import copy_file, copy_path, copy_tree, reflink_file
+
+
+def test_reflink_file(tmp_path: Path) -> None:
+    # Falls back to a plain copy on filesystems without copy-on-write support.
+    file_a = Path(tmp_path, "a")
+    file_a.write_text("File A")
+    reflink_file(file_a, Path(tmp_path, "b"))
+    assert Path(tmp_path, "b").read_text() == "File A"
+    assert Path(tmp_path, "b").stat().st_mtime_ns == file_a.stat().st_mtime_ns
+    assert not os.path.samefile(file_a, Path(tmp_path, "b"))
+
+
+def test_copy_path_modes(tmp_path: Path) -> None:
+    source = Path(tmp_path, "source")
+    Path(source, "sub").mkdir(parents=True)
+    Path(source, "sub", "a").write_text("File A")
+    modes: list[DotfileMode] = ["copy", "reflink", "hardlink"]
+    for mode in modes:
+        destination = Path(tmp_path, mode)
+        copy_path(source, destination, mode)
+        assert Path(destination, "sub", "a").read_text() == "File A"
+        assert os.path.samefile(
+            Path(source, "sub", "a"), Path(destination, "sub", "a")
+        ) == (mode == "hardlink")
+        # Missing directories above the destination are created.
+        for name, relative in [("tree", "sub"), ("file", "sub/a")]:
+            nested = Path(tmp_path, "missing", mode, name)
+            copy_path(Path(source, relative), nested, mode)
+            assert nested.exists()
+
+
+def _write_sparse(path: Path) -> bytes:
+    with open(path, "wb") as f:
+        f.write(b"head")
+        f.seek(8 * 1024 * 1024)
+        f.write(b"tail")
+    return path.read_bytes()
+
+
+def test_copy_file(tmp_path: Path) -> None:
+    source = Path(tmp_path, "source")
+    content = _write_sparse(source)
+    os.chmod(source, 0o640)
+    os.utime(source, ns=(1_000_000_000, 2_000_000_000))
+    destination = Path(tmp_path, "destination")
+    assert copy_file(source, destination) == len(content)
+    assert destination.read_bytes() == content
+    assert stat.S_IMODE(destination.stat().st_mode) == 0o640
+    assert destination.stat().st_mtime_ns == 2_000_000_000
+    if source.stat().st_blocks * 512 < len(content):
+        assert destination.stat().st_blocks <= source.stat().st_blocks
+    with pytest.raises(shutil.SameFileError):
+        copy_file(source, source)
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="Named pipes are POSIX only")
+def test_copy_special_file(tmp_path: Path) -> None:
+    fifo = Path(tmp_path, "fifo")
+    os.mkfifo(fifo)
+    for copy_function in [copy_file, reflink_file]:
+        with pytest.raises(shutil.SpecialFileError):
+            copy_function(fifo, Path(tmp_path, "destination"))
+
+
+@pytest.mark.parametrize(
+    "unsupported", [["copy_file_range"], ["copy_file_range", "sendfile"]]
+)
+def test_copy_file_fallbacks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, unsupported: list[str]
+) -> None:
+    def fail(*args: object) -> int:
+        raise OSError(errno.EXDEV, "Unsupported")
+
+    for name in unsupported:
+        monkeypatch.setattr(os, name, fail)
+    source = Path(tmp_path, "source")
+    source.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    destination = Path(tmp_path, "destination")
+    copy_file(source, destination)
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_copy_file_kernel_copies_nothing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # As copy_file_range and sendfile do for files of some special filesystems.
+    def copy_nothing(*args: object) -> int:
+        return 0
+
+    for name in ["copy_file_range", "sendfile"]:
+        monkeypatch.setattr(os, name, copy_nothing, raising=False)
+    source = Path(tmp_path, "source")
+    source.write_bytes(os.urandom(100_000))
+    destination = Path(tmp_path, "destination")
+    assert copy_file(source, destination) == 100_000
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_copy_file_shorter_than_size(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fstat = os.fstat
+
+    def misleading_fstat(fd: int) -> os.stat_result:
+        fields = list(fstat(fd))
+        fields[stat.ST_SIZE] += 10
+        return os.stat_result(fields)
+
+    monkeypatch.setattr(os, "fstat", misleading_fstat)
+    source = Path(tmp_path, "source")
+    source.write_text("Short")
+    destination = Path(tmp_path, "destination")
+    with pytest.raises(DotmanException, match="ended before its size of 15 bytes"):
+        copy_file(source, destination)
+    assert not destination.exists()
+
+
+def test_copy_tree(tmp_path: Path) -> None:
+    source = Path(tmp_path, "source")
+    Path(source, "a", "b").mkdir(parents=True)
+    Path(source, "a", "b", "c").write_text("File C")
+    Path(source, "d").write_text("File D")
+    os.utime(Path(source, "a"), ns=(1_000_000_000, 2_000_000_000))
+    destination = Path(tmp_path, "destination")
+    copy_tree(source, destination)
+    assert Path(destination, "a", "b", "c").read_text() == "File C"
+    assert Path(destination, "d").read_text() == "File D"
+    assert Path(destination, "a").stat().st_mtime_ns == 2_000_000_000
+
+    for name, partial in [("a", None), ("b", Path(tmp_path, "partial"))]:
+        nested = Path(tmp_path, "missing", name, "destination")
+        copy_tree(source, nested, partial=partial)
+        assert Path(nested, "d").read_text() == "File D"
+
+
+def test_copy_tree_parallel_and_atomic(tmp_path: Path) -> None:
+    source = Path(tmp_path, "source")
+    for i in range(4):
+        Path(source, f"dir-{i}").mkdir(parents=True)
+        for j in range(8):
+            Path(source, f"dir-{i}", f"file-{j}").write_text(f"File {i} {j}")
+    os.chmod(Path(source, "dir-0"), 0o750)
+    destination = Path(tmp_path, "destination")
+    copy_tree(source, destination, jobs=4)
+    for i in range(4):
+        for j in range(8):
+            assert Path(destination, f"dir-{i}", f"file-{j}").read_text() == (
+                f"File {i} {j}"
+            )
+    assert stat.S_IMODE(Path(destination, "dir-0").stat().st_mode) == 0o750
+    assert stat.S_IMODE(destination.stat().st_mode) == stat.S_IMODE(
+        source.stat().st_mode
+    )
+    with pytest.raises(FileExistsError):
+        copy_tree(source, destination)
+
+    def failing_copy(src: str, dst: str) -> None:
+        if src.endswith("file-5"):
+            raise OSError(errno.EIO, "Failed copy")
+        copy_file(src, dst)
+
+    failed = Path(tmp_path, "failed")
+    with pytest.raises(OSError):
+        copy_tree(source, failed, copy_function=failing_copy, jobs=4)
+    assert sorted(os.listdir(tmp_path)) == ["destination", "source"]
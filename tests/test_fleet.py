@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+
+from click.testing import CliRunner
+
+from dotman.cli import cli
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.fleet import fleet, summarize
+
+
+def test_fleet(tmp_path: Path) -> None:
+    root = Path(tmp_path, "root")
+    with managed_context(Context(home=Path(root, "home"), cwd=tmp_path)):
+        paths = setup_folder_structure(root, stage="new-machine")
+    homes = [Path(tmp_path, "homes", f"user-{i}") for i in range(3)]
+    for home in homes:
+        Path(home, "dot_config").mkdir(parents=True)
+    Path(homes[2], "bashrc").write_text("Not from the project")
+
+    with managed_context(Context(cwd=paths.project)):
+        pattern = Path(tmp_path, "homes", "user-*")
+        results = fleet("setup", [pattern], dotfile_mode="copy", processes=2)
+        assert [result.home for result in results] == homes
+        assert [result.error is None for result in results] == [True, True, False]
+        assert "already is occupied" in str(results[2].error)
+        assert Path(homes[0], "dot_config", "tmux", "tmux.conf").read_text() == (
+            "ORIGIN: tmux.conf"
+        )
+
+        results = fleet("status", homes[:2], processes=2)
+        assert [result.links for result in results] == [
+            {"bashrc": "complete", "tmux": "complete"}
+        ] * 2
+        Path(homes[1], "bashrc").write_text("Changed")
+        results = fleet("status", homes, processes=1)
+        assert summarize(results) == {
+            "ok": 1,
+            "incomplete": 2,
+            "complete": 3,
+            "out-of-sync": 2,
+            "missing": 1,
+        }
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ["fleet", "status", str(homes[0])])
+        assert result.exit_code == 0
+        result = runner.invoke(
+            cli, ["fleet", "status", *map(str, homes[:2]), "--processes", "2"]
+        )
+        assert result.exit_code == 1
+        assert result.output.splitlines() == [
+            f"{homes[0].as_posix()}: 2 complete",
+            f"{homes[1].as_posix()}: 1 out-of-sync, 1 complete",
+            "Summary: 1 ok, 3 complete, 1 incomplete, 1 out-of-sync",
+        ]
+
+
+def test_fleet_sync_one_home(tmp_path: Path) -> None:
+    root = Path(tmp_path, "root")
+    with managed_context(Context(home=Path(root, "home"), cwd=tmp_path)):
+        paths = setup_folder_structure(root, stage="new-machine")
+    homes = [Path(tmp_path, "homes", f"user-{i}") for i in range(2)]
+    for home in homes:
+        Path(home, "dot_config").mkdir(parents=True)
+    with managed_context(Context(cwd=paths.project)):
+        result = CliRunner().invoke(
+            cli, ["fleet", "setup", *map(str, homes), "--mode", "copy"]
+        )
+        assert result.exit_code == 0
+        with pytest.raises(DotmanException, match="only one home can be synced"):
+            fleet("sync", homes)
+        Path(homes[1], "bashrc").write_text("Changed")
+        [synced] = fleet("sync", homes[1:])
+        assert (synced.error, synced.files_copied) == (None, 1)
+    assert paths.project_bashrc.read_text() == "Changed"
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import pytest
+
+import dotman.cache
+
+from dotman.config import Config, DotfileConfig
+from dotman.constants import IGNORE_FILE_NAME
+from dotman.context import Context, Platform, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.ignore import IgnoreRules, ignore_rules
+from dotman.profiling import profiled
+from dotman.setup import setup_project
+from dotman.status import drift, status
+from dotman.sync import sync_project
+
+
+def test_ignore_rules() -> None:
+    rules = IgnoreRules(
+        "nvim",
+        ["# Caches", "", "__pycache__/", "nvim/lazy-lock.json"],
+        ["/plugin/*.log", "**/tmp/**", "cache[0-9]", "*.swp", "!keep.swp"],
+    )
+    assert rules.ignores("__pycache__", True)
+    assert rules.ignores("a/b/__pycache__", True)
+    assert not rules.ignores("__pycache__", False)
+    assert rules.ignores("lazy-lock.json", False)
+    assert not rules.ignores("a/lazy-lock.json", False)
+    assert rules.ignores("plugin/a.log", False)
+    assert not rules.ignores("plugin/a/b.log", False)
+    assert not rules.ignores("other/plugin/a.log", False)
+    assert rules.ignores("a/tmp/b", False)
+    assert rules.ignores("cache1", True)
+    assert not rules.ignores("cache", True)
+    assert rules.ignores("a/.b.swp", False)
+    assert not rules.ignores("a/keep.swp", False)
+    assert rules.excludes("a/__pycache__/b.pyc")
+    assert not rules.excludes("a/b.pyc")
+    assert ignore_rules("nvim", ["# Only a comment"], []) is None
+
+
+def _configure_ignore(project: Path) -> None:
+    config = Config.from_project(project)
+    link = config.dotfiles["tmux"]
+    assert isinstance(link, str)
+    config.dotfiles["tmux"] = DotfileConfig(
+        links={platform: link for platform in Platform},
+        ignore=["plugins/node_modules/", "*.lock", "!keep.lock"],
+    )
+    config.write(Path(project, ".dotman.toml"))
+    Path(project, IGNORE_FILE_NAME).write_text("__pycache__/\n")
+
+
+def test_ignored_paths(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(dotman.cache, "RACY_WINDOW_NS", -(10**18))
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    _configure_ignore(paths.project)
+    for relative in [
+        "plugins/a.conf",
+        "plugins/node_modules/x/index.js",
+        "plugins/node_modules/y/index.js",
+        "__pycache__/a.pyc",
+        "plugins/__pycache__/b.pyc",
+        "plugins.lock",
+        "keep.lock",
+    ]:
+        path = Path(paths.project_tmux_dir, relative)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with profiled() as profile:
+            setup_project(dotfile_mode="copy")
+        assert profile.counters["files_copied"] == 4
+        # Ignored directories are pruned as a whole, not walked into.
+        assert profile.counters["paths_ignored"] == 4
+        assert sorted(
+            path.relative_to(paths.tmux_dir).as_posix()
+            for path in paths.tmux_dir.rglob("*")
+            if path.is_file()
+        ) == ["keep.lock", "plugins/a.conf", "tmux.conf"]
+        assert [link.category for link in status().links] == ["complete"] * 2
+
+        Path(paths.tmux_dir, "__pycache__").mkdir()
+        Path(paths.tmux_dir, "__pycache__", "c.pyc").write_text("c")
+        Path(paths.tmux_dir, "plugins", "a.conf").write_text("Updated plugin")
+        Path(paths.tmux_dir, "other.lock").write_text("other.lock")
+        assert drift() == {"bashrc": [], "tmux": ["plugins/a.conf"]}
+        assert [link.category for link in status().links] == [
+            "complete",
+            "out-of-sync",
+        ]
+        results = sync_project()
+        assert (results[1].files_copied, results[1].paths_removed) == (1, 0)
+        assert Path(paths.project_tmux_dir, "plugins/node_modules/x/index.js").exists()
+        assert not Path(paths.project_tmux_dir, "__pycache__/c.pyc").exists()
+        assert not Path(paths.project_tmux_dir, "other.lock").exists()
+        assert [link.category for link in status().links] == ["complete"] * 2
@@ -0,0 +1,152 @@
+from pathlib import Path
+
+import pytest
+
+from click.testing import CliRunner
+
+import dotman.manifest
+
+from dotman.cli import cli
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.journal import Journal, partial_path, rollback
+from dotman.profiling import profiled
+from dotman.setup import setup_project
+from dotman.sync import sync_project
+
+
+def _fail_on(monkeypatch: pytest.MonkeyPatch, name: str) -> None:
+    copy_file_with_digest = dotman.manifest.copy_file_with_digest
+
+    def failing_copy(source: str, destination: str, algorithm: str):
+        if Path(source).name == name:
+            raise OSError("No space left on device")
+        return copy_file_with_digest(source, destination, algorithm)
+
+    monkeypatch.setattr(dotman.manifest, "copy_file_with_digest", failing_copy)
+
+
+def _interrupted_setup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    for i in range(4):
+        Path(paths.project_tmux_dir, f"plugin-{i}.conf").write_text(f"Plugin {i}")
+    with monkeypatch.context() as patch:
+        _fail_on(patch, "plugin-2.conf")
+        with managed_context(Context(home=paths.home, cwd=paths.project)):
+            with pytest.raises(OSError):
+                setup_project(dotfile_mode="copy")
+    return paths
+
+
+def test_resume_setup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = _interrupted_setup(tmp_path, monkeypatch)
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        journal = Journal.load(paths.project)
+        assert journal is not None
+        assert journal.state("bashrc") == "done"
+        assert journal.state("tmux") == "started"
+        assert paths.bashrc.read_text() == "ORIGIN: bashrc"
+        assert not paths.tmux_dir.exists()
+        partial = partial_path(paths.tmux_dir)
+        assert partial.is_dir()
+
+        with pytest.raises(DotmanException, match="--resume"):
+            setup_project(dotfile_mode="copy")
+        with pytest.raises(DotmanException, match="--resume"):
+            setup_project(dotfile_mode="symlink", resume=True)
+        with pytest.raises(DotmanException, match="--resume"):
+            sync_project()
+        # Rolling back is only offered for setup.
+        result = CliRunner().invoke(cli, ["sync", "--rollback"])
+        assert result.exit_code == 2
+        assert paths.bashrc.read_text() == "ORIGIN: bashrc"
+
+        copied_before = len(list(partial.iterdir()))
+        with profiled() as profile:
+            setup_project(dotfile_mode="copy", resume=True)
+        # Only the files not copied before the interruption are copied.
+        assert profile.counters["files_copied"] == 5 - copied_before
+        assert Journal.load(paths.project) is None
+        assert not partial.exists()
+        assert sorted(path.name for path in paths.tmux_dir.iterdir()) == [
+            "plugin-0.conf",
+            "plugin-1.conf",
+            "plugin-2.conf",
+            "plugin-3.conf",
+            "tmux.conf",
+        ]
+        assert Path(paths.tmux_dir, "plugin-2.conf").read_text() == "Plugin 2"
+
+
+def test_rollback_setup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = _interrupted_setup(tmp_path, monkeypatch)
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        removed = rollback()
+        assert removed == [paths.bashrc, partial_path(paths.tmux_dir)]
+        assert not paths.bashrc.exists()
+        assert Journal.load(paths.project) is None
+        with pytest.raises(DotmanException, match="no interrupted"):
+            rollback()
+        setup_project(dotfile_mode="symlink")
+        assert paths.bashrc.is_symlink()
+
+
+def test_resume_sync(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.bashrc.write_text("Updated bashrc")
+        paths.tmux_config.write_text("Updated tmux")
+        with monkeypatch.context() as patch:
+            _fail_on(patch, "tmux.conf")
+            with pytest.raises(OSError):
+                sync_project()
+        with pytest.raises(DotmanException, match="cannot be rolled back"):
+            rollback()
+        result = CliRunner().invoke(cli, ["sync", "--rollback"])
+        assert result.exit_code == 2
+        assert "No such option '--rollback'" in result.output
+        results = sync_project(resume=True)
+        assert [result.files_copied for result in results] == [0, 1]
+        assert paths.project_tmux_config.read_text() == "Updated tmux"
+        assert Journal.load(paths.project) is None
+
+
+def test_journal_appends_states(tmp_path: Path) -> None:
+    with managed_context(Context(home=Path(tmp_path, "home"), cwd=tmp_path)):
+        dotfiles = {f"target-{i}": Path(tmp_path, f"dotfile-{i}") for i in range(3)}
+        journal = Journal.create(tmp_path, "setup", "copy", dotfiles)
+        header = journal.path.read_text()
+        journal.start("target-0")
+        journal.finish("target-0")
+        journal.start("target-1")
+        # Each state is appended, without rewriting the targets.
+        lines = journal.path.read_text().splitlines()
+        assert lines[0] + "\n" == header
+        assert len(lines) == 4
+        # A line cut short by an interruption is ignored.
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('["target-1", "do')
+        loaded = Journal.load(tmp_path)
+        assert loaded is not None
+        assert [loaded.state(target) for target in dotfiles] == [
+            "done",
+            "started",
+            "pending",
+        ]
+        journal.remove()
+        assert Journal.load(tmp_path) is None
+
+
+def test_symlink_setup_keeps_no_journal(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+
+    def fail(*args: object) -> None:
+        raise AssertionError("No journal should be created")
+
+    monkeypatch.setattr(Journal, "create", fail)
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        setup_project(dotfile_mode="symlink")
+    assert paths.bashrc.is_symlink()
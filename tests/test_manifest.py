@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+import hashlib
+
+import pytest
+
+import dotman.cache
+
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.fileops import copy_file_with_digest
+from dotman.manifest import Manifest
+from dotman.profiling import profiled
+from dotman.setup import setup_project
+from dotman.status import drift, status
+from dotman.sync import sync_project
+
+
+@pytest.fixture(autouse=True)
+def record_recent_files(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Record the digests of the files just written.
+    monkeypatch.setattr(dotman.cache, "RACY_WINDOW_NS", -(10**18))
+
+
+def _md5(path: Path) -> str:
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def test_setup_records_manifest(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        setup_project(dotfile_mode="copy")
+        manifest = Manifest.from_project(paths.project, "md5")
+        bashrc = manifest.get("bashrc", paths.bashrc)
+        tmux = manifest.get("tmux", paths.tmux_dir)
+        assert bashrc is not None and tmux is not None
+        assert bashrc.digest("") == _md5(paths.bashrc)
+        assert tmux.digest("tmux.conf") == _md5(paths.tmux_config)
+        assert manifest.get("bashrc", paths.tmux_dir) is None
+
+        # Matching stats on both sides mean no file is read.
+        with profiled() as profile:
+            assert all(link.category == "complete" for link in status().links)
+        assert profile.counters["files_hashed"] == 0
+        assert profile.counters["bytes_read"] == 0
+        assert drift() == {"bashrc": [], "tmux": []}
+
+
+def test_drift_and_sync(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.bashrc.write_text("Updated bashrc")
+        Path(paths.tmux_dir, "extra.conf").write_text("Extra")
+        assert drift() == {"bashrc": [""], "tmux": ["extra.conf"]}
+        with profiled() as profile:
+            links = status().links
+        assert [link.category for link in links] == ["out-of-sync", "out-of-sync"]
+        # Only the changed home side is read, against the recorded digest.
+        assert profile.counters["bytes_read"] == len("Updated bashrc")
+
+        sync_project()
+        assert drift() == {"bashrc": [], "tmux": []}
+        manifest = Manifest.from_project(paths.project, "md5")
+        tmux = manifest.get("tmux", paths.tmux_dir)
+        assert tmux is not None
+        assert tmux.digest("extra.conf") == _md5(Path(paths.tmux_dir, "extra.conf"))
+
+        paths.tmux_config.unlink()
+        sync_project()
+        assert drift() == {"bashrc": [], "tmux": []}
+        tmux = Manifest.from_project(paths.project, "md5").get("tmux", paths.tmux_dir)
+        assert tmux is not None and tmux.digest("tmux.conf") is None
+
+
+def test_copy_file_with_digest_of_sparse_file(tmp_path: Path) -> None:
+    source = Path(tmp_path, "sparse")
+    with open(source, "wb") as f:
+        f.write(b"start")
+        f.seek(1 << 20)
+        f.write(b"end")
+    destination = Path(tmp_path, "copy")
+    stat_result, digest = copy_file_with_digest(source, destination, "sha256")
+    assert stat_result.st_size == source.stat().st_size
+    assert destination.read_bytes() == source.read_bytes()
+    assert digest == hashlib.sha256(source.read_bytes()).hexdigest()
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "copy_file_range"), reason="copy_file_range is Linux only"
+)
+def test_copy_file_with_digest_copies_in_kernel(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    copy_file_range = os.copy_file_range
+    calls = list()
+
+    def recording_copy_file_range(*args: int) -> int:
+        calls.append(args)
+        return copy_file_range(*args)
+
+    monkeypatch.setattr(os, "copy_file_range", recording_copy_file_range)
+    source = Path(tmp_path, "source")
+    source.write_bytes(b"x" * 100_000)
+    destination = Path(tmp_path, "copy")
+    _, digest = copy_file_with_digest(source, destination, "md5")
+    # The digest is read back, while the data is still copied in the kernel.
+    assert len(calls) > 0
+    assert digest == hashlib.md5(source.read_bytes()).hexdigest()
+    assert destination.read_bytes() == source.read_bytes()
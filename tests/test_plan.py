@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from click.testing import CliRunner
+
+from dotman.cli import cli
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.plan import compile_plan
+from dotman.profiling import profiled
+from dotman.setup import setup_plan
+from dotman.sync import sync_plan
+
+
+def test_compile_plan(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        plan = compile_plan(paths.project, "setup", "copy")
+        assert [
+            (entry.target, entry.target_path, entry.dotfile_path, entry.mode)
+            for entry in plan.entries
+        ] == [
+            ("bashrc", paths.project_bashrc, paths.bashrc, "copy"),
+            ("tmux", paths.project_tmux_dir, paths.tmux_dir, "copy"),
+        ]
+        assert plan.entry(Path("tmux")).dotfile_path == paths.tmux_dir
+        with pytest.raises(DotmanException, match="is not configured"):
+            plan.entry(Path("vimrc"))
+
+        # The resolved paths are reused while the configuration is unchanged.
+        with profiled() as profile:
+            plan = compile_plan(paths.project, "sync")
+        assert profile.calls["resolve_path"] == 0
+        assert all(entry.mode == "copy" for entry in plan.entries)
+
+        with open(paths.project_config, "a", encoding="utf-8") as f:
+            f.write('[dotfiles.vim.links]\nwindows = "~/vimfiles"\n')
+        plan = compile_plan(paths.project, "status")
+        assert [entry.target for entry in plan.entries] == ["bashrc", "tmux"]
+        with pytest.raises(DotmanException, match="does not have a links"):
+            plan.entry(Path("vim"))
+        with pytest.raises(DotmanException, match="does not have a links"):
+            plan.linked_entries()
+
+
+def test_dry_run(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        plan = setup_plan(dotfile_mode="hardlink")
+        assert plan.describe().splitlines() == [
+            f"setup bashrc: {paths.bashrc.as_posix()} (hardlink)",
+            f"setup tmux: {paths.tmux_dir.as_posix()} (hardlink)",
+        ]
+        result = CliRunner().invoke(cli, ["setup", "bashrc", "--dry-run"])
+        assert result.exit_code == 0
+        assert result.output == f"setup bashrc: {paths.bashrc.as_posix()} (symlink)\n"
+        assert not paths.bashrc.exists()
+
+        # Sync checks the targets, which are not set up.
+        with pytest.raises(DotmanException, match="doesn't exist"):
+            sync_plan()
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from dotman.cli import cli
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.profiling import Profile, add_hook, get_profile, profiled, remove_hook
+from dotman.setup import setup_project
+from dotman.status import status
+
+
+def test_profiled(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    collected: list[Profile] = list()
+    add_hook(collected.append)
+    try:
+        with managed_context(Context(home=paths.home, cwd=paths.project)):
+            with profiled() as profile:
+                setup_project(dotfile_mode="copy", jobs=2)
+                status(use_cache=False)
+    finally:
+        remove_hook(collected.append)
+    assert get_profile() is None
+    assert collected == [profile]
+    assert profile.calls["config"] == 2
+    assert profile.calls["copy"] == 2
+    assert profile.counters["files_copied"] == 2
+    assert profile.counters["bytes_written"] == len("ORIGIN: bashrc") + len(
+        "ORIGIN: tmux.conf"
+    )
+    assert profile.counters["stats"] == profile.calls["stat"] > 0
+    assert profile.calls["resolve_path"] > 0
+    assert profile.to_dict()["wall_seconds"] == profile.wall_seconds
+
+
+def test_not_profiled(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        status()
+    assert get_profile() is None
+
+
+def test_cli_profile(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(cli, ["example", "complete", tmp_path.as_posix()])
+    project = Path(tmp_path, "home/project")
+    result = runner.invoke(cli, ["--profile", "status", project.as_posix()])
+    assert result.exit_code == 0
+    assert result.stdout.startswith("Project project\n")
+    assert "resolve_path" in result.stderr
+    assert "wall time" in result.stderr
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+import dotman
+from dotman.config import Config
+from dotman.context import Context, Platform, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.session import transaction
+
+
+def test_transaction(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="add")
+    writes: list[Path] = []
+    write = Config.write
+
+    def counting_write(self: Config, path: Path) -> None:
+        writes.append(path)
+        write(self, path)
+
+    monkeypatch.setattr(Config, "write", counting_write)
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with dotman.transaction(paths.project) as tx:
+            tx.add("~/bashrc")
+            tx.add("~/dot_config/tmux", dotfile_mode="copy")
+            tx.edit("tmux", "~/tmux", platform="windows")
+        assert writes == [paths.project_config]
+        assert paths.bashrc.is_symlink()
+        assert not paths.tmux_dir.is_symlink()
+        config = Config.from_project(paths.project)
+        assert config.dotfiles["bashrc"] == "~/bashrc"
+        tmux_config = config.dotfiles["tmux"]
+        assert not isinstance(tmux_config, str)
+        assert tmux_config.links[Platform.windows] == "~/tmux"
+
+
+def test_transaction_commits_applied_mutations(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="add")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with pytest.raises(DotmanException):
+            with transaction(paths.project) as tx:
+                tx.add("~/bashrc")
+                tx.edit("missing", "~/missing")
+        config = Config.from_project(paths.project)
+        assert list(config.dotfiles) == ["bashrc"]
+
+
+def test_transaction_rejects_taken_target(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="add")
+    other_bashrc = Path(paths.root, "other", "bashrc")
+    other_bashrc.parent.mkdir()
+    other_bashrc.write_text("Other bashrc")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with pytest.raises(DotmanException, match="already configured"):
+            with transaction(paths.project) as tx:
+                tx.add("~/bashrc")
+                tx.add(other_bashrc)
+        assert other_bashrc.read_text() == "Other bashrc"
+        assert paths.project_bashrc.read_text() == "ORIGIN: bashrc"
+        Path(paths.project, "vimrc").write_text("Not configured")
+        Path(paths.home, "vimrc").write_text("vimrc")
+        with pytest.raises(DotmanException, match="already exists"):
+            with transaction(paths.project) as tx:
+                tx.add("~/vimrc")
+        assert Path(paths.home, "vimrc").read_text() == "vimrc"
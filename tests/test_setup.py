@@ -1,6 +1,11 @@
 from pathlib import Path
+import shutil
 
+import pytest
+
+from dotman.exceptions import DotmanException
 from dotman.setup import setup, setup_project
+from dotman.status import status
 from dotman.context import Context, managed_context
 from dotman.examples import setup_folder_structure
 
@@ -49,3 +54,41 @@ def test_full_project_with_copies(tmp_path: Path) -> None:
         assert paths.tmux_dir.is_dir()
         assert not paths.tmux_dir.is_symlink()
         assert paths.tmux_config.is_file()
+
+
+def test_full_project_with_jobs(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        setup_project(project=paths.project, dotfile_mode="copy", jobs=4)
+        assert paths.bashrc.is_file()
+        assert not paths.bashrc.is_symlink()
+        assert paths.tmux_dir.is_dir()
+        assert paths.tmux_config.is_file()
+
+
+def test_full_project_validates_before_setup(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.tmux_dir.mkdir()
+        with pytest.raises(DotmanException):
+            setup_project(project=paths.project, jobs=4)
+        assert not paths.bashrc.exists()
+
+
+def test_full_project_with_links(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        setup_project(project=paths.project, dotfile_mode="hardlink")
+        assert not paths.bashrc.is_symlink()
+        assert paths.bashrc.samefile(paths.project_bashrc)
+        assert paths.tmux_config.samefile(paths.project_tmux_config)
+        stat = status()
+        assert [link.status for link in stat.links] == ["Complete - Hardlink"] * 2
+
+        paths.bashrc.unlink()
+        shutil.rmtree(paths.tmux_dir)
+        setup_project(project=paths.project, dotfile_mode="reflink")
+        assert not paths.bashrc.samefile(paths.project_bashrc)
+        assert paths.tmux_config.read_text() == paths.project_tmux_config.read_text()
+        stat = status()
+        assert [link.status for link in stat.links] == ["Complete - Copy"] * 2
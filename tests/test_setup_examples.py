@@ -1,5 +1,9 @@
 from pathlib import Path
-from dotman.examples import setup_folder_structure
+from dotman.examples import (
+    SyntheticSpec,
+    generate_synthetic_dotfiles,
+    setup_folder_structure,
+)
 
 
 def test_setup_setup(tmp_path: Path):
@@ -77,3 +81,18 @@ def test_complete_with_copy(tmp_path: Path):
     assert paths.project_bashrc.is_file()
     assert paths.project_tmux_dir.is_dir()
     assert paths.project_tmux_config.is_file()
+
+
+def test_generate_synthetic_dotfiles(tmp_path: Path):
+    spec = SyntheticSpec(targets=3, depth=2, width=2, files_per_dir=1)
+    paths = generate_synthetic_dotfiles(tmp_path, spec)
+    assert paths.project.is_dir()
+    assert [dotfile.name for dotfile in paths.dotfiles] == [
+        "dotfile-0000",
+        "dotdir-0001",
+        "dotfile-0002",
+    ]
+    assert paths.dotfiles[0].is_file()
+    assert len(list(paths.dotfiles[1].rglob("file-*"))) == 1 + 2 + 4
+    again = generate_synthetic_dotfiles(Path(tmp_path, "again"), spec)
+    assert again.dotfiles[2].read_bytes() == paths.dotfiles[2].read_bytes()
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.profiling import profiled
+from dotman.status import iter_status, status
+
+
+def test_basic(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with profiled() as profile:
+            stat = status()
+        assert stat.project == paths.project
+        assert [link.target for link in stat.links] == [Path("bashrc"), Path("tmux")]
+        assert [link.status for link in stat.links] == ["Complete", "Complete"]
+        # An lstat of each side, and a stat of the symlinked dotfile.
+        assert profile.counters["stats"] == 6
+
+
+def test_copies(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.tmux_config.write_text("Changed")
+        Path(paths.tmux_dir, "extra").write_text("Extra")
+        stat = status(use_cache=False)
+        assert stat.links[0].status == "Complete - Copy"
+        assert stat.links[1].status == (
+            "Dotfile is not a symlink, and contains extra files compared to target: extra"
+        )
+        Path(paths.tmux_dir, "extra").unlink()
+        stat = status(use_cache=False)
+        assert stat.links[1].status == (
+            "Dotfile is not a symlink, and file tmux.conf is not identical to target."
+        )
+
+
+def test_jobs_keep_config_order(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="new-machine")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        stat = status(jobs=4)
+        assert [link.target for link in stat.links] == [Path("bashrc"), Path("tmux")]
+        assert [link.status for link in stat.links] == ["Missing Dotfile"] * 2
+
+
+def test_first_difference(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        Path(paths.tmux_dir, "extra_a").write_text("Extra")
+        Path(paths.tmux_dir, "extra_b").write_text("Extra")
+        stat = status(use_cache=False)
+        assert stat.links[1].status == (
+            "Dotfile is not a symlink, and contains extra files compared to target: extra_a, extra_b"
+        )
+        stat = status(use_cache=False, first_difference=True)
+        assert stat.links[1].status == (
+            "Dotfile is not a symlink, and contains extra files compared to target: extra_a"
+        )
+
+
+def test_iter_status(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.bashrc.unlink()
+        links = iter_status(jobs=2)
+        first = next(links)
+        assert first.target == Path("bashrc")
+        assert first.category == "missing"
+        assert [link.category for link in links] == ["complete"]
@@ -18,3 +18,55 @@ def test_full_project_with_copies(tmp_path: Path) -> None:
         paths.tmux_config.write_text("This Is Updated More")
         sync_project()
         assert paths.project_tmux_config.read_text() == "This Is Updated More"
+
+
+def test_full_project_with_jobs(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.bashrc.write_text("This Is Updated")
+        paths.tmux_config.write_text("This Is Updated More")
+        sync_project(jobs=4)
+        assert paths.project_bashrc.read_text() == "This Is Updated"
+        assert paths.project_tmux_config.read_text() == "This Is Updated More"
+
+
+def test_directory_sync_is_incremental(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        Path(paths.tmux_dir, "plugins").mkdir()
+        Path(paths.tmux_dir, "plugins", "a.conf").write_text("Plugin A")
+        Path(paths.tmux_dir, "plugins", "b.conf").write_text("Plugin B")
+        result = sync(paths.project_tmux_dir.name)
+        assert result.files_copied == 2
+        assert result.bytes_copied == 16
+        assert result.paths_removed == 0
+        assert Path(paths.project_tmux_dir, "plugins", "b.conf").read_text() == (
+            "Plugin B"
+        )
+
+        unchanged = Path(paths.project_tmux_dir, "plugins", "a.conf")
+        unchanged_mtime = unchanged.stat().st_mtime_ns
+        Path(paths.tmux_dir, "plugins", "b.conf").write_text("Plugin B, updated")
+        paths.tmux_config.unlink()
+        result = sync(paths.project_tmux_dir.name)
+        assert result.files_copied == 1
+        assert result.bytes_copied == len("Plugin B, updated")
+        assert result.paths_removed == 1
+        assert not paths.project_tmux_config.exists()
+        assert unchanged.stat().st_mtime_ns == unchanged_mtime
+
+        result = sync(paths.project_tmux_dir.name)
+        assert result.files_copied == 0
+        assert result.paths_removed == 0
+
+
+def test_directory_sync_replaces_changed_types(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        paths.tmux_config.unlink()
+        paths.tmux_config.mkdir()
+        Path(paths.tmux_config, "nested").write_text("Nested")
+        result = sync(paths.project_tmux_dir.name)
+        assert result.paths_removed == 1
+        assert result.files_copied == 1
+        assert Path(paths.project_tmux_config, "nested").read_text() == "Nested"
@@ -1,6 +1,18 @@
+import hashlib
+import itertools
 from pathlib import Path
+
+import pytest
+
+import dotman.util
 from dotman.context import Context, managed_context
-from dotman.util import resolve_path
+from dotman.util import (
+    digest_of_file,
+    make_state_dir,
+    map_in_order,
+    md5_of_file,
+    resolve_path,
+)
 
 
 def test_resolve_path() -> None:
@@ -16,3 +28,39 @@ def test_resolve_path() -> None:
         assert resolve_path(Path("c")) == Path("/a/b/c")
         assert resolve_path(Path("~/c/dd")) == Path("/a/home/c/dd")
         assert resolve_path(Path("./../../e/f")) == Path("/e/f")
+
+
+def test_map_in_order() -> None:
+    context = Context(cwd=Path("/a/b"), home=Path("/a/home"))
+    with managed_context(context):
+        items = ["c", "~/d", "e/f", "/g"]
+        expected = [resolve_path(item) for item in items]
+        assert list(map_in_order(resolve_path, items, jobs=1)) == expected
+        assert list(map_in_order(resolve_path, items, jobs=3)) == expected
+    # Items are consumed as results are yielded, so unbounded inputs work.
+    squares = map_in_order(lambda i: i * i, itertools.count(), jobs=2)
+    assert list(itertools.islice(squares, 5)) == [0, 1, 4, 9, 16]
+
+
+@pytest.mark.parametrize("algorithm", ["md5", "sha256", "blake2b"])
+@pytest.mark.parametrize("mmap_threshold", [1, 1 << 40])
+def test_digest_of_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, algorithm: str, mmap_threshold: int
+) -> None:
+    monkeypatch.setattr(dotman.util, "MMAP_HASH_THRESHOLD", mmap_threshold)
+    content = bytes(range(256)) * 5000
+    file_a = Path(tmp_path, "a")
+    file_a.write_bytes(content)
+    expected = hashlib.new(algorithm, content).hexdigest()
+    assert digest_of_file(file_a, algorithm) == expected
+    assert digest_of_file(file_a, algorithm, chunk_size=8192) == expected
+    assert md5_of_file(file_a) == hashlib.md5(content).hexdigest()
+
+
+def test_make_state_dir(tmp_path: Path) -> None:
+    state_dir = Path(tmp_path, "project", ".dotman")
+    make_state_dir(state_dir)
+    assert Path(state_dir, ".gitignore").read_text() == "*\n"
+    Path(state_dir, ".gitignore").write_text("*\n!keep\n")
+    make_state_dir(state_dir)
+    assert Path(state_dir, ".gitignore").read_text() == "*\n!keep\n"
@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+from dotman.profiling import profiled
+from dotman.walk import classify, list_dir, stat_of, walk_files
+
+
+def _make_tree(root: Path) -> None:
+    for relative in ["b", "a/z", "a/c/d", "e/f"]:
+        path = Path(root, relative)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+    Path(root, "linked").symlink_to(Path(root, "a"))
+
+
+def test_walk_files(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    walked = [(relative, entry.path) for relative, entry in walk_files(tmp_path)]
+    assert [relative for relative, _ in walked] == ["b", "a/z", "a/c/d", "e/f"]
+    assert all(path == os.path.join(tmp_path, relative) for relative, path in walked)
+    expected = [
+        Path(dirpath, name).relative_to(tmp_path).as_posix()
+        for dirpath, _, names in os.walk(tmp_path)
+        for name in names
+    ]
+    assert sorted(relative for relative, _ in walked) == sorted(expected)
+
+
+def test_list_dir(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    files, dirs = list_dir(tmp_path)
+    assert sorted(files) == ["b"]
+    assert sorted(dirs) == ["a", "e"]
+    files, dirs = list_dir(tmp_path, follow_dir_symlinks=True)
+    assert sorted(dirs) == ["a", "e", "linked"]
+    assert stat_of(files["b"]).st_size == stat_of(Path(tmp_path, "b")).st_size == 1
+
+
+def test_classify(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    Path(tmp_path, "dangling").symlink_to(Path(tmp_path, "nothing"))
+    with profiled() as profile:
+        file = classify(Path(tmp_path, "b"))
+        linked = classify(Path(tmp_path, "linked"))
+        dangling = classify(Path(tmp_path, "dangling"))
+        missing = classify(Path(tmp_path, "b", "c"))
+    # One lstat per path, and a stat for symlinks only.
+    assert profile.counters["stats"] == 6
+    assert (file.exists, file.is_file, file.is_symlink, file.link) == (
+        True,
+        True,
+        False,
+        None,
+    )
+    assert (linked.is_dir, linked.is_symlink, linked.link) == (
+        True,
+        True,
+        os.path.join(tmp_path, "a"),
+    )
+    assert linked.same_file(classify(Path(tmp_path, "a")))
+    assert (dangling.exists, dangling.is_symlink) == (False, True)
+    assert (missing.exists, missing.lstat) == (False, None)
+    assert classify(file) is file
+    assert stat_of(file) is file.stat
+    assert Path(file).read_text() == "b"
@@ -0,0 +1,80 @@
+import contextvars
+from pathlib import Path
+import queue
+import sys
+import threading
+
+import pytest
+
+from dotman.context import Context, managed_context
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.sync import SyncResult
+from dotman.watch import _without_nested, watch
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux only"
+)
+
+
+def _wait_for(results: "queue.Queue[SyncResult]", target: Path) -> SyncResult:
+    while True:
+        result = results.get(timeout=10)
+        if result.target == target and result.files_copied + result.paths_removed:
+            return result
+
+
+def test_watch_syncs_changed_paths(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    results: "queue.Queue[SyncResult]" = queue.Queue()
+    stop_event = threading.Event()
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(watch,),
+            kwargs=dict(debounce=0.05, on_sync=results.put, stop_event=stop_event),
+        )
+        thread.start()
+    try:
+        # The initial sync reports every target once.
+        initial = {results.get(timeout=10).target, results.get(timeout=10).target}
+        assert initial == {paths.project_bashrc, paths.project_tmux_dir}
+
+        paths.bashrc.write_text("Updated bashrc")
+        result = _wait_for(results, paths.project_bashrc)
+        assert result.files_copied == 1
+        assert paths.project_bashrc.read_text() == "Updated bashrc"
+
+        Path(paths.tmux_dir, "plugins").mkdir()
+        Path(paths.tmux_dir, "plugins", "a.conf").write_text("Plugin A")
+        paths.tmux_config.unlink()
+        copied = 0
+        removed = 0
+        while copied < 1 or removed < 1:
+            result = _wait_for(results, paths.project_tmux_dir)
+            copied += result.files_copied
+            removed += result.paths_removed
+        assert Path(paths.project_tmux_dir, "plugins", "a.conf").read_text() == (
+            "Plugin A"
+        )
+        assert not paths.project_tmux_config.exists()
+    finally:
+        stop_event.set()
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+
+
+def test_watch_requires_copied_dotfiles(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete")
+    with managed_context(Context(home=paths.home, cwd=paths.project)):
+        with pytest.raises(DotmanException):
+            watch()
+
+
+def test_without_nested() -> None:
+    assert _without_nested({"a/b", "a", "ab", "c/d", "c/e"}) == [
+        "a",
+        "ab",
+        "c/d",
+        "c/e",
+    ]
@@ -0,0 +1,86 @@
+from pathlib import Path
+import shutil
+
+import pytest
+
+import dotman.cache
+
+from dotman.add import add
+from dotman.context import Context, managed_context
+from dotman.edit import edit
+from dotman.examples import setup_folder_structure
+from dotman.exceptions import DotmanException
+from dotman.init import init
+from dotman.workspace import (
+    Workspace,
+    find_conflicts,
+    workspace_setup,
+    workspace_status,
+    workspace_sync,
+)
+
+
+def _second_project(home: Path) -> Path:
+    project = Path(home, "work")
+    init(project=project)
+    Path(home, "gitconfig").write_text("ORIGIN: gitconfig")
+    add(project=project, dotfile=Path(home, "gitconfig"), dotfile_mode="copy")
+    return project
+
+
+def test_workspace(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Store the digests of the files just written.
+    monkeypatch.setattr(dotman.cache, "RACY_WINDOW_NS", -(10**18))
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete-with-copy")
+    with managed_context(Context(home=paths.home, cwd=paths.home)):
+        work = _second_project(paths.home)
+        workspace_file = Path(paths.home, "workspace.toml")
+        workspace_file.write_text('projects = ["project", "~/work"]')
+        workspace = Workspace.from_file(workspace_file)
+        assert workspace.projects == [paths.project, work]
+        assert find_conflicts(workspace) == list()
+
+        # Without manifests, copies are hashed through the shared cache.
+        for project in workspace.projects:
+            Path(project, ".dotman", "manifest.json").unlink()
+        statuses = list(workspace_status(workspace_file, jobs=2))
+        assert [stat.project for stat in statuses] == [paths.project, work]
+        assert [len(stat.links) for stat in statuses] == [2, 1]
+        assert all(link.category == "complete" for s in statuses for link in s.links)
+        assert Path(paths.home, ".dotman", "md5-hash-cache.json").is_file()
+
+        paths.bashrc.write_text("Updated bashrc")
+        Path(paths.home, "gitconfig").write_text("Updated gitconfig")
+        results = workspace_sync(workspace_file, jobs=2)
+        assert sorted(result.files_copied for result in results) == [0, 1, 1]
+        assert Path(work, "gitconfig").read_text() == "Updated gitconfig"
+
+        paths.bashrc.unlink()
+        shutil.rmtree(paths.tmux_dir)
+        Path(paths.home, "gitconfig").unlink()
+        workspace_setup(workspace_file, dotfile_mode="symlink", jobs=2)
+        assert paths.bashrc.is_symlink()
+        assert Path(paths.home, "gitconfig").is_symlink()
+
+
+def test_workspace_conflicts(tmp_path: Path) -> None:
+    paths = setup_folder_structure(Path(tmp_path, "root"), stage="complete")
+    with managed_context(Context(home=paths.home, cwd=paths.home)):
+        work = _second_project(paths.home)
+        workspace_file = Path(paths.home, "workspace.toml")
+        workspace_file.write_text(f'projects = ["{paths.project}", "{work}"]')
+        edit(project=work, target="gitconfig", dotfile=Path(paths.tmux_dir, "x"))
+        conflicts = find_conflicts(Workspace.from_file(workspace_file))
+        assert [(a.target, b.target) for a, b in conflicts] == [("tmux", "gitconfig")]
+        with pytest.raises(DotmanException):
+            workspace_status(workspace_file)
+        with pytest.raises(DotmanException):
+            workspace_sync(workspace_file)
+
+
+def test_workspace_file_errors(tmp_path: Path) -> None:
+    with pytest.raises(DotmanException):
+        Workspace.from_file(Path(tmp_path, "missing.toml"))
+    Path(tmp_path, "workspace.toml").write_text('projects = "project"')
+    with pytest.raises(DotmanException):
+        Workspace.from_file(Path(tmp_path, "workspace.toml"))